@@ -0,0 +1,85 @@
+"""Load time of the column-wise .csv loader against the row-wise loader it replaced, for object and columnar
+ingredients, and a check that both loaders build the same database.
+
+Run from the repository root:
+
+    python benchmarks/bench_csv_loader.py [--ingredients 20000] [--meals 4000] [--baseline REVISION]
+
+The baseline defaults to the revision before the column-wise loader. Each worker dumps every loaded ingredient and meal,
+and the dumps of both revisions and both modes are compared. Floats are compared with a relative tolerance of 1e-12, as
+the baseline parses them with the faster pandas float parser, which may be off in the last digit.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.common import write_synthetic_database, dump_database, compare_revisions, revision_before, print_table
+
+
+def is_same(value, other) -> bool:
+    if isinstance(value, float) and isinstance(other, float):
+        return math.isclose(value, other, rel_tol=1e-12)
+    if isinstance(value, (list, dict)) and type(value) is type(other) and len(value) == len(other):
+        if isinstance(value, dict):
+            return value.keys() == other.keys() and all(is_same(value[k], other[k]) for k in value)
+        return all(is_same(v, o) for v, o in zip(value, other))
+
+    return value == other
+
+
+def measure(db_dir: str, dump_path: str) -> dict:
+    from src.app.connector import LocalDatabase
+
+    results = {}
+    dumps = {}
+    for columnar in [False, True]:
+        mode = 'columnar' if columnar else 'objects'
+        db = LocalDatabase(columnar=columnar)
+        start = time.perf_counter()
+        db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+        results[f'load ({mode})'] = time.perf_counter() - start
+        dumps[mode] = dump_database(db)
+    with open(dump_path, 'w') as file:
+        json.dump(dumps, file)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ingredients', type=int, default=20000)
+    parser.add_argument('--meals', type=int, default=4000)
+    parser.add_argument('--baseline', default=None, help='Revision to compare with.')
+    parser.add_argument('--current', default=None, help='Revision to measure instead of the working tree.')
+    parser.add_argument('--root', help='Measure the src package in this directory and print JSON (worker mode).')
+    parser.add_argument('--db-dir', help='Database written by the parent process (worker mode).')
+    args = parser.parse_args()
+
+    if args.root is not None:
+        sys.path.insert(0, args.root)
+        dump_path = f'{args.db_dir}{os.path.basename(os.path.normpath(args.root))}.json'
+        print(json.dumps(dict(measure(db_dir=args.db_dir, dump_path=dump_path), dump=dump_path)))
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_dir += os.sep
+        write_synthetic_database(db_dir, n_ingredients=args.ingredients, n_meals=args.meals)
+        print(f'{args.ingredients} ingredients, {args.meals} meals')
+        results = compare_revisions(script=os.path.abspath(__file__), args=['--db-dir', db_dir],
+                                    baseline=args.baseline or revision_before('user-006'), current=args.current)
+        dumps = []
+        for values in results.values():
+            with open(values.pop('dump'), 'r') as file:
+                dumps.extend(json.load(file).values())
+    print_table(results)
+    same = all(is_same(dump, dumps[0]) for dump in dumps[1:])
+    print('All loaders build the same database.' if same else 'The loaders build different databases!')
+
+
+if __name__ == '__main__':
+    main()
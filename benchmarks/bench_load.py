@@ -0,0 +1,75 @@
+"""Load time of a .csv database and lookup time by code and name, before and after the code and name indexes of
+LocalDatabase.
+
+Run from the repository root:
+
+    python benchmarks/bench_load.py [--ingredients 10000] [--meals 2000] [--baseline REVISION] [--current REVISION]
+
+The working tree is compared with a baseline that defaults to the revision before the indexes were added. Its lookups
+scan the item lists, so loading meals is quadratic in the number of ingredients and large sizes take minutes there.
+Pass --current with the revision of the index commit to measure it without the later loader changes.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.common import write_synthetic_database, compare_revisions, revision_before, print_table
+
+
+def measure(db_dir: str, n_lookups: int) -> dict:
+    from src.app.connector import LocalDatabase
+
+    start = time.perf_counter()
+    db = LocalDatabase()
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+    load = time.perf_counter() - start
+
+    rng = random.Random(0)
+    ingredients = [rng.choice(db.ingredients) for _ in range(n_lookups)]
+    meals = [rng.choice(db.meals) for _ in range(n_lookups)]
+    results = {'load': load}
+    for key, lookup, values in [('ingredient_by_code', db.get_ingredient_by_code, [i.CODE for i in ingredients]),
+                                ('ingredient_by_name', db.get_ingredient_by_name, [i.name for i in ingredients]),
+                                ('meal_by_code', db.get_meal_by_code, [m.CODE for m in meals]),
+                                ('meal_by_name', db.get_meal_by_name, [m.name for m in meals])]:
+        start = time.perf_counter()
+        for value in values:
+            lookup(value)
+        results[f'{n_lookups} x {key}'] = time.perf_counter() - start
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ingredients', type=int, default=10000)
+    parser.add_argument('--meals', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--baseline', default=None, help='Revision to compare with.')
+    parser.add_argument('--current', default=None, help='Revision to measure instead of the working tree.')
+    parser.add_argument('--root', help='Measure the src package in this directory and print JSON (worker mode).')
+    parser.add_argument('--db-dir', help='Database written by the parent process (worker mode).')
+    args = parser.parse_args()
+
+    if args.root is not None:
+        sys.path.insert(0, args.root)
+        print(json.dumps(measure(db_dir=args.db_dir, n_lookups=args.lookups)))
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_dir += os.sep
+        write_synthetic_database(db_dir, n_ingredients=args.ingredients, n_meals=args.meals)
+        print(f'{args.ingredients} ingredients, {args.meals} meals')
+        results = compare_revisions(script=os.path.abspath(__file__),
+                                    args=['--db-dir', db_dir, '--lookups', str(args.lookups)],
+                                    baseline=args.baseline or revision_before('user-001'), current=args.current)
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Save time of 100k ingredients, 20k meals and a trip of 100k days, before and after the buffered atomic file writer.
+
+Run from the repository root:
+
+    python benchmarks/bench_save.py [--ingredients 100000] [--meals 20000] [--days 100000] [--baseline REVISION]
+
+The baseline defaults to the revision before the writer, which wrote every row to the target file with its own write
+call. Each save is timed as the best of --repeat runs.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.common import write_synthetic_database, compare_revisions, revision_before, print_table, best_time
+
+
+def measure(db_dir: str, n_days: int, repeat: int) -> dict:
+    from src.app.connector import LocalDatabase
+    from src.backend.trip import Trip
+
+    db = LocalDatabase()
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+    db.name = 'synthetic'
+    trip = Trip(CODE=0, name='Synthetic trip', meal_types=db.meal_types, duration=n_days)
+    trip.link_database(db)
+    for day in range(0, n_days, 3):
+        trip.set_meal_at_day(db.meals[day % len(db.meals)], day, db.meal_types[day % len(db.meal_types)])
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        out_dir += os.sep
+        return {f'{len(db.ingredients)} ingredients':
+                best_time(lambda: db.save_ingredients_to_file(db_dir=out_dir, base_name_no_ending='bench'), repeat),
+                f'{len(db.meals)} meals':
+                best_time(lambda: db.save_meals_to_file(db_dir=out_dir, base_name_no_ending='bench'), repeat),
+                f'trip of {n_days} days': best_time(lambda: trip.save_trip(f'{out_dir}bench_trip.csv'), repeat)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ingredients', type=int, default=100000)
+    parser.add_argument('--meals', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=None, help='Revision to compare with.')
+    parser.add_argument('--current', default=None, help='Revision to measure instead of the working tree.')
+    parser.add_argument('--root', help='Measure the src package in this directory and print JSON (worker mode).')
+    parser.add_argument('--db-dir', help='Database written by the parent process (worker mode).')
+    args = parser.parse_args()
+
+    if args.root is not None:
+        sys.path.insert(0, args.root)
+        print(json.dumps(measure(db_dir=args.db_dir, n_days=args.days, repeat=args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_dir += os.sep
+        write_synthetic_database(db_dir, n_ingredients=args.ingredients, n_meals=args.meals)
+        results = compare_revisions(script=os.path.abspath(__file__),
+                                    args=['--db-dir', db_dir, '--days', str(args.days), '--repeat', str(args.repeat)],
+                                    baseline=args.baseline or revision_before('user-010'), current=args.current)
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
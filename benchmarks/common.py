@@ -0,0 +1,159 @@
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+words = ['oat', 'rice', 'bean', 'nut', 'apple', 'pasta', 'soy', 'lentil', 'butter', 'choco', 'dried', 'smoked', 'tofu',
+         'flour', 'sugar', 'almond', 'peanut', 'raisin', 'cheese', 'bread']
+
+
+def write_synthetic_database(db_dir: str, n_ingredients: int, n_meals: int, seed: int = 1,
+                             vocabulary: list[str] = None) -> str:
+    """
+    Writes a random database in the .csv format of LocalDatabase. Meals hold 2 to 8 ingredients, their nutrition, cost
+    and weight are zero until LocalDatabase.recompute_meals is called.
+
+    :param db_dir: Directory to write to, including \\ tail.
+    :param n_ingredients: Number of ingredients.
+    :param n_meals: Number of meals.
+    :param seed: Seed of the random values.
+    :param vocabulary: Words ingredient names are made of, words if not given.
+    :return: Full path of the base file.
+    """
+    rng = random.Random(seed)
+    vocabulary = vocabulary or words
+    with open(f'{db_dir}synthetic_ingredients.csv', 'w') as file:
+        file.write('code;name;energy;fat;sat_fat;carbs;sugar;fiber;protein;salt;cooking;water;price_per_unit;'
+                   'unit_size;price_per_gram;types\n')
+        for code in range(n_ingredients):
+            name = ' '.join(rng.choice(vocabulary).capitalize() for _ in range(3)) + f' {code}'
+            nutrition = [round(rng.uniform(0, 100), 2) for _ in range(8)]
+            nutrition[0] *= 5
+            price, unit_size = round(rng.uniform(.5, 5), 2), float(rng.choice([100, 200, 500, 1000]))
+            types = ''.join(f'{t}--' for t in sorted(rng.sample(range(4), rng.randint(1, 2))))
+            file.write(f'{code};{name}; ' + '; '.join(map(str, nutrition)) +
+                       f'; {rng.random() < .3}; {rng.random() < .3}; {price}; {unit_size}; {price / unit_size}; '
+                       f'{types}\n')
+    with open(f'{db_dir}synthetic_meals.csv', 'w') as file:
+        file.write('code;name;energy;fat;sat_fat;carbs;sugar;fiber;protein;salt;own_types;ingredients;amount;'
+                   'cooking;water;cost;weight\n')
+        for code in range(n_meals):
+            n = rng.randint(2, 8)
+            in_codes = rng.sample(range(n_ingredients), n)
+            amounts = [float(rng.randint(10, 200)) for _ in range(n)]
+            types = ''.join(f'{t}--' for t in sorted(rng.sample(range(4), rng.randint(1, 2))))
+            file.write(f'{code};Meal {code}; ' + '; '.join(['0.0'] * 8) +
+                       f'; {types};{in_codes}; {amounts}; True; True; 0.0; 0.0\n')
+    with open(f'{db_dir}synthetic.txt', 'w') as file:
+        file.write(f'123\n{db_dir}synthetic_ingredients.csv\n{db_dir}synthetic_meals.csv')
+
+    return f'{db_dir}synthetic.txt'
+
+
+def dump_database(db) -> dict[str, list]:
+    """
+    Plain values of all ingredients and meals of a LocalDatabase in order, for comparing databases across loaders,
+    storages and revisions.
+    """
+    ingredients = [[i.CODE, i.name, [int(t) for t in i.types], [float(v) for v in i.nutrition], bool(i.cooking),
+                    bool(i.water), float(i.price_per_unit), float(i.unit_size)] for i in db.ingredients]
+    meals = [[m.CODE, m.name, [t.CODE for t in m.own_types], [[i.CODE, float(a)] for i, a in m.ingredients],
+              [float(v) for v in m.nutrition], bool(m.cooking), bool(m.water), float(m.cost), float(m.weight)]
+             for m in db.meals]
+
+    return {'ingredients': ingredients, 'meals': meals}
+
+
+def best_time(function: Callable[[], object], repeat: int = 3) -> float:
+    """
+    Shortest wall time in seconds of several calls.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def revision_before(request_id: str) -> str:
+    """
+    Revision before the first commit of a request, found by the request id its subject starts with.
+    """
+    commits = subprocess.run(['git', 'log', '--reverse', '--format=%H', '--fixed-strings', f'--grep=[{request_id}]'],
+                             cwd=repo_root, capture_output=True, text=True, check=True).stdout.split()
+    if not commits:
+        raise ValueError(f'No commit of {request_id} found!')
+
+    return f'{commits[0]}^'
+
+
+@contextmanager
+def exported_revision(revision: str):
+    """
+    Context manager that exports the source tree of a revision into a temporary directory and yields its path.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        archive = subprocess.run(['git', 'archive', '--format=tar', revision, 'src'], cwd=repo_root,
+                                 capture_output=True, check=True).stdout
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(root)
+        yield root
+
+
+def run_worker(script: str, root: str, args: list[str]) -> dict:
+    """
+    Runs a benchmark script in worker mode against the source tree in root and returns the results it prints as JSON.
+
+    :param script: Full path of the benchmark script.
+    :param root: Directory that contains the src package to measure.
+    :param args: Further command line arguments of the worker.
+    """
+    process = subprocess.run([sys.executable, script, '--root', root, *args], capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f'Worker on {root} failed:\n{process.stderr}')
+
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def compare_revisions(script: str, args: list[str], baseline: str = None, current: str = None) -> dict[str, dict]:
+    """
+    Runs a benchmark script in worker mode against the working tree, or the current revision if given, and the
+    baseline revision if given.
+
+    :return: Results keyed by 'current' and 'baseline'.
+    """
+    if current is None:
+        results = {'current': run_worker(script=script, root=repo_root, args=args)}
+    else:
+        with exported_revision(current) as root:
+            results = {'current': run_worker(script=script, root=root, args=args)}
+    if baseline is not None:
+        with exported_revision(baseline) as root:
+            results['baseline'] = run_worker(script=script, root=root, args=args)
+
+    return results
+
+
+def print_table(results: dict[str, dict], unit: str = 's'):
+    """
+    Prints the measurements of compare_revisions side by side.
+    """
+    names = list(results)
+    keys = list(dict.fromkeys(k for values in results.values() for k in values))
+    print(f'{"":32}' + ''.join(f'{name:>14}' for name in names))
+    for key in keys:
+        row = ''.join(f'{results[name][key]:>14.4g}' if isinstance(results[name].get(key), (int, float))
+                      else f'{str(results[name].get(key, "-")):>14}' for name in names)
+        print(f'{key:32}{row}')
+    print(f'(times in {unit})')
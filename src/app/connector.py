@@ -1,19 +1,44 @@
 import numpy as np
 import numpy.typing as npt
 
-from src.app.error_handling import ItemUsedElsewhereError
-from src.backend.food import MealType, LocalDatabaseComponent, Meal, Ingredient, n_nutrients
+from src.app.events import EventBus
+from src.app.file_writer import AtomicFileWriter
+from src.app.history import EditHistory
+from src.app.importer import import_ingredients
+from src.app.journal import ChangeJournal
+from src.app.locking import ReadWriteLock, read_locked, write_locked
+from src.app.merge import MergeReport, merge_databases
+from src.app.error_handling import ItemUsedElsewhereError, SnapshotFormatError
+from src.app.search_index import NGramIndex
+from src.app.sqlite_storage import SqliteStorage
+from src.app.snapshot import write_snapshot, read_snapshot, is_snapshot_current, pack_strings, unpack_strings, \
+    pack_lists
+from src.backend.food import MealType, LocalDatabaseComponent, Meal, MealIngredients, Ingredient, n_nutrients
+from src.backend.meal_matrix import MealIngredientMatrix
+from src.backend.meal_records import MealRecords, LazyMealList
+from src.backend.nutrient_store import NutrientStore
 import pandas as pd
 
 
-from typing import Union
+from contextlib import nullcontext
+from typing import Callable, Union
 from time import time
 
 import os
+import threading
 
 
 class LocalDatabase:
-    def __init__(self):
+    """Holds all ingredients and meals of one database.
+
+    Args:
+        columnar (bool): Keep numerical ingredient values in a shared NutrientStore instead of per-item arrays.
+        lazy_meals (bool): Keep loaded meals as raw records and build each Meal only when it is first accessed.
+        thread_safe (bool): Guard all methods with a readers-writer lock, so many threads can read while one thread
+            writes. Event subscribers are called on the writing thread. Meals changed through their own methods and
+            compound reads that need a consistent view must be wrapped in writing() or reading()."""
+
+    def __init__(self, columnar: bool = False, lazy_meals: bool = False, thread_safe: bool = False):
         self.ingredients = []
         self.meal_types = [MealType('Breakfast', 0), MealType('Lunch', 1), MealType('Dinner', 2), MealType('Snack', 3)]
         self.meals = []
@@ -24,7 +49,84 @@ class LocalDatabase:
         self.new_ingredient_code = 0
         self.new_meal_code = 0
         self.CODE = int(time())
+        self.ingredients_by_code = {}
+        self.ingredients_by_name = {}
+        self.meals_by_code = {}
+        self.meals_by_name = {}
+        self.meals_by_ingredient_code = {}
+        self.ingredient_search = NGramIndex()
+        self.meal_search = NGramIndex()
+        self.columnar = columnar
+        self.nutrient_store = NutrientStore() if columnar else None
+        self.meal_matrix = None
+        self.lazy_meals = lazy_meals
+        self.meal_records = None
+        self.storage = None
+        self.changed_ingredients = {}
+        self.changed_meals = {}
+        self.saved_to = None
+        self.journal = None
+        self.journal_limit = 1000
+        self.compaction = None
+        self.events = EventBus()
+        self.lock = ReadWriteLock() if thread_safe else None
+        self.save_lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.history = None
+
+    def reading(self):
+        """
+        Context manager that holds the read lock in thread-safe mode, so all reads inside see the same state.
+        """
+        return self.lock.reading() if self.lock is not None else nullcontext()
+
+    def writing(self):
+        """
+        Context manager that holds the write lock in thread-safe mode, e.g. around edits of a meal through its own
+        methods.
+        """
+        return self.lock.writing() if self.lock is not None else nullcontext()
+
+    def record_edit(self, description: str, undo: Callable[[], None], redo: Callable[[], None]):
+        """
+        Adds an edit to the attached EditHistory, if there is one.
+
+        :param description: Short text for menus.
+        :param undo: Reverts the edit.
+        :param redo: Repeats the edit.
+        """
+        if self.history is not None:
+            self.history.record(description=description, undo=undo, redo=redo)
+
+    def pause_history(self):
+        """
+        Context manager that keeps edits out of the attached EditHistory, e.g. while loading.
+        """
+        return self.history.paused() if self.history is not None else nullcontext()
+
+    @write_locked
+    def use_sqlite_storage(self, f_path: str):
+        """
+        Switches saving and loading to an SQLite file. Nothing is written until the next save.
+
+        :param f_path: Full path to .sqlite file.
+        """
+        if self.storage is not None:
+            if self.storage.f_path == f_path:
+                return
+            self.storage.close()
+        self.storage = SqliteStorage(f_path)
+
+    @write_locked
+    def use_csv_storage(self):
+        """
+        Switches saving and loading back to .csv files.
+        """
+        if self.storage is not None:
+            self.storage.close()
+            self.storage = None
 
+    @read_locked
     def save_base_file(self, base_name: str, db_dir: str):
         """
         Saves database base file.
@@ -33,181 +135,908 @@ class LocalDatabase:
         :param db_dir: directory of database saves, including \\ tail
         """
         data_name = base_name.split('.')[0]
-        with open(f'{db_dir}{base_name}', 'w') as file:
-            file.write(f'{self.CODE}\n')
-            if self.has_ingredients():
-                file.write(f'{db_dir}{data_name}_ingredients.csv\n')
-            if self.has_meals():
-                file.write(f'{db_dir}{data_name}_meals.csv')
-
+        ingredients_path = f'{db_dir}{data_name}_ingredients.csv'
+        meals_path = f'{db_dir}{data_name}_meals.csv'
+        content = f'{self.CODE}\n'
+        if self.storage is not None:
+            content += self.storage.f_path
+        else:
+            if self.has_ingredients() or os.path.isfile(ingredients_path):
+                content += f'{ingredients_path}\n'
+            if self.has_meals() or os.path.isfile(meals_path):
+                content += meals_path
+
+        # an unchanged base file is not rewritten, so it does not outdate the snapshot
+        if os.path.isfile(f'{db_dir}{base_name}'):
+            with open(f'{db_dir}{base_name}', 'r') as file:
+                if file.read() == content:
+                    return
+        with AtomicFileWriter(f'{db_dir}{base_name}') as writer:
+            writer.write_text(content)
+
+    @read_locked
     def save(self, db_dir: str, base_name: str):
         """
-        Saves ingredients and meals to .csv files.
+        Saves ingredients and meals to .csv files, or to the storage backend if one is set. Only the first save to a
+        location writes everything, later saves only write the records changed since the last save. For .csv files
+        these go to a journal, which is compacted into the .csv files in the background once it reaches journal_limit
+        records.
 
         :param db_dir: Directory of database saves, including \\ tail.
         :param base_name: Base name with file ending.
         """
-        base_name_no_ending = base_name.split('.')[0]
-
-        self.save_ingredients_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending)
-        self.save_meals_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending)
+        # readers may run alongside, but only one thread at a time writes files and clears the changes
+        with self.save_lock:
+            if self.storage is not None:
+                if self.saved_to != self.storage.f_path:
+                    self.storage.save_database(self)
+                elif self.has_changes():
+                    self.storage.save_changes(ingredients=dict(self.changed_ingredients),
+                                              meals=dict(self.changed_meals))
+                self.saved_to = self.storage.f_path
+                self.clear_changes()
+                return
+
+            base_name_no_ending = base_name.split('.')[0]
+            target = f'{db_dir}{base_name_no_ending}'
+            # changes larger than a compaction, such as a batch import, are cheaper to write in full
+            n_changes = len(self.changed_ingredients) + len(self.changed_meals)
+            if self.saved_to != target or self.journal is None or n_changes >= self.journal_limit:
+                self.wait_for_compaction()
+                self.save_ingredients_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending)
+                self.save_meals_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending)
+                self.save_snapshot(f'{target}.snap')
+                self.journal = ChangeJournal(f'{target}.journal')
+                self.journal.clear()
+            elif self.has_changes():
+                self.journal.append(self.get_change_records())
+                if len(self.journal) >= self.journal_limit and not self.is_compacting():
+                    self.compact(db_dir=db_dir, base_name_no_ending=base_name_no_ending)
+            self.saved_to = target
+            self.clear_changes()
+
+    @read_locked
+    def has_changes(self) -> bool:
+        return bool(self.changed_ingredients or self.changed_meals)
+
+    def clear_changes(self):
+        self.changed_ingredients = {}
+        self.changed_meals = {}
+
+    @read_locked
+    def get_change_records(self) -> list[dict]:
+        """
+        Builds journal records of all ingredients and meals changed since the last save. Records are ordered so that
+        replaying them never leaves a meal pointing to a missing ingredient.
+        """
+        # iterated over copies, so a thread adding to the change sets cannot break the iteration
+        changed_meals = list(self.changed_meals.items())
+        changed_ingredients = list(self.changed_ingredients.items())
+        removed_meals = [{'table': 'meals', 'code': c, 'values': None} for c, m in changed_meals if m is None]
+        put_ingredients = [{'table': 'ingredients', 'code': c,
+                            'values': {'name': i.name, 'types': [int(t) for t in i.types],
+                                       'nutrition': [float(v) for v in i.nutrition], 'cooking': bool(i.cooking),
+                                       'water': bool(i.water), 'price_per_unit': float(i.price_per_unit),
+                                       'unit_size': float(i.unit_size)}}
+                           for c, i in changed_ingredients if i is not None]
+        put_meals = [{'table': 'meals', 'code': c,
+                      'values': {'name': m.name, 'own_types': [t.CODE for t in m.own_types],
+                                 'ingredients': [int(c) for c in m.get_all_ingredient_codes()],
+                                 'amounts': [float(a) for a in m.get_all_ingredient_amounts()],
+                                 'nutrition': [float(v) for v in m.nutrition], 'cooking': bool(m.cooking),
+                                 'water': bool(m.water), 'cost': float(m.cost), 'weight': float(m.weight)}}
+                     for c, m in changed_meals if m is not None]
+        removed_ingredients = [{'table': 'ingredients', 'code': c, 'values': None}
+                               for c, i in changed_ingredients if i is None]
+
+        return removed_meals + put_ingredients + put_meals + removed_ingredients
+
+    @write_locked
+    def apply_change_records(self, records: list[dict]):
+        """
+        Replays journal records on top of the loaded ingredients and meals.
 
+        :param records: Records as built by get_change_records.
+        """
+        meal_positions = {c: i for i, c in enumerate(self.get_meal_codes())}
+        for record in records:
+            code = record['code']
+            values = record['values']
+            if record['table'] == 'ingredients':
+                ingredient = self.ingredients_by_code.get(code)
+                if values is None:
+                    if ingredient is not None:
+                        self.drop_ingredient(ingredient)
+                elif ingredient is not None:
+                    self.unindex_ingredient(ingredient)
+                    ingredient.update(name=values['name'], types=values['types'],
+                                      nutrition=np.array(values['nutrition']), cooking=values['cooking'],
+                                      water=values['water'], price_per_unit=values['price_per_unit'],
+                                      unit_size=values['unit_size'])
+                    self.index_ingredient(ingredient)
+                else:
+                    ingredient = self.new_ingredient(CODE=code, name=values['name'], types=values['types'],
+                                                     nutrition=np.array(values['nutrition']),
+                                                     cooking=values['cooking'], water=values['water'],
+                                                     price_per_unit=values['price_per_unit'],
+                                                     unit_size=values['unit_size'])
+                    self.ingredients.append(ingredient)
+                    self.index_ingredient(ingredient)
+                    self.new_ingredient_code = max(self.new_ingredient_code, code + 1)
+            else:
+                meal = self.get_meal_by_code(code)
+                if meal is not None:
+                    self.unindex_meal(meal)
+                if values is None:
+                    if meal is not None:
+                        self.meals.remove(meal)
+                        meal_positions = {c: i for i, c in enumerate(self.get_meal_codes())}
+                    continue
+                new_meal = Meal(CODE=code, name=values['name'],
+                                own_types=[self.meal_types[t] for t in values['own_types']],
+                                ingredients=[[self.ingredients_by_code[c], a]
+                                             for c, a in zip(values['ingredients'], values['amounts'])],
+                                nutrition=np.array(values['nutrition']), cooking=values['cooking'],
+                                water=values['water'], cost=values['cost'], weight=values['weight'])
+                if meal is not None:
+                    self.meals[meal_positions[code]] = new_meal
+                else:
+                    meal_positions[code] = len(self.meals)
+                    self.meals.append(new_meal)
+                    self.new_meal_code = max(self.new_meal_code, code + 1)
+                self.index_meal(new_meal)
+
+    @read_locked
+    def compact(self, db_dir: str, base_name_no_ending: str):
+        """
+        Rewrites the .csv files and the snapshot from the current state in a background thread and then drops the
+        journal records they contain. The values are copied before the thread starts, so editing can continue.
+        """
+        ingredients = self.get_ingredient_columns()
+        meals = self.get_meal_columns()
+        search = {'i': self.ingredient_search.to_arrays(), 'm': self.meal_search.to_arrays()}
+        meta = {'db_code': self.CODE}
+        n_records = len(self.journal)
+        journal = self.journal
+
+        def write():
+            self.save_ingredients_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending,
+                                          columns=ingredients)
+            self.save_meals_to_file(db_dir=db_dir, base_name_no_ending=base_name_no_ending, columns=meals)
+            arrays = self.get_snapshot_arrays(ingredients=ingredients, meals=meals, search=search)
+            write_snapshot(f_path=f'{db_dir}{base_name_no_ending}.snap', arrays=arrays, meta=meta)
+            journal.drop_first(n_records)
+
+        self.compaction = threading.Thread(target=write, name='journal compaction')
+        self.compaction.start()
+
+    def is_compacting(self) -> bool:
+        return self.compaction is not None and self.compaction.is_alive()
+
+    def wait_for_compaction(self):
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    @write_locked
     def load(self, files: list[str]):
         """
         Loads ingredients and meals.
 
-        :param files: List of full source paths of .csv files.
+        :param files: List of full source paths of .csv files, or a single .sqlite file.
         """
+        if files and files[0].endswith('.sqlite'):
+            self.use_sqlite_storage(files[0])
+            self.storage.load_database(self)
+            self.saved_to = self.storage.f_path
+            return
+
+        self.use_csv_storage()
         self.load_ingredients_from_file(files[0])
         if len(files) > 1:
             self.load_meals_from_file(files[1])
 
+    @write_locked
     def load_from_base_file(self, f_path: str):
         """
         Loads ingredients and meals from base file.
 
         :param f_path: Full path to .txt base file.
         """
+        self.wait_for_compaction()
         with open(f_path, 'r') as file:
             lines = file.read().splitlines()
 
+        snapshot_path = f'{os.path.splitext(f_path)[0]}.snap'
+        loaded = False
+        in_sqlite = len(lines) > 1 and lines[1].endswith('.sqlite')
+        # subscribers get one reset per table instead of an event for every replayed journal record
+        with self.events.muted(), self.pause_history():
+            if not in_sqlite and is_snapshot_current(snapshot_path=snapshot_path, source_paths=[f_path] + lines[1:]):
+                try:
+                    self.load_snapshot(snapshot_path)
+                    self.use_csv_storage()
+                    loaded = True
+                except SnapshotFormatError as ex:
+                    print(ex)
+
+            if not loaded:
+                self.load(lines[1:])
+            if not in_sqlite:
+                self.saved_to = os.path.splitext(f_path)[0]
+                self.journal = ChangeJournal(f'{self.saved_to}.journal')
+                self.apply_change_records(self.journal.read())
+        self.clear_changes()
         self.CODE = int(lines[0])
-        self.load(lines[1:])
         self.name = os.path.basename(f_path).split('.')[0]
+        # the loaded items replace the edited ones, so earlier steps cannot be undone
+        if self.history is not None:
+            self.history.clear()
+        self.events.emit('ingredients_reset')
+        self.events.emit('meals_reset')
+
+    @read_locked
+    def save_snapshot(self, f_path: str):
+        """
+        Saves ingredients and meals to a binary snapshot for fast loading.
 
+        :param f_path: Full path to .snap file.
+        """
+        write_snapshot(f_path=f_path, arrays=self.get_snapshot_arrays(), meta={'db_code': self.CODE})
+
+    @read_locked
+    def get_ingredient_columns(self) -> dict:
+        """
+        Copies all ingredient values into columns in list order, keyed like get_ingredient_arrays plus 'name' and
+        'types'.
+        """
+        columns = self.get_ingredient_arrays()
+        if self.nutrient_store is not None:
+            rows = [i.row for i in self.ingredients]
+            columns = {key: val[rows] for key, val in columns.items()}
+        columns['name'] = [i.name for i in self.ingredients]
+        # ingredients share few distinct type masks, whose lists are shared as well
+        type_lists = {}
+        columns['types'] = [type_lists.get(i.type_mask) or type_lists.setdefault(i.type_mask, i.types)
+                            for i in self.ingredients]
+
+        return columns
+
+    @read_locked
+    def get_meal_columns(self, with_ingredients: bool = True) -> dict:
+        """
+        Copies all meal values into columns in list order, keyed by 'code', 'name', 'own_types', 'ingredients',
+        'amounts', 'nutrition', 'cooking', 'water', 'cost' and 'weight'.
+
+        :param with_ingredients: If False, 'ingredients' and 'amounts' are left out, which saves most of the time.
+        """
+        if self.meal_records is not None:
+            return self.get_lazy_meal_columns(with_ingredients=with_ingredients)
+        nutrition = np.zeros((len(self.meals), n_nutrients))
+        for i, meal in enumerate(self.meals):
+            nutrition[i] = meal.nutrition
+
+        columns = {'code': np.array([m.CODE for m in self.meals], dtype=np.int64), 'name': [m.name for m in self.meals],
+                   'own_types': [[t.CODE for t in m.own_types] for m in self.meals], 'nutrition': nutrition,
+                   'cooking': np.array([m.cooking for m in self.meals], dtype=bool),
+                   'water': np.array([m.water for m in self.meals], dtype=bool),
+                   'cost': np.array([m.cost for m in self.meals], dtype=float),
+                   'weight': np.array([m.weight for m in self.meals], dtype=float)}
+        if with_ingredients:
+            columns['ingredients'] = [m.get_all_ingredient_codes() for m in self.meals]
+            columns['amounts'] = [m.get_all_ingredient_amounts() for m in self.meals]
+
+        return columns
+
+    def get_lazy_meal_columns(self, with_ingredients: bool = True) -> dict:
+        """
+        Same as get_meal_columns in lazy mode, taking unbuilt meals straight from their raw records.
+        """
+        records = self.meal_records
+        entries = self.meals.get_raw_entries()
+        built = [i for i, e in enumerate(entries) if type(e) is not int]
+        raw = np.array([e for e in entries if type(e) is int], dtype=np.int64)
+        raw_positions = np.array([i for i, e in enumerate(entries) if type(e) is int], dtype=np.int64)
+        columns = {'code': np.zeros(len(entries), dtype=np.int64), 'name': [None] * len(entries),
+                   'own_types': [None] * len(entries), 'nutrition': np.zeros((len(entries), n_nutrients)),
+                   'cooking': np.zeros(len(entries), dtype=bool), 'water': np.zeros(len(entries), dtype=bool),
+                   'cost': np.zeros(len(entries)), 'weight': np.zeros(len(entries))}
+        if with_ingredients:
+            columns['ingredients'] = [None] * len(entries)
+            columns['amounts'] = [None] * len(entries)
+        for key, values in [('code', records.codes), ('nutrition', records.nutrition), ('cooking', records.cooking),
+                            ('water', records.water), ('cost', records.costs), ('weight', records.weights)]:
+            columns[key][raw_positions] = values[raw]
+        for position, row in zip(raw_positions.tolist(), raw.tolist()):
+            columns['name'][position] = records.names[row]
+            columns['own_types'][position] = records.get_type_codes(row)
+            if with_ingredients:
+                columns['ingredients'][position], columns['amounts'][position] = records.get_ingredients(row)
+        for position in built:
+            meal = entries[position]
+            columns['code'][position] = meal.CODE
+            columns['name'][position] = meal.name
+            columns['own_types'][position] = [t.CODE for t in meal.own_types]
+            if with_ingredients:
+                columns['ingredients'][position] = meal.get_all_ingredient_codes()
+                columns['amounts'][position] = meal.get_all_ingredient_amounts()
+            columns['nutrition'][position] = meal.nutrition
+            columns['cooking'][position] = meal.cooking
+            columns['water'][position] = meal.water
+            columns['cost'][position] = meal.cost
+            columns['weight'][position] = meal.weight
+
+        return columns
+
+    @read_locked
+    def get_snapshot_arrays(self, ingredients: dict = None, meals: dict = None, search: dict = None) \
+            -> dict[str, npt.NDArray]:
+        """
+        Packs ingredients, meals and both search indexes into flat arrays for write_snapshot.
+
+        :param ingredients: Columns from get_ingredient_columns, taken from the database if not given.
+        :param meals: Columns from get_meal_columns, taken from the database if not given.
+        :param search: Exports of the ingredient and meal search index by 'i' and 'm', taken from the database if not
+            given.
+        """
+        ing = ingredients if ingredients is not None else self.get_ingredient_columns()
+        meal = meals if meals is not None else self.get_meal_columns()
+        if search is None:
+            search = {'i': self.ingredient_search.to_arrays(), 'm': self.meal_search.to_arrays()}
+        i_names, i_name_offsets = pack_strings(ing['name'])
+        i_types, i_type_offsets = pack_lists(ing['types'], dtype=np.int64)
+        m_names, m_name_offsets = pack_strings(meal['name'])
+        m_types, m_type_offsets = pack_lists(meal['own_types'], dtype=np.int64)
+        m_ingredients, m_ingredient_offsets = pack_lists(meal['ingredients'], dtype=np.int64)
+        m_amounts, _ = pack_lists(meal['amounts'], dtype=float)
+
+        arrays = {'i_code': ing['code'], 'i_name': i_names, 'i_name_offsets': i_name_offsets, 'i_types': i_types,
+                  'i_type_offsets': i_type_offsets, 'i_nutrition': ing['nutrition'], 'i_cooking': ing['cooking'],
+                  'i_water': ing['water'], 'i_price_per_unit': ing['price_per_unit'], 'i_unit_size': ing['unit_size'],
+                  'm_code': meal['code'], 'm_name': m_names, 'm_name_offsets': m_name_offsets, 'm_types': m_types,
+                  'm_type_offsets': m_type_offsets, 'm_ingredients': m_ingredients,
+                  'm_ingredient_offsets': m_ingredient_offsets, 'm_amounts': m_amounts,
+                  'm_nutrition': meal['nutrition'], 'm_cooking': meal['cooking'], 'm_water': meal['water'],
+                  'm_cost': meal['cost'], 'm_weight': meal['weight']}
+        for prefix, (keys, grams, postings, offsets, gram_counts) in search.items():
+            arrays[f'{prefix}_search_keys'], arrays[f'{prefix}_search_key_offsets'] = pack_strings(keys)
+            arrays[f'{prefix}_search_grams'], arrays[f'{prefix}_search_gram_offsets'] = pack_strings(grams)
+            arrays[f'{prefix}_search_postings'] = postings
+            arrays[f'{prefix}_search_posting_offsets'] = offsets
+            arrays[f'{prefix}_search_gram_counts'] = gram_counts
+
+        return arrays
+
+    @write_locked
+    def load_snapshot(self, f_path: str):
+        """
+        Loads ingredients and meals from a memory-mapped binary snapshot.
+
+        :param f_path: Full path to .snap file.
+        """
+        arr, meta = read_snapshot(f_path)
+        search = {}
+        for prefix in ['i', 'm']:
+            search[prefix] = NGramIndex()
+            search[prefix].load_arrays(
+                keys=unpack_strings(arr[f'{prefix}_search_keys'], arr[f'{prefix}_search_key_offsets']),
+                grams=unpack_strings(arr[f'{prefix}_search_grams'], arr[f'{prefix}_search_gram_offsets']),
+                postings=arr[f'{prefix}_search_postings'], offsets=arr[f'{prefix}_search_posting_offsets'],
+                gram_counts=arr[f'{prefix}_search_gram_counts'])
+        self.set_ingredients_from_columns(codes=arr['i_code'],
+                                          names=unpack_strings(arr['i_name'], arr['i_name_offsets']),
+                                          type_values=arr['i_types'], type_offsets=arr['i_type_offsets'],
+                                          nutrition=arr['i_nutrition'], cooking=arr['i_cooking'], water=arr['i_water'],
+                                          price_per_unit=arr['i_price_per_unit'], unit_size=arr['i_unit_size'],
+                                          search_index=search['i'])
+        self.set_meals_from_columns(codes=arr['m_code'], names=unpack_strings(arr['m_name'], arr['m_name_offsets']),
+                                    type_values=arr['m_types'], type_offsets=arr['m_type_offsets'],
+                                    ingredient_codes=arr['m_ingredients'],
+                                    ingredient_offsets=arr['m_ingredient_offsets'], amounts=arr['m_amounts'],
+                                    nutrition=arr['m_nutrition'], cooking=arr['m_cooking'], water=arr['m_water'],
+                                    costs=arr['m_cost'], weights=arr['m_weight'], search_index=search['m'])
+        self.CODE = meta['db_code']
+
+    @read_locked
     def has_ingredients(self) -> bool:
         return bool(self.ingredients)
 
+    @read_locked
     def has_meals(self) -> bool:
         return bool(self.meals)
 
+    @write_locked
     def remove_item(self, item: LocalDatabaseComponent) -> bool:
-        if type(item) is Meal:
+        if isinstance(item, Meal):
             return self.remove_meal_by_name(item.name)
-        elif type(item) is Ingredient:
+        elif isinstance(item, Ingredient):
             return self.remove_ingredient_by_code(item.CODE)
 
+    @read_locked
     def get_all_ingredient_codes_used_in_meals(self) -> list[int]:
-        codes = []
-        for i, meal in enumerate(self.meals):
-            for ingredient, _ in meal.ingredients:
-                if ingredient.CODE not in codes:
-                    codes.append(ingredient.CODE)
+        return list(self.meals_by_ingredient_code)
+
+    @read_locked
+    def is_ingredient_used(self, code: int) -> bool:
+        return code in self.meals_by_ingredient_code
+
+    @read_locked
+    def get_meals_using_ingredient(self, code: int) -> list[Meal]:
+        users = list(self.meals_by_ingredient_code.get(code, {}).items())
+        return [meal if meal is not None else self.get_meal_by_code(meal_code) for meal_code, meal in users]
+
+    @write_locked
+    def link_ingredient_to_meal(self, meal: Meal, ingredient: Ingredient):
+        self.meals_by_ingredient_code.setdefault(ingredient.CODE, {})[meal.CODE] = meal
+        self.changed_meals[meal.CODE] = meal
+        self.meal_matrix = None
+
+    @write_locked
+    def unlink_ingredient_from_meal(self, meal: Meal, ingredient: Ingredient):
+        users = self.meals_by_ingredient_code.get(ingredient.CODE)
+        if users is not None and users.get(meal.CODE) is meal:
+            del users[meal.CODE]
+            if not users:
+                del self.meals_by_ingredient_code[ingredient.CODE]
+            self.changed_meals[meal.CODE] = meal
+        self.meal_matrix = None
+
+    @write_locked
+    def meal_changed(self, meal: Meal):
+        """
+        Called by a linked meal after its ingredients or their amounts changed.
+        """
+        self.changed_meals[meal.CODE] = meal
+        self.meal_matrix = None
+        self.events.emit('meal_updated', item=meal, old_name=meal.name)
 
-        return codes
+    @read_locked
+    def get_meal_matrix(self) -> MealIngredientMatrix:
+        """
+        Returns the sparse meals x ingredients amount matrix, rebuilding it if meals or ingredients changed.
+        """
+        if self.meal_matrix is None:
+            self.meal_matrix = MealIngredientMatrix(meals=self.meals,
+                                                    ingredient_codes=self.get_ingredient_arrays()['code'])
+
+        return self.meal_matrix
 
+    @write_locked
+    def recompute_meals(self):
+        """
+        Recomputes nutrition, cost, weight, cooking and water of all meals with one sparse matrix product against the
+        ingredient table and writes the results back to the meals. Meals whose values changed are saved with the next
+        save.
+        """
+        matrix = self.get_meal_matrix()
+        arrays = self.get_ingredient_arrays()
+        table = np.column_stack([arrays['nutrition'] * 0.01, arrays['price_per_gram'], np.ones(len(arrays['code'])),
+                                 arrays['cooking'], arrays['water']])
+        totals = matrix.dot(table)
+        for meal, row in zip(matrix.meals, totals):
+            values = (float(row[n_nutrients]), float(row[n_nutrients + 1]), bool(row[n_nutrients + 2] > 0),
+                      bool(row[n_nutrients + 3] > 0))
+            if values != (meal.cost, meal.weight, meal.cooking, meal.water) or \
+                    not np.array_equal(meal.nutrition, row[:n_nutrients]):
+                self.changed_meals[meal.CODE] = meal
+            meal.nutrition = row[:n_nutrients]
+            meal.cost, meal.weight, meal.cooking, meal.water = values
+            # counts of cooking and water ingredients are recounted by the next edit
+            meal.cooking_count = None
+            meal.water_count = None
+            meal.edits_since_recompute = 0
+
+    @write_locked
     def remove_ingredient_by_code(self, code: int) -> bool:
-        if code in self.get_ingredient_codes():
-            if code in self.get_all_ingredient_codes_used_in_meals():
+        ingredient = self.ingredients_by_code.get(code)
+        if ingredient is not None:
+            if self.is_ingredient_used(code):
                 raise ItemUsedElsewhereError
             else:
-                self.ingredients.pop(self.get_ingredient_names().index(code))
+                self.drop_ingredient(ingredient)
 
-        if code not in self.get_ingredient_codes():
-            return True
-        else:
-            return False
+        return code not in self.ingredients_by_code
+
+    def index_ingredient(self, ingredient: Ingredient):
+        self.ingredients_by_code[ingredient.CODE] = ingredient
+        self.ingredients_by_name[ingredient.name] = ingredient
+        self.ingredient_search.add(ingredient.name)
+        self.changed_ingredients[ingredient.CODE] = ingredient
+        self.meal_matrix = None
+
+    def new_ingredient(self, CODE: int, name: str, types: npt.NDArray[int], nutrition: npt.NDArray[float],
+                       cooking: bool, water: bool, price_per_unit: float, unit_size: float) -> Ingredient:
+        """
+        Creates an ingredient, backed by the nutrient store in columnar mode.
+        """
+        if self.nutrient_store is not None:
+            return self.nutrient_store.add(CODE=CODE, name=name, types=types, nutrition=nutrition, cooking=cooking,
+                                           water=water, price_per_unit=price_per_unit, unit_size=unit_size)
+
+        return Ingredient(CODE=CODE, name=name, types=types, nutrition=nutrition, cooking=cooking, water=water,
+                          price_per_unit=price_per_unit, unit_size=unit_size)
+
+    @write_locked
+    def drop_ingredient(self, ingredient: Ingredient):
+        position = find_position(self.ingredients, ingredient)
+        del self.ingredients[position]
+        self.unindex_ingredient(ingredient)
+        if self.nutrient_store is not None and getattr(ingredient, 'store', None) is self.nutrient_store:
+            self.nutrient_store.remove(ingredient)
+        self.events.emit('ingredient_removed', item=ingredient)
+        self.record_edit(f'Remove {ingredient.name}', undo=lambda: self.restore_ingredient(ingredient, position),
+                         redo=lambda: self.drop_ingredient(ingredient))
+
+    @write_locked
+    def restore_ingredient(self, ingredient: Ingredient, position: int):
+        """
+        Puts a removed ingredient back at its former position in the ingredient list.
+        """
+        if self.nutrient_store is not None and hasattr(ingredient, 'store'):
+            self.nutrient_store.attach(ingredient)
+        self.ingredients.insert(position, ingredient)
+        self.index_ingredient(ingredient)
+        self.events.emit('ingredient_added', item=ingredient)
+
+    @write_locked
+    def drop_batch(self, ingredients: list[Ingredient], meals: list[Meal]):
+        """
+        Removes many ingredients and meals in one pass over each list, e.g. to undo an import or a merge. Subscribers
+        get one reset per table.
+        """
+        if ingredients:
+            dropped = {id(i) for i in ingredients}
+            self.ingredients[:] = [i for i in list.__iter__(self.ingredients) if id(i) not in dropped]
+            for ingredient in ingredients:
+                self.unindex_ingredient(ingredient)
+                if self.nutrient_store is not None and getattr(ingredient, 'store', None) is self.nutrient_store:
+                    self.nutrient_store.remove(ingredient)
+            self.events.emit('ingredients_reset')
+        if meals:
+            dropped = {id(m) for m in meals}
+            self.meals[:] = [m for m in list.__iter__(self.meals) if id(m) not in dropped]
+            for meal in meals:
+                self.unindex_meal(meal)
+            self.events.emit('meals_reset')
+
+    @write_locked
+    def restore_batch(self, ingredients: list[Ingredient], meals: list[Meal]):
+        """
+        Appends ingredients and meals removed by drop_batch again.
+        """
+        if ingredients:
+            for ingredient in ingredients:
+                if self.nutrient_store is not None and hasattr(ingredient, 'store'):
+                    self.nutrient_store.attach(ingredient)
+                self.ingredients.append(ingredient)
+                self.index_ingredient(ingredient)
+            self.events.emit('ingredients_reset')
+        if meals:
+            for meal in meals:
+                self.meals.append(meal)
+                self.index_meal(meal)
+            self.events.emit('meals_reset')
+
+    def record_added_batch(self, description: str, ingredients: list[Ingredient], meals: list[Meal]):
+        """
+        Records ingredients and meals that were just added together as one step of the EditHistory.
+        """
+        if ingredients or meals:
+            self.record_edit(description, undo=lambda: self.drop_batch(ingredients, meals),
+                             redo=lambda: self.restore_batch(ingredients, meals))
+
+    @read_locked
+    def get_ingredient_arrays(self) -> dict[str, npt.NDArray]:
+        """
+        Returns numerical values of all ingredients as arrays with one entry per ingredient, keyed by 'code',
+        'nutrition', 'price_per_unit', 'unit_size', 'price_per_gram', 'cooking' and 'water'. In columnar mode these are
+        views into the nutrient store, otherwise they are built from the ingredient objects.
+        """
+        if self.nutrient_store is not None:
+            return self.nutrient_store.columns()
+
+        n = len(self.ingredients)
+        nutrition = np.zeros((n, n_nutrients))
+        for i, ingredient in enumerate(self.ingredients):
+            nutrition[i] = ingredient.nutrition
+
+        return {'code': np.array([i.CODE for i in self.ingredients], dtype=np.int64), 'nutrition': nutrition,
+                'price_per_unit': np.array([i.price_per_unit for i in self.ingredients], dtype=float),
+                'unit_size': np.array([i.unit_size for i in self.ingredients], dtype=float),
+                'price_per_gram': np.array([i.price_per_gram for i in self.ingredients], dtype=float),
+                'cooking': np.array([i.cooking for i in self.ingredients], dtype=bool),
+                'water': np.array([i.water for i in self.ingredients], dtype=bool)}
+
+    def unindex_ingredient(self, ingredient: Ingredient):
+        self.ingredients_by_code.pop(ingredient.CODE, None)
+        self.changed_ingredients[ingredient.CODE] = None
+        if self.ingredients_by_name.get(ingredient.name) is ingredient:
+            del self.ingredients_by_name[ingredient.name]
+            self.ingredient_search.remove(ingredient.name)
+        self.meal_matrix = None
+
+    def index_meal(self, meal: Meal, mark_changed: bool = True):
+        """
+        Adds a meal to the lookup tables.
 
-    def save_ingredients_to_file(self, db_dir: str, base_name_no_ending: str):
+        :param mark_changed: If False, the meal is not saved with the next save, e.g. when a lazy meal is built.
+        """
+        self.meals_by_code[meal.CODE] = meal
+        self.meals_by_name[meal.name] = meal
+        self.meal_search.add(meal.name)
+        if mark_changed:
+            self.changed_meals[meal.CODE] = meal
+        meal.linked_database = self
+        self.meal_matrix = None
+        # linked directly rather than through the write locked hook, lazy meals are indexed while reading
+        for ingredient, _ in meal.ingredients:
+            self.meals_by_ingredient_code.setdefault(ingredient.CODE, {})[meal.CODE] = meal
+
+    def unindex_meal(self, meal: Meal):
+        self.meals_by_code.pop(meal.CODE, None)
+        if self.meals_by_name.get(meal.name) is meal:
+            del self.meals_by_name[meal.name]
+            self.meal_search.remove(meal.name)
+        for ingredient, _ in meal.ingredients:
+            self.unlink_ingredient_from_meal(meal=meal, ingredient=ingredient)
+        self.changed_meals[meal.CODE] = None
+        meal.linked_database = None
+        self.meal_matrix = None
+
+    @write_locked
+    def rebuild_indexes(self):
+        """
+        Rebuilds the code and name lookup tables from the ingredient and meal lists.
+        """
+        self.ingredients_by_code = {i.CODE: i for i in self.ingredients}
+        self.ingredients_by_name = {i.name: i for i in self.ingredients}
+        self.ingredient_search.rebuild(list(self.ingredients_by_name))
+        self.meals_by_code = {}
+        self.meals_by_name = {}
+        self.meals_by_ingredient_code = {}
+        self.meal_search = NGramIndex()
+        for meal in self.meals:
+            self.index_meal(meal)
+
+    @read_locked
+    def save_ingredients_to_file(self, db_dir: str, base_name_no_ending: str, columns: dict = None):
         """
         Saves ingredients to .csv file.
 
         :param db_dir: Directory of database saves, including \\ tail.
         :param base_name_no_ending: Base name without ending
+        :param columns: Values from get_ingredient_columns, taken from the database if not given.
+        """
+        if columns is None:
+            columns = self.get_ingredient_columns()
+        with AtomicFileWriter(f'{db_dir}{base_name_no_ending}_ingredients.csv', sep=self.sep) as writer:
+            writer.write_row(['code', 'name', 'energy', 'fat', 'sat_fat', 'carbs', 'sugar', 'fiber', 'protein', 'salt',
+                              'cooking', 'water', 'price_per_unit', 'unit_size', 'price_per_gram', 'types'])
+            writer.write_columns([columns['code'].tolist(), columns['name'], *columns['nutrition'].T.tolist(),
+                                  columns['cooking'].tolist(), columns['water'].tolist(),
+                                  columns['price_per_unit'].tolist(), columns['unit_size'].tolist(),
+                                  columns['price_per_gram'].tolist(), self.join_type_lists(columns['types'])])
+
+    def join_type_lists(self, type_lists: list[list[int]]) -> list[str]:
+        """
+        Formats type lists as '0--2--' strings. Items share few distinct type lists, so each is formatted only once.
         """
-        with open(f'{db_dir}{base_name_no_ending}_ingredients.csv', 'w') as file:
-            file.write(
-                f'code{self.sep}name{self.sep} energy{self.sep} fat{self.sep} sat_fat{self.sep} carbs{self.sep}'
-                f'sugar{self.sep} fiber{self.sep} protein{self.sep} salt{self.sep} cooking{self.sep} water{self.sep} '
-                f'price_per_unit{self.sep} unit_size{self.sep} price_per_gram{self.sep} types\n'.replace(' ', ''))
-            for i in self.ingredients:
-                types = ''
-                for j in i.types:
-                    types += f'{j}--'
-
-                file.write(
-                    f'{i.CODE}{self.sep}{i.name}{self.sep} {i.nutrition[0]}{self.sep} {i.nutrition[1]}{self.sep} '
-                    f'{i.nutrition[2]}{self.sep} {i.nutrition[3]}{self.sep} '
-                    f'{i.nutrition[4]}{self.sep} {i.nutrition[5]}{self.sep} '
-                    f'{i.nutrition[6]}{self.sep} {i.nutrition[7]}{self.sep} '
-                    f'{i.cooking}{self.sep} {i.water}{self.sep} {i.price_per_unit}{self.sep} '
-                    f'{i.unit_size}{self.sep} {i.price_per_gram}{self.sep} {types}\n')
+        strings = {}
+        return [strings.get(key) or strings.setdefault(key, ''.join([f'{j}--' for j in key]))
+                for key in map(tuple, type_lists)]
 
+    @write_locked
     def load_ingredients_from_file(self, f_path: str):
         """
         Loads ingredients from .csv file.
 
         :param f_path: Full path to file.
         """
-        self.ingredients = []
-        data = pd.read_csv(f_path, sep=self.sep)
-        for index, name in enumerate(data.name):
-            types = [int(i) for i in data.types[index].split('--')[:-1]]
-            if data.water[index].lower().strip() in self.string_true:
-                water = True
-            else:
-                water = False
-            if data.cooking[index].lower().strip() in self.string_true:
-                cooking = True
-            else:
-                cooking = False
-            item = Ingredient(CODE=data.iloc[index, 0], name=name, nutrition=np.array(data.iloc[index, 2:10]),
-                              types=types, cooking=cooking, water=water,
-                              price_per_unit=float(data.price_per_unit[index]), unit_size=float(data.unit_size[index]),
-                              price_per_gram=float(data.price_per_gram[index]))
-            self.ingredients.append(item)
-        self.new_ingredient_code = int(np.max(self.get_ingredient_codes())) + 1
+        # the default float parser may be off in the last digit, so values would drift with every save and load
+        data = pd.read_csv(f_path, sep=self.sep, float_precision='round_trip')
+        type_values, type_offsets = self.split_list_column(data.types, sep='--')
+        self.set_ingredients_from_columns(codes=data.iloc[:, 0].to_numpy(dtype=np.int64), names=data['name'].tolist(),
+                                          type_values=type_values, type_offsets=type_offsets,
+                                          nutrition=data.iloc[:, 2:10].to_numpy(dtype=float),
+                                          cooking=self.parse_bool_column(data.cooking),
+                                          water=self.parse_bool_column(data.water),
+                                          price_per_unit=data.price_per_unit.to_numpy(dtype=float),
+                                          unit_size=data.unit_size.to_numpy(dtype=float))
+
+    @write_locked
+    def set_ingredients_from_columns(self, codes: npt.NDArray[int], names: list[str], type_values: npt.NDArray[int],
+                                     type_offsets: npt.NDArray[int], nutrition: npt.NDArray[float],
+                                     cooking: npt.NDArray[bool], water: npt.NDArray[bool],
+                                     price_per_unit: npt.NDArray[float], unit_size: npt.NDArray[float],
+                                     search_index: NGramIndex = None):
+        """
+        Replaces all ingredients with ones built from column arrays in a single pass.
 
-    def save_meals_to_file(self, db_dir: str, base_name_no_ending: str):
+        :param type_values: Flat type indices of all ingredients, ingredient i owns
+            type_values[type_offsets[i]:type_offsets[i + 1]].
+        :param search_index: Prebuilt search index over the names, built from scratch if not given.
+        """
+        self.ingredients = []
+        self.ingredients_by_code = {}
+        self.ingredients_by_name = {}
+        self.ingredient_search = search_index if search_index is not None else NGramIndex()
+        bounds = np.asarray(type_offsets).tolist()
+        flat_types = np.asarray(type_values).tolist()
+        types = [flat_types[bounds[i]:bounds[i + 1]] for i in range(len(codes))]
+        columns = {'codes': codes, 'names': names, 'types': types, 'nutrition': nutrition, 'cooking': cooking,
+                   'water': water, 'price_per_unit': price_per_unit, 'unit_size': unit_size}
+        if self.columnar:
+            self.nutrient_store = NutrientStore(capacity=max(len(codes), 1))
+            self.ingredients = self.nutrient_store.extend(**columns)
+        else:
+            self.ingredients = [Ingredient(CODE=int(c), name=name, types=t, nutrition=np.array(nut, dtype=float),
+                                           cooking=bool(cook), water=bool(wat), price_per_unit=float(ppu),
+                                           unit_size=float(us))
+                                for c, name, t, nut, cook, wat, ppu, us in zip(*columns.values())]
+        for item in self.ingredients:
+            self.index_ingredient(item)
+        self.changed_ingredients = {}
+        self.new_ingredient_code = int(np.max(codes)) + 1 if len(codes) else 0
+        self.events.emit('ingredients_reset')
+
+    @read_locked
+    def save_meals_to_file(self, db_dir: str, base_name_no_ending: str, columns: dict = None):
         """
         Saves meals to .csv files.
 
         :param db_dir: Directory of database saves, including \\ tail.
         :param base_name_no_ending: Base name without ending
+        :param columns: Values from get_meal_columns, taken from the database if not given.
         """
-        with open(f'{db_dir}{base_name_no_ending}_meals.csv', 'w') as file:
-            file.write(f'code{self.sep}name{self.sep} energy{self.sep} fat{self.sep} sat_fat{self.sep} carbs{self.sep}'
-                       f'sugar{self.sep} fiber{self.sep} protein{self.sep} salt{self.sep} own_types{self.sep} '
-                       f'ingredients{self.sep} amount{self.sep} cooking{self.sep} water{self.sep} cost{self.sep} '
-                       f'weight\n'.replace(' ', ''))
-            for i in self.meals:
-                types = ''
-                for j in i.own_types:
-                    types += f'{j.CODE}--'
-
-                file.write(
-                    f'{i.CODE}{self.sep}{i.name}{self.sep} {i.nutrition[0]}{self.sep} {i.nutrition[1]}{self.sep} '
-                    f'{i.nutrition[2]}{self.sep} {i.nutrition[3]}{self.sep} {i.nutrition[4]}{self.sep} '
-                    f'{i.nutrition[5]}{self.sep} {i.nutrition[6]}{self.sep} {i.nutrition[7]}{self.sep} '
-                    f'{types}{self.sep}{i.get_all_ingredient_codes()}{self.sep} '
-                    f'{i.get_all_ingredient_amounts()}{self.sep} {i.cooking}{self.sep} {i.water}{self.sep} '
-                    f'{i.cost}{self.sep} {i.weight}\n')
-
+        if columns is None:
+            columns = self.get_meal_columns()
+        with AtomicFileWriter(f'{db_dir}{base_name_no_ending}_meals.csv', sep=self.sep) as writer:
+            writer.write_row(['code', 'name', 'energy', 'fat', 'sat_fat', 'carbs', 'sugar', 'fiber', 'protein', 'salt',
+                              'own_types', 'ingredients', 'amount', 'cooking', 'water', 'cost', 'weight'])
+            writer.write_columns([columns['code'].tolist(), columns['name'], *columns['nutrition'].T.tolist(),
+                                  self.join_type_lists(columns['own_types']), columns['ingredients'],
+                                  columns['amounts'], columns['cooking'].tolist(), columns['water'].tolist(),
+                                  columns['cost'].tolist(), columns['weight'].tolist()])
+
+    @write_locked
     def load_meals_from_file(self, f_path: str):
         """
         Loads meals from .csv file.
 
         :param f_path: Full path to file.
         """
-        data = pd.read_csv(f_path, sep=self.sep)
-        for i, in_str in enumerate(data.ingredients):
-            types = [self.num_to_meal_type(int(i)) for i in data.own_types[i].split('--')[:-1]]
-            if data.water[i].lower().strip() in self.string_true:
-                water = True
-            else:
-                water = False
-            if data.cooking[i].lower().strip() in self.string_true:
-                cooking = True
-            else:
-                cooking = False
-            ingredients = self.ingredient_and_amount_str_to_list(in_str=in_str, am_str=data.amount[i])
-            meal = Meal(CODE=data.iloc[i, 0], name=data.name[i], nutrition=np.array(data.iloc[i, 2:10]),
-                        own_types=types,
-                        ingredients=ingredients, cooking=cooking, water=water, cost=float(data.cost[i]),
-                        weight=float(data.weight[i]))
+        data = pd.read_csv(f_path, sep=self.sep, float_precision='round_trip')
+        type_values, type_offsets = self.split_list_column(data.own_types, sep='--')
+        in_codes, in_offsets = self.split_list_column(data.ingredients, sep=',', strip='[]\' ')
+        amounts, _ = self.split_list_column(data.amount, sep=',', strip='[]\' ', dtype=float)
+        self.set_meals_from_columns(codes=data.iloc[:, 0].to_numpy(dtype=np.int64), names=data['name'].tolist(),
+                                    type_values=type_values, type_offsets=type_offsets, ingredient_codes=in_codes,
+                                    ingredient_offsets=in_offsets, amounts=amounts,
+                                    nutrition=data.iloc[:, 2:10].to_numpy(dtype=float),
+                                    cooking=self.parse_bool_column(data.cooking),
+                                    water=self.parse_bool_column(data.water), costs=data.cost.to_numpy(dtype=float),
+                                    weights=data.weight.to_numpy(dtype=float))
+
+    @write_locked
+    def set_meals_from_columns(self, codes: npt.NDArray[int], names: list[str], type_values: npt.NDArray[int],
+                               type_offsets: npt.NDArray[int], ingredient_codes: npt.NDArray[int],
+                               ingredient_offsets: npt.NDArray[int], amounts: npt.NDArray[float],
+                               nutrition: npt.NDArray[float], cooking: npt.NDArray[bool], water: npt.NDArray[bool],
+                               costs: npt.NDArray[float], weights: npt.NDArray[float],
+                               search_index: NGramIndex = None):
+        """
+        Replaces all meals with ones built from column arrays in a single pass. Ingredients must be loaded already.
+
+        :param type_values: Flat meal type codes, meal i owns type_values[type_offsets[i]:type_offsets[i + 1]].
+        :param ingredient_codes: Flat ingredient codes, meal i owns the slice given by ingredient_offsets, amounts
+            share the same offsets.
+        :param search_index: Prebuilt search index over the names, built from scratch if not given.
+        """
+        self.meals = []
+        self.meals_by_code = {}
+        self.meals_by_name = {}
+        self.meals_by_ingredient_code = {}
+        self.meal_records = None
+        self.meal_search = search_index if search_index is not None else NGramIndex()
+        if self.lazy_meals:
+            self.set_lazy_meals(MealRecords(codes=codes, names=names, type_values=type_values,
+                                            type_offsets=type_offsets, ingredient_codes=ingredient_codes,
+                                            ingredient_offsets=ingredient_offsets, amounts=amounts,
+                                            nutrition=nutrition, cooking=cooking, water=water, costs=costs,
+                                            weights=weights), build_search_index=search_index is None)
+            self.events.emit('meals_reset')
+            return
+        in_codes = np.asarray(ingredient_codes).tolist()
+        ingredients = [self.ingredients_by_code[c] for c in in_codes]
+        amounts = np.asarray(amounts).tolist()
+        type_values = np.asarray(type_values).tolist()
+        type_bounds = np.asarray(type_offsets).tolist()
+        in_bounds = np.asarray(ingredient_offsets).tolist()
+        for i, (code, name) in enumerate(zip(np.asarray(codes).tolist(), names)):
+            types = [self.meal_types[t] for t in type_values[type_bounds[i]:type_bounds[i + 1]]]
+            start, stop = in_bounds[i], in_bounds[i + 1]
+            meal = Meal(CODE=code, name=name, nutrition=np.array(nutrition[i], dtype=float), own_types=types,
+                        ingredients=MealIngredients.from_columns(codes=in_codes[start:stop],
+                                                                 items=ingredients[start:stop],
+                                                                 amounts=amounts[start:stop]),
+                        cooking=bool(cooking[i]), water=bool(water[i]), cost=float(costs[i]),
+                        weight=float(weights[i]))
 
             self.meals.append(meal)
-        self.new_meal_code = int(np.max(self.get_meal_codes())) + 1
+            self.index_meal(meal)
+        self.changed_meals = {}
+        self.new_meal_code = int(np.max(codes)) + 1 if len(codes) else 0
+        self.events.emit('meals_reset')
+
+    def set_lazy_meals(self, records: MealRecords, build_search_index: bool):
+        """
+        Makes records the unbuilt meals of the database. Only the lookup tables needed without building meals are
+        filled, users of an ingredient are indexed by meal code until the meal is built.
+        """
+        self.meal_records = records
+        self.meals = LazyMealList(records=records, build=self.build_meal)
+        counts = np.diff(records.ingredient_offsets)
+        for in_code, meal_code in zip(records.ingredient_codes.tolist(),
+                                      np.repeat(records.codes, counts).tolist()):
+            self.meals_by_ingredient_code.setdefault(in_code, {})[meal_code] = None
+        if build_search_index:
+            for name in records.names:
+                self.meal_search.add(name)
+        self.changed_meals = {}
+        self.new_meal_code = int(np.max(records.codes)) + 1 if len(records) else 0
+
+    def build_meal(self, row: int) -> Meal:
+        """
+        Builds the meal of a raw record row and indexes it like a loaded meal.
+
+        :param row: Row in meal_records.
+        :return: Built meal.
+        """
+        records = self.meal_records
+        # readers holding the shared read lock may build meals concurrently, each meal is built only once
+        with self.build_lock:
+            built = self.meals_by_code.get(int(records.codes[row]))
+            if built is not None:
+                return built
+            in_codes, amounts = records.get_ingredients(row)
+            meal = Meal(CODE=int(records.codes[row]), name=records.names[row],
+                        own_types=[self.meal_types[t] for t in records.get_type_codes(row)],
+                        ingredients=[[self.ingredients_by_code[c], a] for c, a in zip(in_codes, amounts)],
+                        nutrition=records.nutrition[row].copy(), cooking=bool(records.cooking[row]),
+                        water=bool(records.water[row]), cost=float(records.costs[row]),
+                        weight=float(records.weights[row]))
+            records.forget(row)
+            self.meals.set_built(row, meal)
+            # a built meal is unchanged, the change sets are left alone for readers such as save to iterate them
+            self.index_meal(meal, mark_changed=False)
+
+        return meal
+
+    def parse_bool_column(self, column: pd.Series) -> npt.NDArray[bool]:
+        """
+        Parses a column of 'True'/'False' strings.
+        """
+        return column.astype(str).str.strip().str.lower().isin(self.string_true).to_numpy()
+
+    def split_list_column(self, column: pd.Series, sep: str, strip: str = '', dtype: type = np.int64) \
+            -> tuple[npt.NDArray, npt.NDArray[int]]:
+        """
+        Parses a column of separated lists, such as '0--2--' or '[3, 5]', in one pass over the joined column.
+
+        :param column: Column of list strings.
+        :param sep: Separator between entries.
+        :param strip: Characters to remove from both ends of each cell, such as brackets.
+        :param dtype: Type of the entries.
+        :return: Flat array of all entries and offsets, so that row i holds values[offsets[i]:offsets[i + 1]].
+        """
+        cells = column.fillna('').astype(str).str.strip(strip).str.strip(sep.strip() or sep)
+        counts = np.where(cells.str.len() > 0, cells.str.count(sep) + 1, 0)
+        offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        joined = sep.join(c for c in cells if c)
+        values = np.array(joined.split(sep) if joined else [], dtype=float).astype(dtype)
+
+        return values, offsets
 
     def ingredient_and_amount_str_to_list(self, in_str: str, am_str: str) -> list[list[Union[Ingredient, float]]]:
         in_strings = in_str.replace('[', '').replace(']', '').replace("'", "").split(',')
@@ -224,71 +1053,83 @@ class LocalDatabase:
 
         return ret_list
 
+    @read_locked
     def get_ingredient_by_name(self, name: str) -> Ingredient:
-        try:
-            ind = self.get_ingredient_names().index(name)
-            return self.ingredients[ind]
-        except ValueError as ex:
-            print(ex)
+        return self.ingredients_by_name.get(name)
 
+    @read_locked
     def get_ingredient_by_code(self, code: int) -> Ingredient:
-        try:
-            ind = self.get_ingredient_codes().index(code)
-            return self.ingredients[ind]
-        except ValueError as ex:
-            print(ex)
-
-    def get_ingredient_codes(self) -> list[int]:
-        return [i.CODE for i in self.ingredients]
+        return self.ingredients_by_code.get(code)
 
+    @write_locked
     def remove_ingredient_by_name(self, name: str) -> bool:
-        if name in self.get_ingredient_names():
-            self.ingredients.pop(self.get_ingredient_names().index(name))
+        ingredient = self.ingredients_by_name.get(name)
+        if ingredient is not None:
+            self.drop_ingredient(ingredient)
 
-        if name not in self.get_ingredient_names():
-            return True
-        else:
-            return False
+        return name not in self.ingredients_by_name
 
+    @write_locked
     def update_ingredient(self, in_code: int, name: str, types: npt.NDArray[int], nutrition: npt.NDArray[float],
                           cooking: bool, water: bool, price_per_unit: float, unit_size: float) -> bool:
-        if in_code not in self.get_ingredient_codes():
+        ingredient = self.ingredients_by_code.get(in_code)
+        if ingredient is None:
             return False
         else:
-            ingredient = self.get_ingredient_by_code(in_code)
+            old_name = ingredient.name
+            # nutrition is copied, in columnar mode it is a view into the store that the update overwrites
+            old_values = {'name': old_name, 'types': ingredient.types, 'nutrition': np.array(ingredient.nutrition),
+                          'cooking': ingredient.cooking, 'water': ingredient.water,
+                          'price_per_unit': ingredient.price_per_unit, 'unit_size': ingredient.unit_size}
+            new_values = {'name': name, 'types': types, 'nutrition': np.array(nutrition, dtype=float),
+                          'cooking': cooking, 'water': water, 'price_per_unit': price_per_unit,
+                          'unit_size': unit_size}
+            self.unindex_ingredient(ingredient)
             ingredient.update(name=name, nutrition=nutrition, water=water, types=types, cooking=cooking,
                               price_per_unit=price_per_unit, unit_size=unit_size)
+            self.index_ingredient(ingredient)
+            self.events.emit('ingredient_updated', item=ingredient, old_name=old_name)
+            self.record_edit(f'Update {name}',
+                             undo=lambda: self.update_ingredient(in_code=in_code, **old_values),
+                             redo=lambda: self.update_ingredient(in_code=in_code, **new_values))
+            for meal in self.get_meals_using_ingredient(in_code):
+                meal.update_nutrients_weight_cost()
+                meal.update_cooking_and_water()
+                self.meal_changed(meal)
+            return True
 
+    @write_locked
     def replace_meal(self, old_meal: Meal, new_meal: Meal) -> bool:
-        if old_meal in self.meals:
+        if self.meals_by_code.get(old_meal.CODE) is old_meal:
             ind = self.meals.index(old_meal)
             self.meals[ind] = new_meal
+            self.unindex_meal(old_meal)
+            self.index_meal(new_meal)
+            self.events.emit('meal_updated', item=new_meal, old_name=old_meal.name)
+            self.record_edit(f'Update {new_meal.name}', undo=lambda: self.replace_meal(new_meal, old_meal),
+                             redo=lambda: self.replace_meal(old_meal, new_meal))
             return True
         else:
             return False
 
-    def search_by_name(self, mode: str, search_text: str) -> list[str]:
+    @read_locked
+    def search_by_name(self, mode: str, search_text: str, top_k: int = 50) -> list[str]:
+        """
+        Searches ingredient or meal names with the n-gram index.
+
+        :param mode: 'ingredients' or 'meals'.
+        :param search_text: Text to search for. Case, accents and small typos are ignored.
+        :param top_k: Maximum number of hits.
+        :return: Names ordered from best to worst match.
+        """
         if mode == 'ingredients':
-            names = self.get_ingredient_names()
+            index = self.ingredient_search
         elif mode == 'meals':
-            names = self.get_meal_names()
-        elif mode == 'trips':
-            names = []
+            index = self.meal_search
         else:
             return []
-        hits = []
-        search_len = len(search_text)
-        if search_len <= 2:
-            for name in names:
-                if search_text == name[:search_len]:
-                    hits.append(name)
 
-        elif search_len > 2:
-            for name in names:
-                if search_text in name:
-                    hits.append(name)
-
-        return hits
+        return index.query(search_text, top_k=top_k)
 
     def num_to_meal_type(self, num: Union[int, list[int]]) -> Union[MealType, list[MealType]]:
         if type(num) is int:
@@ -296,6 +1137,7 @@ class LocalDatabase:
         elif type(num) is list[int]:
             return [self.meal_types[i] for i in num]
 
+    @write_locked
     def add_meal(self, name: str, own_type: Union[int, MealType, list[int], list[MealType]],
                  ingredients: list[list[Ingredient, float]] = None):
         nutrition_vals = np.zeros(n_nutrients)
@@ -325,21 +1167,110 @@ class LocalDatabase:
 
         self.new_meal_code += 1
         self.meals.append(meal)
+        self.index_meal(meal)
+        self.events.emit('meal_added', item=meal)
+        self.record_edit(f'Add {name}', undo=lambda: self.drop_meal(meal),
+                         redo=lambda: self.restore_meal(meal, len(self.meals)))
 
+    @read_locked
     def get_meal_names(self) -> list[str]:
+        if self.meal_records is not None:
+            return [self.meal_records.names[m] if type(m) is int else m.name for m in self.meals.get_raw_entries()]
         names = []
         for m in self.meals:
             names.append(m.name)
 
         return names
 
+    @write_locked
     def add_ingredient(self, name: str, nutrients: npt.NDArray, types: npt.NDArray, water: bool, cooking: bool,
                        price_per_unit: float, unit_size: float):
-        ingredient = Ingredient(CODE=self.new_ingredient_code, name=name, nutrition=nutrients, water=water,
-                                cooking=cooking, price_per_unit=price_per_unit, unit_size=unit_size, types=types)
+        ingredient = self.new_ingredient(CODE=self.new_ingredient_code, name=name, nutrition=nutrients, water=water,
+                                         cooking=cooking, price_per_unit=price_per_unit, unit_size=unit_size,
+                                         types=types)
         self.new_ingredient_code += 1
         self.ingredients.append(ingredient)
+        self.index_ingredient(ingredient)
+        self.events.emit('ingredient_added', item=ingredient)
+        self.record_edit(f'Add {name}', undo=lambda: self.drop_ingredient(ingredient),
+                         redo=lambda: self.restore_ingredient(ingredient, len(self.ingredients)))
+
+    @write_locked
+    def add_ingredients_from_columns(self, names: list[str], types: list[list[int]], nutrition: npt.NDArray[float],
+                                     cooking: npt.NDArray[bool], water: npt.NDArray[bool],
+                                     price_per_unit: npt.NDArray[float], unit_size: npt.NDArray[float]) -> int:
+        """
+        Adds many ingredients at once from column arrays, allocating one block of codes for all of them. Names that
+        already exist in the database or occur twice in the columns are skipped.
 
+        :param types: Type indices of each ingredient.
+        :return: Number of added ingredients.
+        """
+        seen = set(self.ingredients_by_name)
+        keep = []
+        for i, name in enumerate(names):
+            if name not in seen:
+                seen.add(name)
+                keep.append(i)
+        if not keep:
+            return 0
+
+        n = len(keep)
+        codes = np.arange(self.new_ingredient_code, self.new_ingredient_code + n, dtype=np.int64)
+        self.new_ingredient_code += n
+        columns = {'codes': codes, 'names': [names[i] for i in keep], 'types': [list(types[i]) for i in keep],
+                   'nutrition': np.asarray(nutrition, dtype=float)[keep], 'cooking': np.asarray(cooking)[keep],
+                   'water': np.asarray(water)[keep], 'price_per_unit': np.asarray(price_per_unit, dtype=float)[keep],
+                   'unit_size': np.asarray(unit_size, dtype=float)[keep]}
+        if self.nutrient_store is not None:
+            items = self.nutrient_store.extend(**columns)
+        else:
+            items = [Ingredient(CODE=int(c), name=name, types=t, nutrition=np.array(nut, dtype=float),
+                                cooking=bool(cook), water=bool(wat), price_per_unit=float(ppu), unit_size=float(us))
+                     for c, name, t, nut, cook, wat, ppu, us in zip(*columns.values())]
+        self.ingredients.extend(items)
+        for item in items:
+            self.index_ingredient(item)
+            self.events.emit('ingredient_added', item=item)
+        self.record_added_batch(f'Add {n} ingredients', ingredients=items, meals=[])
+
+        return n
+
+    def import_ingredients(self, f_path: str, column_map: dict[str, str] = None, progress=None) -> int:
+        """
+        Imports ingredients from a food composition table in .csv, .jsonl or gzip-compressed form, streaming it in
+        chunks. See importer.read_import_chunks for the column map.
+
+        :param progress: Called with the fraction of the file read after every chunk.
+        :return: Number of imported ingredients.
+        """
+        n_before = len(self.ingredients)
+        with self.pause_history():
+            count = import_ingredients(db=self, f_path=f_path, column_map=column_map, progress=progress)
+        self.record_added_batch('Import ingredients', ingredients=self.ingredients[n_before:], meals=[])
+
+        return count
+
+    @write_locked
+    def merge(self, other: 'LocalDatabase') -> MergeReport:
+        """
+        Merges all ingredients and meals of another database into this one, skipping duplicates. See
+        merge.merge_databases for how duplicates and conflicts are detected.
+
+        :param other: Database to merge from, it is not changed.
+        :return: Code mapping from other to this database and name conflicts.
+        """
+        n_ingredients = len(self.ingredients)
+        n_meals = len(self.meals)
+        with self.pause_history():
+            report = merge_databases(target=self, source=other)
+        # added items are appended, so the tail of the meal list holds built meals only, even in lazy mode
+        self.record_added_batch('Merge database', ingredients=self.ingredients[n_ingredients:],
+                                meals=self.meals[n_meals:])
+
+        return report
+
+    @read_locked
     def get_ingredient_names(self):
         names = []
         for i in self.ingredients:
@@ -356,23 +1287,44 @@ class LocalDatabase:
 
         return names
 
+    @write_locked
     def remove_meal_by_name(self, name: str):
-        if name in self.get_meal_names():
-            ind = self.get_meal_names().index(name)
-            self.meals.pop(ind)
-
-        if name not in self.get_meal_names():
-            return True
-        else:
-            return False
+        meal = self.get_meal_by_name(name)
+        if meal is not None:
+            self.drop_meal(meal)
+
+        return name not in self.meals_by_name
+
+    @write_locked
+    def drop_meal(self, meal: Meal):
+        position = find_position(self.meals, meal)
+        del self.meals[position]
+        self.unindex_meal(meal)
+        self.events.emit('meal_removed', item=meal)
+        self.record_edit(f'Remove {meal.name}', undo=lambda: self.restore_meal(meal, position),
+                         redo=lambda: self.drop_meal(meal))
+
+    @write_locked
+    def restore_meal(self, meal: Meal, position: int):
+        """
+        Puts a removed meal back at its former position in the meal list.
+        """
+        self.meals.insert(position, meal)
+        self.index_meal(meal)
+        self.events.emit('meal_added', item=meal)
 
+    @read_locked
     def get_meal_codes(self) -> list[int]:
+        if self.meal_records is not None:
+            return [int(self.meal_records.codes[m]) if type(m) is int else m.CODE
+                    for m in self.meals.get_raw_entries()]
         codes = []
         for m in self.meals:
             codes.append(m.CODE)
 
         return codes
 
+    @read_locked
     def get_ingredient_codes(self) -> list[int]:
         codes = []
         for i in self.ingredients:
@@ -380,10 +1332,35 @@ class LocalDatabase:
 
         return codes
 
+    @read_locked
     def get_meal_by_name(self, name: str):
-        if name in self.get_meal_names():
-            return self.meals[self.get_meal_names().index(name)]
+        meal = self.meals_by_name.get(name)
+        # looked up once, a concurrent build may drop the row between a check and a second lookup
+        row = self.meal_records.row_of_name.get(name) if meal is None and self.meal_records is not None else None
+        if row is not None:
+            meal = self.build_meal(row)
+
+        return meal
 
+    @read_locked
     def get_meal_by_code(self, code: int):
-        if code in self.get_meal_codes():
-            return self.meals[self.get_meal_codes().index(code)]
+        meal = self.meals_by_code.get(code)
+        row = self.meal_records.row_of_code.get(code) if meal is None and self.meal_records is not None else None
+        if row is not None:
+            meal = self.build_meal(row)
+
+        return meal
+
+
+def find_position(items: list, item) -> int:
+    """
+    Position of an item in a list by identity. Unlike list.remove, no items are compared by value and unbuilt lazy
+    meals are not built. A recently added item at the end is found in constant time.
+    """
+    if items and list.__getitem__(items, -1) is item:
+        return len(items) - 1
+    for position, entry in enumerate(list.__iter__(items)):
+        if entry is item:
+            return position
+
+    raise ValueError('Item is not in list!')
@@ -7,3 +7,8 @@ class NoIngredientPassedError(Exception):
 class ItemUsedElsewhereError(Exception):
     def __init__(self):
         super().__init__('Item is used somewhere!')
+
+
+class SnapshotFormatError(Exception):
+    def __init__(self, f_path: str):
+        super().__init__(f'{f_path} is not a readable database snapshot!')
@@ -0,0 +1,59 @@
+import weakref
+from contextlib import contextmanager
+from typing import Callable
+
+
+class EventBus:
+    """Synchronous publish-subscribe channel for change notifications. Bound methods are held by weak reference, so a
+    widget that subscribes does not outlive its window because of it.
+
+    Topics of LocalDatabase: 'ingredient_added', 'ingredient_updated', 'ingredient_removed', 'meal_added',
+    'meal_updated', 'meal_removed' with keyword arguments item and, for updates, old_name. 'ingredients_reset' and
+    'meals_reset' without arguments replace them after a load or a muted bulk change.
+
+    Topics of Trip: 'day_meal_changed' with day_ind and meal_type_code, 'day_added' and 'day_removed' with day_ind and
+    'trip_reset'."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.mute_depth = 0
+
+    def subscribe(self, topic: str, callback: Callable):
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else lambda: callback
+        self.subscribers.setdefault(topic, []).append(ref)
+
+    def unsubscribe(self, topic: str, callback: Callable):
+        self.subscribers[topic] = [r for r in self.subscribers.get(topic, []) if r() not in (None, callback)]
+
+    def emit(self, topic: str, **payload):
+        """
+        Calls every live subscriber of topic with payload, unless the bus is muted.
+        """
+        if self.mute_depth:
+            return
+        refs = self.subscribers.get(topic)
+        if not refs:
+            return
+        dead = False
+        for ref in list(refs):
+            callback = ref()
+            if callback is None:
+                dead = True
+            else:
+                callback(**payload)
+        if dead:
+            self.subscribers[topic] = [r for r in refs if r() is not None]
+
+    @contextmanager
+    def muted(self):
+        """
+        Suppresses all events inside the with-block, e.g. for bulk changes that are followed by a reset event.
+        """
+        self.mute_depth += 1
+        try:
+            yield self
+        finally:
+            self.mute_depth -= 1
+
+    def is_muted(self) -> bool:
+        return self.mute_depth > 0
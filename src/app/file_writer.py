@@ -0,0 +1,105 @@
+import os
+from itertools import islice
+from typing import IO, Iterable
+
+
+def replace_atomically(file: IO, tmp_path: str, f_path: str):
+    """
+    Flushes and syncs an open temporary file to disk, closes it and renames it over the target, so the target always
+    holds either the old or the complete new content.
+
+    :param file: Open file object of tmp_path.
+    :param tmp_path: Path of the temporary file.
+    :param f_path: Path of the target file.
+    """
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+    os.replace(tmp_path, f_path)
+    if os.name == 'posix':
+        dir_fd = os.open(os.path.dirname(os.path.abspath(f_path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class AtomicFileWriter:
+    """Writes a delimited text file row by row, or column by column, through a temporary file next to the target. Rows
+    are joined once and written in large chunks. Leaving the with-block syncs the file and renames it over the target,
+    an exception discards it and leaves the target untouched.
+
+    Args:
+        f_path (str): Full path to target file.
+        sep (str): Separator between the fields of a row.
+        chunk_rows (int): Number of rows to collect before writing them in one call."""
+
+    def __init__(self, f_path: str, sep: str = ',', chunk_rows: int = 8192):
+        self.f_path = f_path
+        self.tmp_path = f'{f_path}.tmp'
+        self.sep = sep
+        self.chunk_rows = chunk_rows
+        self.rows = []
+        self.file = None
+
+    def __enter__(self) -> 'AtomicFileWriter':
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', newline='\n')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.file.close()
+            os.remove(self.tmp_path)
+            return False
+        self.flush()
+        replace_atomically(self.file, self.tmp_path, self.f_path)
+        return False
+
+    def write_row(self, fields: list):
+        self.rows.append(self.sep.join(map(str, fields)))
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[list]):
+        """
+        Writes many rows, joining and writing them chunk by chunk.
+
+        :param rows: Iterable of field lists, can be a generator.
+        """
+        rows = iter(rows)
+        join = self.sep.join
+        while True:
+            chunk = [join(map(str, fields)) for fields in islice(rows, self.chunk_rows)]
+            if not chunk:
+                break
+            self.rows.extend(chunk)
+            self.flush()
+
+    def write_columns(self, columns: list[Iterable]):
+        """
+        Writes rows given column by column. Each column is converted to strings in one pass and every row is joined
+        from them, which saves building a field list per row.
+
+        :param columns: Equally long columns of field values, e.g. lists from ndarray.tolist().
+        """
+        strings = [list(map(str, column)) for column in columns]
+        rows = map(self.sep.join, zip(*strings))
+        while True:
+            chunk = list(islice(rows, self.chunk_rows))
+            if not chunk:
+                break
+            self.rows.extend(chunk)
+            self.flush()
+
+    def write_text(self, text: str):
+        """
+        Writes text as it is, after all rows written so far.
+        """
+        self.flush()
+        self.file.write(text)
+
+    def flush(self):
+        if self.rows:
+            self.file.write('\n'.join(self.rows))
+            self.file.write('\n')
+            self.rows = []
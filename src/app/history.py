@@ -0,0 +1,147 @@
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Union
+
+from src.app.events import EventBus
+
+
+@dataclass
+class EditStep:
+    """One undoable edit, kept as the calls that revert and repeat it. Both only hold the values the edit changed.
+
+    Args:
+        description (str): Short text for menus, e.g. 'Update Oats'.
+        undo (Callable): Reverts the edit.
+        redo (Callable): Repeats the edit after it was reverted."""
+
+    description: str
+    undo: Callable[[], None]
+    redo: Callable[[], None]
+
+
+class EditHistory:
+    """Undo and redo stacks of inverse deltas for the edits of a database and the trips planned with it. Undoing or
+    redoing a step replays one operation on the changed items only, so neither time nor memory depend on the size of
+    the database. Edits made while a step is replayed or while recording is paused are not recorded.
+
+    Emits 'history_changed' without arguments on its event bus whenever the stacks change.
+
+    Args:
+        limit (int): Maximum number of steps that can be undone, older steps are dropped."""
+
+    def __init__(self, limit: int = 1000):
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = []
+        self.pause_depth = 0
+        self.group = None
+        self.events = EventBus()
+
+    def record(self, description: str, undo: Callable[[], None], redo: Callable[[], None]):
+        """
+        Adds an edit that was just made as the newest step, which discards all steps that could be redone.
+
+        :param description: Short text for menus.
+        :param undo: Reverts the edit.
+        :param redo: Repeats the edit.
+        """
+        if self.pause_depth:
+            return
+        step = EditStep(description=description, undo=undo, redo=redo)
+        if self.group is not None:
+            self.group.append(step)
+            return
+        self.undo_steps.append(step)
+        self.redo_steps.clear()
+        self.events.emit('history_changed')
+
+    def undo(self) -> Union[str, None]:
+        """
+        Reverts the newest step.
+
+        :return: Description of the reverted step, None if there was nothing to undo.
+        """
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        with self.paused():
+            step.undo()
+        self.redo_steps.append(step)
+        self.events.emit('history_changed')
+
+        return step.description
+
+    def redo(self) -> Union[str, None]:
+        """
+        Repeats the last reverted step.
+
+        :return: Description of the repeated step, None if there was nothing to redo.
+        """
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        with self.paused():
+            step.redo()
+        self.undo_steps.append(step)
+        self.events.emit('history_changed')
+
+        return step.description
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_steps)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_steps)
+
+    def get_undo_description(self) -> str:
+        return self.undo_steps[-1].description if self.undo_steps else ''
+
+    def get_redo_description(self) -> str:
+        return self.redo_steps[-1].description if self.redo_steps else ''
+
+    def clear(self):
+        """
+        Drops all steps, e.g. after loading replaced the edited items.
+        """
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.events.emit('history_changed')
+
+    @contextmanager
+    def paused(self):
+        """
+        Does not record edits made inside the with-block.
+        """
+        self.pause_depth += 1
+        try:
+            yield self
+        finally:
+            self.pause_depth -= 1
+
+    @contextmanager
+    def grouped(self, description: str):
+        """
+        Records all edits made inside the with-block as one step, which undoes them in reverse order.
+
+        :param description: Short text for menus.
+        """
+        if self.group is not None:
+            yield self
+            return
+        self.group = []
+        try:
+            yield self
+        finally:
+            steps, self.group = self.group, None
+            if steps:
+                self.record(description=description, undo=lambda: undo_all(steps), redo=lambda: redo_all(steps))
+
+
+def undo_all(steps: list[EditStep]):
+    for step in reversed(steps):
+        step.undo()
+
+
+def redo_all(steps: list[EditStep]):
+    for step in steps:
+        step.redo()
@@ -0,0 +1,122 @@
+import gzip
+import io
+import os
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.app.search_index import normalize_name
+from src.backend.food import nutrient_names
+
+import_fields = ['name'] + nutrient_names + ['price_per_unit', 'unit_size', 'cooking', 'water', 'types']
+
+column_aliases = {'name': ['name', 'food', 'food_name', 'description', 'product_name'],
+                  'energy': ['energy', 'energy_kcal', 'kcal', 'calories', 'energy_kcal_100g'],
+                  'fat': ['fat', 'total_fat', 'fat_100g', 'lipids'],
+                  'sat_fat': ['sat_fat', 'saturated_fat', 'saturated_fat_100g', 'fatty_acids_saturated'],
+                  'carbs': ['carbs', 'carbohydrates', 'carbohydrate', 'carbohydrates_100g'],
+                  'sugar': ['sugar', 'sugars', 'total_sugars', 'sugars_100g'],
+                  'fiber': ['fiber', 'fibre', 'dietary_fiber', 'fiber_100g'],
+                  'protein': ['protein', 'proteins', 'proteins_100g'],
+                  'salt': ['salt', 'salt_100g'],
+                  'price_per_unit': ['price_per_unit', 'price'],
+                  'unit_size': ['unit_size', 'package_size'],
+                  'cooking': ['cooking'],
+                  'water': ['water'],
+                  'types': ['types', 'meal_types']}
+
+
+def guess_column_map(columns: list[str]) -> dict[str, str]:
+    """
+    Matches source column names to import fields by known aliases, ignoring case, spaces and hyphens.
+
+    :param columns: Column names of the source file.
+    :return: Source column name by import field, for all fields that were found.
+    """
+    lookup = {normalize_name(c).replace(' ', '_').replace('-', '_'): c for c in columns}
+    column_map = {}
+    for field, aliases in column_aliases.items():
+        for alias in aliases:
+            if alias in lookup:
+                column_map[field] = lookup[alias]
+                break
+
+    return column_map
+
+
+def read_import_chunks(f_path: str, column_map: dict[str, str] = None, chunk_rows: int = 10000, sep: str = ',') \
+        -> Iterator[tuple[dict, float]]:
+    """
+    Streams a food composition table chunk by chunk, so the file is never held in memory as a whole. Supported are
+    .csv and .jsonl files, both optionally gzip-compressed (.gz).
+
+    :param f_path: Full path to source file.
+    :param column_map: Source column name by import field, see import_fields. Guessed from the header if not given.
+        Missing nutrients are imported as 0, missing prices and sizes as NaN.
+    :param chunk_rows: Number of rows per chunk.
+    :param sep: Separator of .csv files.
+    :return: Iterator over columns of one chunk, keyed like the arguments of LocalDatabase.add_ingredients_from_columns,
+        and the fraction of the source file read so far.
+    """
+    with open(f_path, 'rb') as raw:
+        size = os.fstat(raw.fileno()).st_size
+        stream = io.TextIOWrapper(gzip.open(raw) if f_path.endswith('.gz') else raw, encoding='utf-8')
+        base_path = f_path[:-3] if f_path.endswith('.gz') else f_path
+        if base_path.endswith(('.jsonl', '.ndjson')):
+            chunks = pd.read_json(stream, lines=True, chunksize=chunk_rows, dtype=False)
+        else:
+            chunks = pd.read_csv(stream, sep=sep, chunksize=chunk_rows, keep_default_na=False, na_values=[''])
+        for data in chunks:
+            if column_map is None:
+                column_map = guess_column_map(list(data.columns))
+            yield map_import_chunk(data, column_map), raw.tell() / size if size else 1.0
+
+
+def map_import_chunk(data: pd.DataFrame, column_map: dict[str, str]) -> dict:
+    """
+    Converts one chunk of source rows into ingredient columns. Rows without a name are dropped.
+    """
+    def numbers(field: str, default: float) -> np.ndarray:
+        if field not in column_map:
+            return np.full(len(data), default)
+        return pd.to_numeric(data[column_map[field]], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+    def flags(field: str) -> np.ndarray:
+        if field not in column_map:
+            return np.zeros(len(data), dtype=bool)
+        return data[column_map[field]].astype(str).str.strip().str.lower().isin(['true', '1', 'yes']).to_numpy()
+
+    names = data[column_map['name']].fillna('').astype(str).str.strip()
+    if 'types' in column_map:
+        types = [[int(t) for t in str(v).replace('--', ',').strip('[] ').split(',') if t.strip().isdigit()]
+                 for v in data[column_map['types']].tolist()]
+    else:
+        types = [[] for _ in range(len(data))]
+    keep = (names != '').to_numpy()
+    columns = {'names': names.tolist(), 'types': types,
+               'nutrition': np.column_stack([numbers(n, 0.0) for n in nutrient_names]),
+               'cooking': flags('cooking'), 'water': flags('water'),
+               'price_per_unit': numbers('price_per_unit', np.nan), 'unit_size': numbers('unit_size', np.nan)}
+    if keep.all():
+        return columns
+
+    return {key: [v for v, k in zip(val, keep) if k] if isinstance(val, list) else val[keep]
+            for key, val in columns.items()}
+
+
+def import_ingredients(db: 'LocalDatabase', f_path: str, column_map: dict[str, str] = None, chunk_rows: int = 10000,
+                       sep: str = ',', progress: Callable[[float], None] = None) -> int:
+    """
+    Imports all ingredients of a food composition table into db. Names that already exist are skipped.
+
+    :param progress: Called with the fraction of the file read after every chunk.
+    :return: Number of imported ingredients.
+    """
+    count = 0
+    for columns, fraction in read_import_chunks(f_path=f_path, column_map=column_map, chunk_rows=chunk_rows, sep=sep):
+        count += db.add_ingredients_from_columns(**columns)
+        if progress is not None:
+            progress(fraction)
+
+    return count
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+
+from src.app.file_writer import AtomicFileWriter
+
+
+class ChangeJournal:
+    """Append-only log of changed database records, kept next to the .csv files between full saves. Every record holds
+    the complete new state of one ingredient or meal, or None if it was removed, so replaying a record twice is
+    harmless.
+
+    Args:
+        f_path (str): Full path to .journal file. Created on first append."""
+
+    def __init__(self, f_path: str):
+        self.f_path = f_path
+        self.lock = threading.Lock()
+        self.count = len(self.read())
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read(self) -> list[dict]:
+        """
+        Reads all complete records. A last line cut short by a crash is ignored.
+
+        :return: Records in the order they were appended.
+        """
+        if not os.path.isfile(self.f_path):
+            return []
+        records = []
+        with open(self.f_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    break
+                records.append(json.loads(line))
+
+        return records
+
+    def append(self, records: list[dict]):
+        """
+        Appends records and flushes them to disk.
+
+        :param records: Records with keys 'table', 'code' and 'values'.
+        """
+        if not records:
+            return
+        text = ''.join(json.dumps(r) + '\n' for r in records)
+        with self.lock:
+            with open(self.f_path, 'a', encoding='utf-8') as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+            self.count += len(records)
+
+    def drop_first(self, n: int):
+        """
+        Removes the first n records, which have been written to the .csv files by a compaction.
+
+        :param n: Number of records to drop.
+        """
+        with self.lock:
+            remaining = self.read()[n:]
+            if not remaining:
+                if os.path.isfile(self.f_path):
+                    os.remove(self.f_path)
+            else:
+                with AtomicFileWriter(self.f_path) as writer:
+                    writer.write_text(''.join(json.dumps(r) + '\n' for r in remaining))
+            self.count = len(remaining)
+
+    def clear(self):
+        with self.lock:
+            if os.path.isfile(self.f_path):
+                os.remove(self.f_path)
+            self.count = 0
@@ -0,0 +1,166 @@
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.app.search_index import normalize_name
+
+
+@dataclass
+class MergeConflict:
+    """A record of the merged database whose name matches one in the target database, but whose values differ. It is
+    added under a new name.
+
+    Args:
+        table (str): 'ingredients' or 'meals'.
+        name (str): Name of the record in the merged database.
+        existing_code (int): Code of the record with the same name in the target database.
+        new_name (str): Name the record was added under.
+        new_code (int): Code the record was added under."""
+
+    table: str
+    name: str
+    existing_code: int
+    new_name: str
+    new_code: int
+
+
+@dataclass
+class MergeReport:
+    """Result of merging one database into another.
+
+    Args:
+        ingredient_codes (dict[int, int]): Code in the target database by code in the merged database.
+        meal_codes (dict[int, int]): Code in the target database by code in the merged database.
+        added_ingredients (int): Number of ingredients that were added.
+        added_meals (int): Number of meals that were added.
+        conflicts (list[MergeConflict]): Records that were added under a new name."""
+
+    ingredient_codes: dict[int, int] = field(default_factory=dict)
+    meal_codes: dict[int, int] = field(default_factory=dict)
+    added_ingredients: int = 0
+    added_meals: int = 0
+    conflicts: list[MergeConflict] = field(default_factory=list)
+
+    def get_duplicate_count(self) -> int:
+        return len(self.ingredient_codes) + len(self.meal_codes) - self.added_ingredients - self.added_meals
+
+
+def merge_name(name: str) -> str:
+    """
+    Normalized name without the counter added by unique_name, so records renamed by an earlier merge are still found.
+    """
+    return re.sub(r' \(\d+\)$', '', normalize_name(name))
+
+
+def nutrient_fingerprints(nutrition: np.ndarray, decimals: int = 4) -> list[bytes]:
+    """
+    Hashable fingerprint of every row of nutritional values, equal for values that only differ by rounding noise.
+    """
+    rounded = np.round(np.asarray(nutrition, dtype=float), decimals) + 0.0
+    return [row.tobytes() for row in np.ascontiguousarray(rounded)]
+
+
+def meal_fingerprint(ingredient_codes: list[int], amounts: list[float], decimals: int = 4) -> tuple:
+    return tuple(sorted(zip(ingredient_codes, np.round(np.asarray(amounts, dtype=float), decimals).tolist())))
+
+
+def unique_name(name: str, taken: set[str]) -> str:
+    """
+    Appends the lowest free counter to name, e.g. 'Oats (2)'.
+    """
+    counter = 2
+    while f'{name} ({counter})' in taken:
+        counter += 1
+
+    return f'{name} ({counter})'
+
+
+def merge_databases(target: 'LocalDatabase', source: 'LocalDatabase') -> MergeReport:
+    """
+    Merges all ingredients and meals of source into target with hash joins, in time linear in the size of both
+    databases. An ingredient is a duplicate if its normalized name and nutritional values match one in target, a meal
+    if its normalized name and its ingredients and amounts match. Duplicates are mapped to the existing record, all
+    other records are added under new codes, and meals are rewritten to point to the target ingredients. A record whose
+    name is taken by a different record is added under a new name and reported as a conflict. Source is not changed.
+
+    :param target: Database to merge into.
+    :param source: Database to merge from.
+    :return: Code mapping and conflicts.
+    """
+    report = MergeReport()
+
+    columns = target.get_ingredient_columns()
+    known = {}
+    key_of_name = {}
+    for code, name, fingerprint in zip(columns['code'].tolist(), columns['name'],
+                                       nutrient_fingerprints(columns['nutrition'])):
+        key = (merge_name(name), fingerprint)
+        known.setdefault(key, code)
+        key_of_name.setdefault(key[0], key)
+    taken = set(columns['name'])
+
+    # target codes of added ingredients are only known after adding, so duplicates among them are resolved last
+    columns = source.get_ingredient_columns()
+    source_keys = []
+    new_rows = []
+    new_names = []
+    for row, (name, fingerprint) in enumerate(zip(columns['name'], nutrient_fingerprints(columns['nutrition']))):
+        key = (merge_name(name), fingerprint)
+        source_keys.append(key)
+        if key in known:
+            continue
+        new_name = name if key[0] not in key_of_name and name not in taken else unique_name(name, taken)
+        known[key] = None
+        key_of_name.setdefault(key[0], key)
+        taken.add(new_name)
+        new_rows.append(row)
+        new_names.append(new_name)
+
+    report.added_ingredients = target.add_ingredients_from_columns(
+        names=new_names, types=[columns['types'][r] for r in new_rows], nutrition=columns['nutrition'][new_rows],
+        cooking=columns['cooking'][new_rows], water=columns['water'][new_rows],
+        price_per_unit=columns['price_per_unit'][new_rows], unit_size=columns['unit_size'][new_rows])
+    for row, new_name in zip(new_rows, new_names):
+        known[source_keys[row]] = target.ingredients_by_name[new_name].CODE
+    for code, key in zip(columns['code'].tolist(), source_keys):
+        report.ingredient_codes[code] = known[key]
+    for row, new_name in zip(new_rows, new_names):
+        name = columns['name'][row]
+        if new_name != name:
+            report.conflicts.append(MergeConflict(table='ingredients', name=name, new_name=new_name,
+                                                  existing_code=known[key_of_name[source_keys[row][0]]],
+                                                  new_code=known[source_keys[row]]))
+
+    columns = target.get_meal_columns()
+    known = {}
+    code_of_name = {}
+    for code, name, ingredients, amounts in zip(columns['code'].tolist(), columns['name'], columns['ingredients'],
+                                                columns['amounts']):
+        known.setdefault((merge_name(name), meal_fingerprint(ingredients, amounts)), code)
+        code_of_name.setdefault(merge_name(name), code)
+    taken = set(columns['name'])
+
+    columns = source.get_meal_columns()
+    for code, name, own_types, ingredients, amounts in zip(columns['code'].tolist(), columns['name'],
+                                                           columns['own_types'], columns['ingredients'],
+                                                           columns['amounts']):
+        ingredients = [report.ingredient_codes[c] for c in ingredients]
+        key = (merge_name(name), meal_fingerprint(ingredients, amounts))
+        if key in known:
+            report.meal_codes[code] = known[key]
+            continue
+        new_name = name if key[0] not in code_of_name and name not in taken else unique_name(name, taken)
+        target.add_meal(name=new_name, own_type=[target.meal_types[t] for t in own_types],
+                        ingredients=[[target.get_ingredient_by_code(c), a] for c, a in zip(ingredients, amounts)])
+        new_code = target.new_meal_code - 1
+        report.meal_codes[code] = new_code
+        report.added_meals += 1
+        if new_name != name:
+            report.conflicts.append(MergeConflict(table='meals', name=name, existing_code=code_of_name[key[0]],
+                                                  new_name=new_name, new_code=new_code))
+        known[key] = new_code
+        code_of_name.setdefault(key[0], new_code)
+        taken.add(new_name)
+
+    return report
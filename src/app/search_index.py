@@ -0,0 +1,188 @@
+import unicodedata
+from itertools import chain
+
+import numpy as np
+import numpy.typing as npt
+
+
+def normalize_name(text: str) -> str:
+    """
+    Lower-cases text, strips accents and collapses whitespace.
+
+    :param text: Text to normalize.
+    :return: Normalized text.
+    """
+    if text.isascii():
+        return ' '.join(text.casefold().split())
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+class NGramIndex:
+    """Incrementally maintained n-gram index over a set of names. Queries return the closest names ranked by Jaccard
+    similarity of their n-grams, which makes search case- and accent-insensitive and tolerant of typos.
+
+    Args:
+        n (int): Length of n-grams.
+        min_overlap (float): Minimum fraction of query n-grams a name has to contain to be returned."""
+
+    def __init__(self, n: int = 3, min_overlap: float = 0.3):
+        self.n = n
+        self.min_overlap = min_overlap
+        self.keys = []
+        self.slot_of_key = {}
+        self.postings = {}
+        self.posting_arrays = {}
+        self.gram_counts = np.zeros(64)
+        self.alive = np.zeros(64, dtype=bool)
+        self.dead_count = 0
+
+    def __len__(self) -> int:
+        return len(self.slot_of_key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.slot_of_key
+
+    def grams(self, text: str) -> set[str]:
+        padded = ' ' * (self.n - 1) + normalize_name(text) + ' '
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def add(self, key: str):
+        """
+        Adds a name to the index. Adding a name that is already indexed does nothing.
+
+        :param key: Name to add.
+        """
+        if key in self.slot_of_key:
+            return
+        slot = len(self.keys)
+        if slot == len(self.alive):
+            self.gram_counts = np.concatenate([self.gram_counts, np.zeros(slot)])
+            self.alive = np.concatenate([self.alive, np.zeros(slot, dtype=bool)])
+        grams = self.grams(key)
+        self.keys.append(key)
+        self.slot_of_key[key] = slot
+        self.gram_counts[slot] = len(grams)
+        self.alive[slot] = True
+        for g in grams:
+            posting = self.postings.get(g)
+            if posting is None:
+                self.postings[g] = [slot]
+            elif isinstance(posting, list):
+                posting.append(slot)
+                self.posting_arrays.pop(g, None)
+            else:
+                self.postings[g] = posting.tolist() + [slot]
+
+    def remove(self, key: str):
+        """
+        Removes a name from the index. Its slot is only marked dead and reclaimed by the next compaction.
+
+        :param key: Name to remove.
+        """
+        slot = self.slot_of_key.pop(key, None)
+        if slot is None:
+            return
+        self.alive[slot] = False
+        self.dead_count += 1
+        if self.dead_count > max(1024, len(self.slot_of_key)):
+            self.rebuild(list(self.slot_of_key))
+
+    def rename(self, old_key: str, new_key: str):
+        self.remove(old_key)
+        self.add(new_key)
+
+    def rebuild(self, keys: list[str]):
+        """
+        Discards the index and builds it from keys.
+
+        :param keys: Names to index.
+        """
+        self.__init__(n=self.n, min_overlap=self.min_overlap)
+        for key in keys:
+            self.add(key)
+
+    def get_posting_array(self, gram: str) -> npt.NDArray[int]:
+        posting = self.postings[gram]
+        if not isinstance(posting, list):
+            return posting
+        arr = self.posting_arrays.get(gram)
+        if arr is None:
+            arr = np.array(posting, dtype=np.int32)
+            self.posting_arrays[gram] = arr
+
+        return arr
+
+    def to_arrays(self) -> tuple[list[str], list[str], npt.NDArray[int], npt.NDArray[int], npt.NDArray[float]]:
+        """
+        Exports the index without the removed names. The index itself is not changed.
+
+        :return: Names in slot order, n-grams, flat posting lists with offsets per n-gram and n-gram count per name.
+        """
+        n = len(self.keys)
+        grams = list(self.postings)
+        lengths = np.fromiter((len(p) for p in self.postings.values()), dtype=np.int64, count=len(grams))
+        flat = np.fromiter(chain.from_iterable(self.postings.values()), dtype=np.int32, count=int(lengths.sum()))
+        keys = self.keys
+        gram_counts = self.gram_counts[:n].copy()
+        if self.dead_count:
+            alive = self.alive[:n]
+            new_slot = (np.cumsum(alive) - 1).astype(np.int32)
+            keep = alive[flat]
+            lengths = np.bincount(np.repeat(np.arange(len(grams)), lengths)[keep], minlength=len(grams))
+            flat = new_slot[flat[keep]]
+            grams = [g for g, length in zip(grams, lengths.tolist()) if length]
+            lengths = lengths[lengths > 0]
+            keys = [k for k, a in zip(keys, alive.tolist()) if a]
+            gram_counts = gram_counts[alive]
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        return list(keys), grams, flat, offsets, gram_counts
+
+    def load_arrays(self, keys: list[str], grams: list[str], postings: npt.NDArray[int], offsets: npt.NDArray[int],
+                    gram_counts: npt.NDArray[float]):
+        """
+        Replaces the index with one exported by to_arrays, without recomputing any n-grams.
+        """
+        self.__init__(n=self.n, min_overlap=self.min_overlap)
+        n = len(keys)
+        self.keys = list(keys)
+        self.slot_of_key = dict(zip(self.keys, range(n)))
+        self.gram_counts = np.zeros(max(n, 64))
+        self.gram_counts[:n] = gram_counts
+        self.alive = np.zeros(max(n, 64), dtype=bool)
+        self.alive[:n] = True
+        postings = np.array(postings, dtype=np.int32)
+        self.postings = dict(zip(grams, np.split(postings, np.asarray(offsets[1:-1]))))
+
+    def query(self, text: str, top_k: int = 50) -> list[str]:
+        """
+        Finds the names most similar to text.
+
+        :param text: Search text.
+        :param top_k: Maximum number of names to return.
+        :return: Names ordered by descending similarity.
+        """
+        q_grams = self.grams(text)
+        hits = [self.get_posting_array(g) for g in q_grams if g in self.postings]
+        if not hits or top_k <= 0:
+            return []
+
+        min_shared = max(1, min(2, len(q_grams) - 1), self.min_overlap * len(q_grams))
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.keys))
+        slots = np.flatnonzero(counts >= min_shared)
+        slots = slots[self.alive[slots]]
+        if len(slots) == 0:
+            return []
+        shared = counts[slots]
+
+        similarity = shared / (len(q_grams) + self.gram_counts[slots] - shared)
+        if len(slots) > top_k:
+            best = np.argpartition(-similarity, top_k - 1)[:top_k]
+            slots = slots[best]
+            similarity = similarity[best]
+        order = np.lexsort((slots, -similarity))
+
+        return [self.keys[s] for s in slots[order]]
@@ -0,0 +1,125 @@
+import json
+import mmap
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+from src.app.error_handling import SnapshotFormatError
+from src.app.file_writer import replace_atomically
+
+snapshot_magic = b'HFPSNAP\x00'
+snapshot_version = 1
+alignment = 64
+
+
+def pack_strings(strings: list[str]) -> tuple[npt.NDArray[np.uint8], npt.NDArray[int]]:
+    """
+    Packs strings into one UTF-8 buffer.
+
+    :param strings: Strings to pack.
+    :return: Buffer and character offsets, so that string i is text[offsets[i]:offsets[i + 1]] of the decoded buffer.
+    """
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    return np.frombuffer(''.join(strings).encode('utf-8'), dtype=np.uint8), offsets
+
+
+def unpack_strings(buffer: npt.NDArray[np.uint8], offsets: npt.NDArray[int]) -> list[str]:
+    text = buffer.tobytes().decode('utf-8')
+    bounds = offsets.tolist()
+    return [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def pack_lists(lists: list[list], dtype: type) -> tuple[npt.NDArray, npt.NDArray[int]]:
+    """
+    Flattens a list of lists.
+
+    :return: Flat values and offsets, so that list i is values[offsets[i]:offsets[i + 1]].
+    """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(i) for i in lists], out=offsets[1:])
+    values = np.fromiter((v for i in lists for v in i), dtype=dtype, count=offsets[-1])
+    return values, offsets
+
+
+def write_snapshot(f_path: str, arrays: dict[str, npt.NDArray], meta: dict):
+    """
+    Writes named arrays to a binary snapshot file. The file starts with a magic string, the format version and a JSON
+    header describing dtype, shape and offset of every array. Arrays follow aligned to 64 bytes, so they can be
+    memory-mapped directly.
+
+    :param f_path: Full path to snapshot file.
+    :param arrays: Arrays to store.
+    :param meta: Additional JSON-serializable values stored in the header.
+    """
+    table = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[name] = arr
+        table[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset += -(-arr.nbytes // alignment) * alignment
+
+    header = json.dumps({'meta': meta, 'arrays': table}).encode('utf-8')
+    prefix_len = len(snapshot_magic) + 8 + len(header)
+    data_start = -(-prefix_len // alignment) * alignment
+
+    tmp_path = f'{f_path}.tmp'
+    file = open(tmp_path, 'wb')
+    try:
+        file.write(snapshot_magic)
+        file.write(np.array([snapshot_version, len(header)], dtype='<u4').tobytes())
+        file.write(header)
+        file.write(b'\x00' * (data_start - prefix_len))
+        for name, arr in arrays.items():
+            file.write(arr.tobytes())
+            file.write(b'\x00' * (-arr.nbytes % alignment))
+    except BaseException:
+        file.close()
+        os.remove(tmp_path)
+        raise
+    replace_atomically(file, tmp_path, f_path)
+
+
+def read_snapshot(f_path: str, memory_map: bool = True) -> tuple[dict[str, npt.NDArray], dict]:
+    """
+    Reads a snapshot written by write_snapshot.
+
+    :param f_path: Full path to snapshot file.
+    :param memory_map: Map the file instead of reading it. Arrays are then read-only views of the mapping.
+    :return: Arrays by name and the meta values.
+    """
+    with open(f_path, 'rb') as file:
+        if memory_map:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = file.read()
+
+    if len(buffer) < len(snapshot_magic) + 8 or buffer[:len(snapshot_magic)] != snapshot_magic:
+        raise SnapshotFormatError(f_path)
+    version, header_len = np.frombuffer(buffer, dtype='<u4', count=2, offset=len(snapshot_magic)).tolist()
+    if version != snapshot_version:
+        raise SnapshotFormatError(f_path)
+    header_start = len(snapshot_magic) + 8
+    header = json.loads(bytes(buffer[header_start:header_start + header_len]).decode('utf-8'))
+    data_start = -(-(header_start + header_len) // alignment) * alignment
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=data_start + info['offset']).reshape(info['shape'])
+
+    return arrays, header['meta']
+
+
+def is_snapshot_current(snapshot_path: str, source_paths: list[str]) -> bool:
+    """
+    Checks if a snapshot exists and is at least as new as all existing source files.
+    """
+    if not os.path.isfile(snapshot_path):
+        return False
+    snapshot_time = os.path.getmtime(snapshot_path)
+    return all(os.path.getmtime(p) <= snapshot_time for p in source_paths if os.path.isfile(p))
@@ -0,0 +1,228 @@
+import sqlite3
+
+import numpy as np
+
+from src.backend.food import Ingredient, Meal, n_nutrients, nutrient_names, types_to_mask, mask_to_types
+
+schema = f"""
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    {', '.join(f'{c} REAL' for c in nutrient_names)},
+    cooking INTEGER NOT NULL,
+    water INTEGER NOT NULL,
+    price_per_unit REAL,
+    unit_size REAL,
+    types INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ingredients_name ON ingredients (name);
+CREATE TABLE IF NOT EXISTS meals (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    {', '.join(f'{c} REAL' for c in nutrient_names)},
+    own_types INTEGER NOT NULL,
+    cooking INTEGER NOT NULL,
+    water INTEGER NOT NULL,
+    cost REAL,
+    weight REAL
+);
+CREATE INDEX IF NOT EXISTS meals_name ON meals (name);
+CREATE TABLE IF NOT EXISTS meal_ingredients (
+    meal_code INTEGER NOT NULL REFERENCES meals (code) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    ingredient_code INTEGER NOT NULL REFERENCES ingredients (code),
+    amount REAL,
+    PRIMARY KEY (meal_code, position)
+);
+CREATE INDEX IF NOT EXISTS meal_ingredients_ingredient ON meal_ingredients (ingredient_code);
+CREATE TABLE IF NOT EXISTS trips (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trip_meals (
+    trip_code INTEGER NOT NULL REFERENCES trips (code) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    meal_type INTEGER NOT NULL,
+    meal_code INTEGER NOT NULL REFERENCES meals (code),
+    PRIMARY KEY (trip_code, day, meal_type)
+);
+"""
+
+
+class SqliteStorage:
+    """Stores a LocalDatabase and its trips in an embedded SQLite file. All writes are upserts inside one transaction,
+    so single ingredients, meals and trips can be written without touching the rest of the file.
+
+    Args:
+        f_path (str): Full path to .sqlite file. Created with all tables if it does not exist."""
+
+    def __init__(self, f_path: str):
+        self.f_path = f_path
+        # calls are serialized by the database lock, so the connection may be used by worker threads
+        self.connection = sqlite3.connect(f_path, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def ingredient_row(self, item: Ingredient) -> tuple:
+        return (int(item.CODE), item.name, *[float(v) for v in item.nutrition], int(item.cooking), int(item.water),
+                float(item.price_per_unit), float(item.unit_size), item.type_mask)
+
+    def meal_row(self, meal: Meal) -> tuple:
+        return (int(meal.CODE), meal.name, *[float(v) for v in meal.nutrition],
+                types_to_mask(t.CODE for t in meal.own_types), int(meal.cooking), int(meal.water), float(meal.cost),
+                float(meal.weight))
+
+    def upsert_ingredients(self, items: list[Ingredient]):
+        columns = ['code', 'name'] + nutrient_names + ['cooking', 'water', 'price_per_unit', 'unit_size', 'types']
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+        self.connection.executemany(
+            f'INSERT INTO ingredients ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+            f'ON CONFLICT (code) DO UPDATE SET {updates}', (self.ingredient_row(i) for i in items))
+
+    def upsert_meals(self, meals: list[Meal]):
+        columns = ['code', 'name'] + nutrient_names + ['own_types', 'cooking', 'water', 'cost', 'weight']
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+        self.connection.executemany(
+            f'INSERT INTO meals ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+            f'ON CONFLICT (code) DO UPDATE SET {updates}', (self.meal_row(m) for m in meals))
+        self.connection.executemany('DELETE FROM meal_ingredients WHERE meal_code = ?',
+                                    ((int(m.CODE),) for m in meals))
+        self.connection.executemany(
+            'INSERT INTO meal_ingredients (meal_code, position, ingredient_code, amount) VALUES (?, ?, ?, ?)',
+            ((int(m.CODE), pos, int(i.CODE), float(a)) for m in meals for pos, (i, a) in enumerate(m.ingredients)))
+
+    def delete_ingredients(self, codes: list[int]):
+        self.connection.executemany('DELETE FROM ingredients WHERE code = ?', ((int(c),) for c in codes))
+
+    def delete_meals(self, codes: list[int]):
+        self.connection.executemany('DELETE FROM meals WHERE code = ?', ((int(c),) for c in codes))
+
+    def save_ingredient(self, item: Ingredient):
+        with self.connection:
+            self.upsert_ingredients([item])
+
+    def save_meal(self, meal: Meal):
+        with self.connection:
+            self.upsert_meals([meal])
+
+    def save_changes(self, ingredients: dict[int, Ingredient], meals: dict[int, Meal]):
+        """
+        Writes changed records in one transaction.
+
+        :param ingredients: Changed ingredients by code, None for removed ones.
+        :param meals: Changed meals by code, None for removed ones.
+        """
+        with self.connection:
+            self.delete_meals([c for c, m in meals.items() if m is None])
+            self.upsert_ingredients([i for i in ingredients.values() if i is not None])
+            self.upsert_meals([m for m in meals.values() if m is not None])
+            self.delete_ingredients([c for c, i in ingredients.items() if i is None])
+
+    def save_database(self, db: 'LocalDatabase'):
+        """
+        Writes all ingredients and meals of db in one transaction and deletes rows that are no longer in db.
+        """
+        with self.connection:
+            stored = {r[0] for r in self.connection.execute('SELECT code FROM meals')}
+            self.delete_meals(stored - {m.CODE for m in db.meals})
+            stored = {r[0] for r in self.connection.execute('SELECT code FROM ingredients')}
+            self.delete_ingredients(stored - {i.CODE for i in db.ingredients})
+            self.upsert_ingredients(db.ingredients)
+            self.upsert_meals(db.meals)
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('db_code', ?) "
+                                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (str(db.CODE),))
+
+    def load_database(self, db: 'LocalDatabase'):
+        """
+        Replaces all ingredients and meals of db with the stored ones.
+        """
+        cur = self.connection.cursor()
+        row = cur.execute("SELECT value FROM meta WHERE key = 'db_code'").fetchone()
+        if row is not None:
+            db.CODE = int(row[0])
+
+        rows = cur.execute(f'SELECT code, name, {", ".join(nutrient_names)}, cooking, water, price_per_unit, '
+                           f'unit_size, types FROM ingredients ORDER BY code').fetchall()
+        codes, names, *cols = zip(*rows) if rows else [()] * (n_nutrients + 7)
+        types = [mask_to_types(m) for m in cols[n_nutrients + 4]]
+        type_offsets = np.zeros(len(types) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in types], out=type_offsets[1:])
+        db.set_ingredients_from_columns(codes=np.array(codes, dtype=np.int64), names=list(names),
+                                        type_values=np.array([t for i in types for t in i], dtype=np.int64),
+                                        type_offsets=type_offsets,
+                                        nutrition=np.array(cols[:n_nutrients], dtype=float).T.reshape(-1, n_nutrients),
+                                        cooking=np.array(cols[n_nutrients], dtype=bool),
+                                        water=np.array(cols[n_nutrients + 1], dtype=bool),
+                                        price_per_unit=np.array(cols[n_nutrients + 2], dtype=float),
+                                        unit_size=np.array(cols[n_nutrients + 3], dtype=float))
+
+        rows = cur.execute(f'SELECT code, name, {", ".join(nutrient_names)}, own_types, cooking, water, cost, weight '
+                           f'FROM meals ORDER BY code').fetchall()
+        codes, names, *cols = zip(*rows) if rows else [()] * (n_nutrients + 7)
+        meal_codes = np.array(codes, dtype=np.int64)
+        types = [mask_to_types(m) for m in cols[n_nutrients]]
+        type_offsets = np.zeros(len(types) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in types], out=type_offsets[1:])
+
+        links = cur.execute('SELECT meal_code, ingredient_code, amount FROM meal_ingredients '
+                            'ORDER BY meal_code, position').fetchall()
+        link_meals, link_ingredients, link_amounts = zip(*links) if links else [(), (), ()]
+        ingredient_offsets = np.searchsorted(np.array(link_meals, dtype=np.int64),
+                                             np.append(meal_codes, np.iinfo(np.int64).max))
+        ingredient_offsets[-1] = len(link_meals)
+        db.set_meals_from_columns(codes=meal_codes, names=list(names),
+                                  type_values=np.array([t for i in types for t in i], dtype=np.int64),
+                                  type_offsets=type_offsets,
+                                  ingredient_codes=np.array(link_ingredients, dtype=np.int64),
+                                  ingredient_offsets=ingredient_offsets,
+                                  amounts=np.array(link_amounts, dtype=float),
+                                  nutrition=np.array(cols[:n_nutrients], dtype=float).T.reshape(-1, n_nutrients),
+                                  cooking=np.array(cols[n_nutrients + 1], dtype=bool),
+                                  water=np.array(cols[n_nutrients + 2], dtype=bool),
+                                  costs=np.array(cols[n_nutrients + 3], dtype=float),
+                                  weights=np.array(cols[n_nutrients + 4], dtype=float))
+
+    def save_trip(self, trip: 'Trip'):
+        """
+        Writes a trip and its meal plan in one transaction.
+        """
+        with self.connection:
+            self.connection.execute('INSERT INTO trips (code, name, duration) VALUES (?, ?, ?) '
+                                    'ON CONFLICT (code) DO UPDATE SET name = excluded.name, '
+                                    'duration = excluded.duration', (int(trip.CODE), trip.name, int(trip.duration)))
+            self.connection.execute('DELETE FROM trip_meals WHERE trip_code = ?', (int(trip.CODE),))
+            self.connection.executemany(
+                'INSERT INTO trip_meals (trip_code, day, meal_type, meal_code) VALUES (?, ?, ?, ?)',
+                ((int(trip.CODE), day, meal_type, int(meal.CODE)) for day, plan in enumerate(trip.meal_plan)
+                 for meal_type, meal in plan.items() if meal is not None))
+
+    def load_trip(self, trip: 'Trip', code: int):
+        """
+        Loads a stored trip into trip. Meals are resolved through the database linked to trip.
+        """
+        row = self.connection.execute('SELECT name, duration FROM trips WHERE code = ?', (int(code),)).fetchone()
+        if row is None:
+            return False
+        trip.CODE = int(code)
+        trip.name = row[0]
+        trip.clear_plan()
+        with trip.events.muted(), trip.pause_history():
+            for _ in range(row[1]):
+                trip.add_day()
+            for day, meal_type, meal_code in self.connection.execute(
+                    'SELECT day, meal_type, meal_code FROM trip_meals WHERE trip_code = ?', (int(code),)):
+                trip.set_meal_at_day(meal=trip.linked_database.get_meal_by_code(meal_code), day_ind=day,
+                                     meal_type=trip.linked_database.meal_types[meal_type])
+        if trip.history is not None:
+            trip.history.clear()
+        trip.events.emit('trip_reset')
+        return True
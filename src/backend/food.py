@@ -1,30 +1,48 @@
+import sys
 from dataclasses import dataclass, field
 import numpy as np
 import numpy.typing as npt
-from typing import Union
+from typing import Iterable, Union
 
 n_nutrients = 8
+nutrient_names = ['energy', 'fat', 'sat_fat', 'carbs', 'sugar', 'fiber', 'protein', 'salt']
+# minimum number of incremental changes to the totals of a meal before they are recomputed to drop rounding errors
+recompute_interval = 64
+# items are created by the hundred thousand, slots drop their instance dicts where dataclasses support them (3.10+)
+slotted = {'slots': True} if sys.version_info >= (3, 10) else {}
 
 
-@dataclass
+def types_to_mask(types: Iterable[int]) -> int:
+    mask = 0
+    for t in types:
+        mask |= 1 << int(t)
+    return mask
+
+
+def mask_to_types(mask: int) -> list[int]:
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+@dataclass(**slotted)
 class LocalDatabaseComponent:
     CODE: int
     name: str
 
 
-@dataclass
+@dataclass(init=False, **slotted)
 class Ingredient(LocalDatabaseComponent):
     """Represents an arbitrary food item.
 
     Args:
-        types (np.array): Indices of food types this item belongs to.
+        types (list[int]): Indices of food types this item belongs to. Stored as the bitmask type_mask, reading types
+            returns the indices in ascending order.
         cooking (bool): If item requires cooking.
         water (bool): If item requires added water.
         price_per_unit (float): Price per unit as bought from store.
         unit_size (float): Size of one unit in grams.
         nutritional_values (np.array): Energy, fat, saturated fat, fiber, carbs, sugar, protein, salt."""
 
-    types: npt.NDArray[int]
+    type_mask: int
     nutrition: npt.NDArray[float]
     cooking: bool = False
     water: bool = False
@@ -32,8 +50,26 @@ class Ingredient(LocalDatabaseComponent):
     unit_size: float = np.nan
     price_per_gram: float = np.nan
 
-    def __post_init__(self):
-        self.price_per_gram = self.price_per_unit / self.unit_size
+    def __init__(self, CODE: int, name: str, types: Iterable[int], nutrition: npt.NDArray[float],
+                 cooking: bool = False, water: bool = False, price_per_unit: float = np.nan,
+                 unit_size: float = np.nan, price_per_gram: float = np.nan):
+        self.CODE = CODE
+        self.name = name
+        self.type_mask = types_to_mask(types)
+        self.nutrition = nutrition
+        self.cooking = cooking
+        self.water = water
+        self.price_per_unit = price_per_unit
+        self.unit_size = unit_size
+        self.price_per_gram = price_per_unit / unit_size
+
+    @property
+    def types(self) -> list[int]:
+        return mask_to_types(self.type_mask)
+
+    @types.setter
+    def types(self, value: Iterable[int]):
+        self.type_mask = types_to_mask(value)
 
     def update(self, name: str, types: npt.NDArray[int], nutrition: npt.NDArray[float], cooking: bool, water: bool,
                price_per_unit: float, unit_size: float):
@@ -47,10 +83,11 @@ class Ingredient(LocalDatabaseComponent):
         self.price_per_gram = price_per_unit / unit_size
 
 
-@dataclass
+@dataclass(frozen=True, **slotted)
 class MealType:
     """Links a numerical value to a string literal and implements a basic type of meal, such as breakfast, lunch,
-    dinner...
+    dinner... Meal types are immutable flyweights, creating one with the name and code of an existing one returns the
+    existing instance, so all databases and meals share them.
 
     Args:
         name (str): Name of meal type.
@@ -59,27 +96,144 @@ class MealType:
     name: str
     CODE: int
 
+    def __new__(cls, name: str, CODE: int):
+        instance = meal_type_instances.get((name, CODE))
+        if instance is None:
+            instance = object.__new__(cls)
+            meal_type_instances[(name, CODE)] = instance
+
+        return instance
+
+
+meal_type_instances = {}
+
 
-@dataclass
+class MealIngredients:
+    """Ingredients of a meal with their amounts, stored as [Ingredient, amount] pairs keyed by ingredient code in the
+    order they were added. Iterating, len and indexing behave like the former list of pairs, and a pair changed in
+    place, e.g. pair[1] = amount, changes the stored amount. An ingredient that occurs twice in the pairs given to the
+    constructor is stored once with the sum of its amounts.
+
+    Args:
+        pairs (list[list[Ingredient, float]]): Initial ingredients and amounts in grams."""
+
+    __slots__ = ('pairs_by_code',)
+
+    def __init__(self, pairs: list[list[Union[Ingredient, float]]] = None):
+        if not pairs:
+            self.pairs_by_code = {}
+            return
+        self.pairs_by_code = {pair[0].CODE: pair if type(pair) is list else list(pair) for pair in pairs}
+        if len(self.pairs_by_code) < len(pairs):
+            self.pairs_by_code = {}
+            for item, amount in pairs:
+                existing = self.pairs_by_code.get(item.CODE)
+                self.pairs_by_code[item.CODE] = [item, amount if existing is None else existing[1] + amount]
+
+    @classmethod
+    def from_columns(cls, codes: list[int], items: list[Ingredient], amounts: list[float]) -> 'MealIngredients':
+        """
+        Builds the container from parallel lists, e.g. slices of the loaded meal columns, without checking each pair.
+        """
+        container = cls()
+        container.pairs_by_code = dict(zip(codes, map(list, zip(items, amounts))))
+        if len(container.pairs_by_code) < len(codes):
+            return cls([[i, a] for i, a in zip(items, amounts)])
+
+        return container
+
+    def __iter__(self):
+        return iter(self.pairs_by_code.values())
+
+    def __len__(self) -> int:
+        return len(self.pairs_by_code)
+
+    def __getitem__(self, index: int) -> list[Union[Ingredient, float]]:
+        return list(self.pairs_by_code.values())[index]
+
+    def __eq__(self, other):
+        if isinstance(other, MealIngredients):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def get(self, code: int) -> Union[list[Union[Ingredient, float]], None]:
+        return self.pairs_by_code.get(code)
+
+    def add(self, item: Ingredient, amount: float) -> list[Union[Ingredient, float]]:
+        pair = [item, amount]
+        self.pairs_by_code[item.CODE] = pair
+
+        return pair
+
+    def pop(self, code: int) -> Union[list[Union[Ingredient, float]], None]:
+        return self.pairs_by_code.pop(code, None)
+
+    def copy(self) -> 'MealIngredients':
+        """
+        New container with copies of the pairs, so changing an amount of the copy does not change this container.
+        """
+        copied = MealIngredients()
+        copied.pairs_by_code = {code: [item, amount] for code, (item, amount) in self.pairs_by_code.items()}
+
+        return copied
+
+
+@dataclass(**slotted)
+class MealPreview:
+    """Totals a meal would have after a tentative change, see Meal.preview_ingredient.
+
+    Args:
+        nutrition (ndarray): Total nutritional values.
+        cost (float): Cost of all ingredients.
+        weight (float): Total weight, excluding water.
+        cooking (bool): If cooking would be required.
+        water (bool): If water would be required."""
+
+    nutrition: npt.NDArray[float]
+    cost: float
+    weight: float
+    cooking: bool
+    water: bool
+
+
+@dataclass(**slotted)
 class Meal(LocalDatabaseComponent):
     """Implements a single meal belonging to one or several MealTypes, consisting of several Ingredient objects.
 
     Args:
         own_type (MealType): Type of meal.
-        ingredients (list[list[Ingredient, float]]): List of list of Ingredient object and amount in grams.
+        ingredients (MealIngredients): Ingredient objects and amounts in grams, keyed by ingredient code. A list of
+            [Ingredient, amount] pairs is converted.
         cooking (bool): If cooking is required.
         water (bool): If water is required.
         cost (float): Cost of all ingredients.
         weight (float): Total weight, excluding water.
-        nutrition (ndarray): Total nutritional values of meal."""
+        nutrition (ndarray): Total nutritional values of meal.
+        linked_database (LocalDatabase): Database that indexes which ingredients this meal uses.
+
+    Cost, weight and nutrition are kept up to date with the change of every added, removed or changed ingredient, and
+    cooking and water with counts of the ingredients that require them, so edits do not rescan all ingredients."""
 
     own_types: list[MealType]
-    ingredients: list[list[Union[Ingredient, float]]] = field(default_factory=list[list])
+    ingredients: MealIngredients = field(default_factory=MealIngredients)
     cooking: bool = False
     water: bool = False
     cost: float = 0
     weight: float = 0
     nutrition: npt.NDArray[float] = field(default=np.zeros(n_nutrients))
+    linked_database: 'LocalDatabase' = field(default=None, repr=False, compare=False)
+    cooking_count: int = field(default=None, init=False, repr=False, compare=False)
+    water_count: int = field(default=None, init=False, repr=False, compare=False)
+    edits_since_recompute: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if type(self.ingredients) is not MealIngredients:
+            self.ingredients = MealIngredients(self.ingredients)
 
     def add_ingredient(self, item: Ingredient, amount: float):
         """
@@ -88,22 +242,71 @@ class Meal(LocalDatabaseComponent):
         :param item: Item to add.
         :param amount: Amount in grams.
         """
-        if item not in self.get_all_ingredients():
-            self.ingredients.append([item, amount])
-            if item.cooking:
-                self.cooking = True
-            if item.water:
-                self.water = True
-            self.cost += item.price_per_gram * amount
-            self.weight += amount
-            self.nutrition = self.nutrition + (item.nutrition * 0.01 * amount)
+        if self.ingredients.get(item.CODE) is None:
+            self.ingredients.add(item=item, amount=amount)
+            self.add_to_totals(item=item, amount=amount, count=1)
+            if self.linked_database is not None:
+                self.linked_database.link_ingredient_to_meal(meal=self, ingredient=item)
+                self.linked_database.meal_changed(meal=self)
+                self.linked_database.record_edit(f'Add {item.name} to {self.name}',
+                                                 undo=lambda: self.remove_ingredient_by_name(item.name),
+                                                 redo=lambda: self.add_ingredient(item=item, amount=amount))
         else:
             self.update_ingredient_amount(item=item, amount=amount)
+
+    def add_to_totals(self, item: Ingredient, amount: float, count: int):
+        """
+        Applies the change of one ingredient to the totals in constant time. Called after the ingredient list changed.
+        After recompute_interval changes, or as many changes as the meal has ingredients if that is more, and when an
+        ingredient without price is removed, all totals are recomputed instead. This keeps the amortized cost constant.
+
+        :param item: Added, removed or changed ingredient.
+        :param amount: Change of its amount in grams, negative if it was removed.
+        :param count: 1 if it was added, -1 if it was removed, 0 if only its amount changed.
+        """
+        self.edits_since_recompute += 1
+        # a missing price makes the cost NaN, which cannot be subtracted again
+        if self.edits_since_recompute >= max(recompute_interval, len(self.ingredients)) or \
+                (count < 0 and not np.isfinite(item.price_per_gram)):
             self.update_nutrients_weight_cost()
+            self.update_cooking_and_water()
+            return
+
+        self.cost += item.price_per_gram * amount
+        self.weight += amount
+        self.nutrition = self.nutrition + (item.nutrition * 0.01 * amount)
+        if count:
+            if self.cooking_count is None:
+                self.update_cooking_and_water()
+            else:
+                self.cooking_count += count * int(item.cooking)
+                self.water_count += count * int(item.water)
+                self.cooking = self.cooking_count > 0
+                self.water = self.water_count > 0
+
+    def preview_ingredient(self, item: Ingredient, amount: float) -> MealPreview:
+        """
+        Totals this meal would have if add_ingredient(item, amount) was called, i.e. after adding the ingredient or
+        changing its amount. Computed from the current totals in constant time, the meal itself is not changed.
+
+        :param item: Ingredient to add or change.
+        :param amount: Its new amount in grams.
+        """
+        pair = self.ingredients.get(item.CODE)
+        delta = amount if pair is None else amount - pair[1]
+        cooking, water = self.cooking, self.water
+        if pair is None:
+            cooking, water = cooking or item.cooking, water or item.water
+
+        return MealPreview(nutrition=self.nutrition + (item.nutrition * 0.01 * delta),
+                           cost=self.cost + item.price_per_gram * delta, weight=self.weight + delta, cooking=cooking,
+                           water=water)
 
     def update_cooking_and_water(self):
-        self.cooking = self.check_cooking()
-        self.water = self.check_water()
+        self.cooking_count = sum(1 for i, _ in self.ingredients if i.cooking)
+        self.water_count = sum(1 for i, _ in self.ingredients if i.water)
+        self.cooking = self.cooking_count > 0
+        self.water = self.water_count > 0
 
     def check_cooking(self) -> bool:
         for i, _ in self.ingredients:
@@ -142,12 +345,36 @@ class Meal(LocalDatabaseComponent):
     def get_all_ingredient_amounts(self) -> list[float]:
         return [i[1] for i in self.ingredients]
 
+    def get_ingredient_pairs(self) -> list[list[Union[Ingredient, float]]]:
+        return list(self.ingredients)
+
+    def find_ingredient_code(self, name: str) -> Union[int, None]:
+        """
+        Code of the ingredient of this meal with the given name. Resolved through the name lookup of the linked
+        database, names of ingredients that are not in it are searched.
+
+        :return: Code, None if no ingredient of this meal has the name.
+        """
+        if self.linked_database is not None:
+            item = self.linked_database.get_ingredient_by_name(name)
+            if item is not None and self.ingredients.get(item.CODE) is not None:
+                return item.CODE
+        for item, _ in self.ingredients:
+            if item.name == name:
+                return item.CODE
+
+        return None
+
+    def has_ingredient_name(self, name: str) -> bool:
+        return self.find_ingredient_code(name) is not None
+
     def get_amount_of_ingredient_by_name(self, name: str) -> float:
-        for i, a in self.ingredients:
-            if i.name == name:
-                return a
+        code = self.find_ingredient_code(name)
+        if code is not None:
+            return self.ingredients.get(code)[1]
 
     def update_nutrients_weight_cost(self):
+        self.edits_since_recompute = 0
         self.cost = 0
         self.weight = 0
         self.nutrition = np.zeros(n_nutrients)
@@ -157,10 +384,16 @@ class Meal(LocalDatabaseComponent):
             self.nutrition = self.nutrition + (i.nutrition * 0.01 * a)
 
     def update_ingredient_amount(self, item: Ingredient, amount: float):
-        if item in self.get_all_ingredients():
-            ind = self.get_all_ingredients().index(item)
-            self.ingredients[ind][1] = amount
-            self.update_nutrients_weight_cost()
+        pair = self.ingredients.get(item.CODE)
+        if pair is not None:
+            old_amount = pair[1]
+            pair[1] = amount
+            self.add_to_totals(item=item, amount=amount - old_amount, count=0)
+            if self.linked_database is not None:
+                self.linked_database.meal_changed(meal=self)
+                self.linked_database.record_edit(f'Change {item.name} in {self.name}',
+                                                 undo=lambda: self.update_ingredient_amount(item, old_amount),
+                                                 redo=lambda: self.update_ingredient_amount(item, amount))
 
     def get_own_type_str(self) -> str:
         types = ''
@@ -171,12 +404,17 @@ class Meal(LocalDatabaseComponent):
         return types
 
     def remove_ingredient_by_name(self, name: str) -> bool:
-        all_names = self.get_all_ingredient_names()
-        if name in all_names:
-            ind = all_names.index(name)
-            self.ingredients.pop(ind)
-            self.update_cooking_and_water()
-            self.update_nutrients_weight_cost()
+        code = self.find_ingredient_code(name)
+        if code is not None:
+            item, amount = self.ingredients.pop(code)
+            if self.linked_database is not None:
+                self.linked_database.unlink_ingredient_from_meal(meal=self, ingredient=item)
+            self.add_to_totals(item=item, amount=-amount, count=-1)
+            if self.linked_database is not None:
+                self.linked_database.meal_changed(meal=self)
+                self.linked_database.record_edit(f'Remove {name} from {self.name}',
+                                                 undo=lambda: self.add_ingredient(item=item, amount=amount),
+                                                 redo=lambda: self.remove_ingredient_by_name(item.name))
 
             return True
 
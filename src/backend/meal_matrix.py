@@ -0,0 +1,47 @@
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Meal
+
+
+class MealIngredientMatrix:
+    """Sparse meals x ingredients matrix of amounts in grams, stored in compressed sparse row (CSR) layout. Row i
+    belongs to meals[i], column j to the ingredient with code ingredient_codes[j].
+
+    Args:
+        meals (list[Meal]): Meals, one row each.
+        ingredient_codes (ndarray): Ingredient codes in column order."""
+
+    def __init__(self, meals: list[Meal], ingredient_codes: npt.NDArray[int]):
+        self.meals = list(meals)
+        self.ingredient_codes = np.asarray(ingredient_codes)
+        column_of_code = {int(c): j for j, c in enumerate(self.ingredient_codes)}
+
+        lengths = np.fromiter((len(m.ingredients) for m in self.meals), dtype=np.int64, count=len(self.meals))
+        self.indptr = np.zeros(len(self.meals) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.indices = np.fromiter((column_of_code[i.CODE] for m in self.meals for i, _ in m.ingredients),
+                                   dtype=np.int64, count=self.indptr[-1])
+        self.data = np.fromiter((a for m in self.meals for _, a in m.ingredients), dtype=float,
+                                count=self.indptr[-1])
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.meals), len(self.ingredient_codes)
+
+    def dot(self, table: npt.NDArray[float]) -> npt.NDArray[float]:
+        """
+        Multiplies the matrix with a dense table that has one row per ingredient column.
+
+        :param table: Array of shape (n_ingredients, k).
+        :return: Array of shape (n_meals, k).
+        """
+        table = np.asarray(table, dtype=float)
+        out = np.zeros((len(self.meals), table.shape[1]))
+        if len(self.data) == 0:
+            return out
+        contributions = self.data[:, None] * table[self.indices]
+        non_empty = np.diff(self.indptr) > 0
+        out[non_empty] = np.add.reduceat(contributions, self.indptr[:-1][non_empty], axis=0)
+
+        return out
@@ -0,0 +1,187 @@
+from typing import Iterator, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Meal, n_nutrients
+
+# columns of the property matrix after the nutrients
+cost_column = n_nutrients
+missing_cost_column = n_nutrients + 1
+weight_column = n_nutrients + 2
+cooking_column = n_nutrients + 3
+n_properties = n_nutrients + 4
+
+
+class MealPlan:
+    """Meal plan of a trip as a dense days x meal types array of indices into a table of the planned meals, -1 for an
+    empty slot. Each planned meal has a row in a property matrix with its nutrition, cost, weight and if it needs
+    cooking, so the totals of any days are one gather and sum. The matrix always has unused rows of zeros at its end,
+    which the index -1 of empty slots picks.
+
+    Costs are stored as the known cost and a count of the meals whose cost is unknown, so sums of costs can be
+    changed by differences. Indexing with a day gives a DayPlan that reads like the former dict
+    {meal_type_code: Meal or None}.
+
+    Args:
+        n_meal_types (int): Number of meal types, their codes are the column indices.
+        capacity (int): Number of days to allocate initially. Grows by doubling when full."""
+
+    def __init__(self, n_meal_types: int = 4, capacity: int = 16):
+        self.n_meal_types = n_meal_types
+        self.n_days = 0
+        self.indices = np.full((capacity, n_meal_types), -1, dtype=np.int64)
+        self.meals = []
+        self.meal_indices = {}
+        self.properties = np.zeros((16, n_properties))
+
+    def __len__(self) -> int:
+        return self.n_days
+
+    def __iter__(self) -> Iterator['DayPlan']:
+        return (DayPlan(plan=self, day_ind=i) for i in range(self.n_days))
+
+    def __getitem__(self, day_ind: Union[int, slice]) -> Union['DayPlan', list['DayPlan']]:
+        if isinstance(day_ind, slice):
+            return [DayPlan(plan=self, day_ind=i) for i in range(self.n_days)[day_ind]]
+        if day_ind < 0:
+            day_ind += self.n_days
+        if not 0 <= day_ind < self.n_days:
+            raise IndexError('Day index out of range!')
+        return DayPlan(plan=self, day_ind=day_ind)
+
+    def add_day(self):
+        if self.n_days == len(self.indices):
+            grown = np.full((2 * len(self.indices), self.n_meal_types), -1, dtype=np.int64)
+            grown[:self.n_days] = self.indices[:self.n_days]
+            self.indices = grown
+        self.n_days += 1
+
+    def remove_last_day(self):
+        self.n_days -= 1
+        self.indices[self.n_days] = -1
+
+    def get_meal(self, day_ind: int, meal_type_code: int) -> Union[Meal, None]:
+        index = self.indices[day_ind, meal_type_code]
+        return None if index < 0 else self.meals[index]
+
+    def set_meal(self, day_ind: int, meal_type_code: int, meal: Union[Meal, None]):
+        self.indices[day_ind, meal_type_code] = -1 if meal is None else self.index_meal(meal)
+
+    def index_meal(self, meal: Meal) -> int:
+        """
+        Index of a meal in the table, adding it with its current values if it is not there yet.
+        """
+        index = self.meal_indices.get(id(meal))
+        if index is None:
+            index = len(self.meals)
+            if index + 1 >= len(self.properties):
+                grown = np.zeros((2 * len(self.properties), n_properties))
+                grown[:index] = self.properties[:index]
+                self.properties = grown
+            self.meals.append(meal)
+            self.meal_indices[id(meal)] = index
+            self.properties[index] = get_meal_properties(meal)
+
+        return index
+
+    def refresh_meal(self, meal: Meal) -> npt.NDArray[int]:
+        """
+        Takes the current values of a meal into its row, e.g. after its ingredients changed.
+
+        :return: Days that plan the meal.
+        """
+        index = self.meal_indices.get(id(meal))
+        if index is None:
+            return np.zeros(0, dtype=np.int64)
+        self.properties[index] = get_meal_properties(meal)
+
+        return np.flatnonzero((self.indices[:self.n_days] == index).any(axis=1))
+
+    def refresh_all(self):
+        """
+        Takes the current values of all meals into their rows.
+        """
+        n = len(self.meals)
+        if n == 0:
+            return
+        rows = self.properties[:n]
+        rows[:, :n_nutrients] = np.array([meal.nutrition for meal in self.meals], dtype=float)
+        costs = np.fromiter((meal.cost for meal in self.meals), dtype=float, count=n)
+        missing = np.isnan(costs)
+        rows[:, cost_column] = np.where(missing, 0, costs)
+        rows[:, missing_cost_column] = missing
+        rows[:, weight_column] = np.fromiter((meal.weight for meal in self.meals), dtype=float, count=n)
+        rows[:, cooking_column] = np.fromiter((meal.cooking for meal in self.meals), dtype=float, count=n)
+
+    def get_meal_codes(self, empty: object = None) -> npt.NDArray[object]:
+        """
+        Codes of the planned meals of all days, as an object array of shape (n_days, n_meal_types).
+
+        :param empty: Value of empty slots.
+        """
+        table = np.array([meal.CODE for meal in self.meals] + [empty], dtype=object)
+
+        return table[self.indices[:self.n_days]]
+
+    def get_day_sums(self, day_inds: Union[npt.NDArray[int], slice] = slice(None)) -> npt.NDArray[float]:
+        """
+        Sums of the property rows of the meals of days, all days by default.
+
+        :return: Array of shape (n_days, n_properties).
+        """
+        return self.properties[self.indices[:self.n_days][day_inds]].sum(axis=1)
+
+
+class DayPlan:
+    """Read-only view of one day of a MealPlan with the mapping interface of the former dict
+    {meal_type_code: Meal or None}.
+
+    Args:
+        plan (MealPlan): Plan the day belongs to.
+        day_ind (int): Index of the day."""
+
+    __slots__ = ('plan', 'day_ind')
+
+    def __init__(self, plan: MealPlan, day_ind: int):
+        self.plan = plan
+        self.day_ind = day_ind
+
+    def __getitem__(self, meal_type_code: int) -> Union[Meal, None]:
+        if not 0 <= meal_type_code < self.plan.n_meal_types:
+            raise KeyError(meal_type_code)
+        return self.plan.get_meal(day_ind=self.day_ind, meal_type_code=meal_type_code)
+
+    def __len__(self) -> int:
+        return self.plan.n_meal_types
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.plan.n_meal_types))
+
+    def get(self, meal_type_code: int, default=None) -> Union[Meal, None]:
+        if not 0 <= meal_type_code < self.plan.n_meal_types:
+            return default
+        return self[meal_type_code]
+
+    def keys(self) -> range:
+        return range(self.plan.n_meal_types)
+
+    def values(self) -> list[Union[Meal, None]]:
+        meals = self.plan.meals
+        return [None if i < 0 else meals[i] for i in self.plan.indices[self.day_ind].tolist()]
+
+    def items(self) -> list[tuple[int, Union[Meal, None]]]:
+        return list(enumerate(self.values()))
+
+
+def get_meal_properties(meal: Meal) -> npt.NDArray[float]:
+    row = np.zeros(n_properties)
+    row[:n_nutrients] = meal.nutrition
+    if np.isnan(meal.cost):
+        row[missing_cost_column] = 1
+    else:
+        row[cost_column] = meal.cost
+    row[weight_column] = meal.weight
+    row[cooking_column] = int(meal.cooking)
+
+    return row
@@ -0,0 +1,121 @@
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Ingredient, Meal, MealPreview
+
+
+class MealPreviewGrid:
+    """Totals of a meal after setting the amount of each of several candidate ingredients to each amount of a grid, all
+    computed in one broadcasted operation. Entry [i, j] of every result belongs to candidate i at amounts[j]. Like
+    Meal.preview_ingredient, a candidate that is already in the meal has its amount changed instead of added, and the
+    meal itself is not changed.
+
+    The nutrition result holds n_candidates * n_amounts * n_nutrients floats, so grids over all ingredients of a
+    database should use few amounts.
+
+    Args:
+        meal (Meal): Meal to preview.
+        codes (ndarray): Codes of the candidate ingredients.
+        nutrition (ndarray): Nutritional values per 100 g of the candidates, shape (n_candidates, n_nutrients).
+        price_per_gram (ndarray): Prices of the candidates, NaN if unknown.
+        cooking (ndarray): If the candidates require cooking.
+        water (ndarray): If the candidates require water.
+        amounts (ndarray): Amounts in grams to preview."""
+
+    def __init__(self, meal: Meal, codes: npt.NDArray[int], nutrition: npt.NDArray[float],
+                 price_per_gram: npt.NDArray[float], cooking: npt.NDArray[bool], water: npt.NDArray[bool],
+                 amounts: npt.NDArray[float]):
+        self.meal = meal
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.amounts = np.asarray(amounts, dtype=float)
+        self.current_amounts = get_current_amounts(meal=meal, codes=self.codes)
+        self.in_meal = get_in_meal(meal=meal, codes=self.codes)
+        self.cooking = meal.cooking | (np.asarray(cooking, dtype=bool) & ~self.in_meal)
+        self.water = meal.water | (np.asarray(water, dtype=bool) & ~self.in_meal)
+
+        deltas = self.amounts[None, :] - self.current_amounts[:, None]
+        self.nutrition = meal.nutrition + deltas[:, :, None] * (np.asarray(nutrition, dtype=float) * 0.01)[:, None, :]
+        self.cost = meal.cost + deltas * np.asarray(price_per_gram, dtype=float)[:, None]
+        self.weight = meal.weight + deltas
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.energy_density = np.where(self.weight > 0, self.nutrition[:, :, 0] / self.weight * 100, np.nan)
+
+    @classmethod
+    def from_columns(cls, meal: Meal, columns: dict[str, npt.NDArray], amounts: npt.NDArray[float]) \
+            -> 'MealPreviewGrid':
+        """
+        Uses all ingredients of columns keyed like LocalDatabase.get_ingredient_arrays as candidates.
+        """
+        return cls(meal=meal, codes=columns['code'], nutrition=columns['nutrition'],
+                   price_per_gram=columns['price_per_gram'], cooking=columns['cooking'], water=columns['water'],
+                   amounts=amounts)
+
+    @classmethod
+    def from_ingredients(cls, meal: Meal, ingredients: list[Ingredient], amounts: npt.NDArray[float]) \
+            -> 'MealPreviewGrid':
+        nutrition = np.zeros((len(ingredients), len(meal.nutrition)))
+        for i, ingredient in enumerate(ingredients):
+            nutrition[i] = ingredient.nutrition
+
+        return cls(meal=meal, codes=[i.CODE for i in ingredients], nutrition=nutrition,
+                   price_per_gram=[i.price_per_gram for i in ingredients], cooking=[i.cooking for i in ingredients],
+                   water=[i.water for i in ingredients], amounts=amounts)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.codes), len(self.amounts)
+
+    def find_amount_index(self, amount: float) -> int:
+        """
+        Index of the grid amount closest to amount.
+        """
+        return int(np.abs(self.amounts - amount).argmin())
+
+    def get_preview(self, candidate: int, amount_index: int) -> MealPreview:
+        """
+        Totals of one grid entry, equal to what meal.preview_ingredient returns for the candidate and amount.
+
+        :param candidate: Row of the candidate.
+        :param amount_index: Index into amounts.
+        """
+        return MealPreview(nutrition=self.nutrition[candidate, amount_index].copy(),
+                           cost=float(self.cost[candidate, amount_index]),
+                           weight=float(self.weight[candidate, amount_index]), cooking=bool(self.cooking[candidate]),
+                           water=bool(self.water[candidate]))
+
+    def rank_additions(self, amount_index: int, count: int = 10) -> npt.NDArray[int]:
+        """
+        Candidates that are not in the meal yet, ordered by the energy density the meal would have with them added at
+        one grid amount, highest first. Candidates without a density are left out.
+
+        :param amount_index: Index into amounts.
+        :param count: Maximum number of candidates to return.
+        :return: Rows of the best candidates.
+        """
+        density = self.energy_density[:, amount_index]
+        rows = np.flatnonzero(~self.in_meal & ~np.isnan(density))
+        if len(rows) > count:
+            rows = rows[np.argpartition(-density[rows], count - 1)[:count]]
+
+        return rows[np.argsort(-density[rows], kind='stable')]
+
+
+def get_in_meal(meal: Meal, codes: npt.NDArray[int]) -> npt.NDArray[bool]:
+    return np.isin(codes, meal.get_all_ingredient_codes())
+
+
+def get_current_amounts(meal: Meal, codes: npt.NDArray[int]) -> npt.NDArray[float]:
+    """
+    Amounts in grams the meal holds of each code, 0 for codes that are not in the meal.
+    """
+    amounts = np.zeros(len(codes))
+    meal_codes = np.array(meal.get_all_ingredient_codes(), dtype=np.int64)
+    if len(meal_codes) == 0:
+        return amounts
+    order = np.argsort(meal_codes)
+    sorted_codes = meal_codes[order]
+    positions = np.searchsorted(sorted_codes, codes).clip(max=len(sorted_codes) - 1)
+    found = sorted_codes[positions] == codes
+    amounts[found] = np.array(meal.get_all_ingredient_amounts(), dtype=float)[order][positions[found]]
+
+    return amounts
@@ -0,0 +1,119 @@
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Meal
+
+
+class MealRecords:
+    """Compact raw values of meals that have not been built into Meal objects yet. Meal types are kept as a bit mask,
+    ingredients as flat code and amount arrays shared by all meals.
+
+    Args:
+        codes (ndarray): Meal codes.
+        names (list[str]): Meal names.
+        type_values (ndarray): Flat meal type codes, meal i owns type_values[type_offsets[i]:type_offsets[i + 1]].
+        type_offsets (ndarray): Offsets into type_values.
+        ingredient_codes (ndarray): Flat ingredient codes, meal i owns the slice given by ingredient_offsets.
+        ingredient_offsets (ndarray): Offsets into ingredient_codes and amounts.
+        amounts (ndarray): Flat amounts in grams.
+        nutrition (ndarray): Nutritional values, one row per meal.
+        cooking (ndarray): If cooking is required.
+        water (ndarray): If water is required.
+        costs (ndarray): Cost of each meal.
+        weights (ndarray): Weight of each meal."""
+
+    def __init__(self, codes: npt.NDArray[int], names: list[str], type_values: npt.NDArray[int],
+                 type_offsets: npt.NDArray[int], ingredient_codes: npt.NDArray[int],
+                 ingredient_offsets: npt.NDArray[int], amounts: npt.NDArray[float], nutrition: npt.NDArray[float],
+                 cooking: npt.NDArray[bool], water: npt.NDArray[bool], costs: npt.NDArray[float],
+                 weights: npt.NDArray[float]):
+        n = len(codes)
+        self.codes = np.array(codes, dtype=np.int64)
+        self.names = list(names)
+        type_offsets = np.asarray(type_offsets, dtype=np.int64)
+        bits = np.left_shift(1, np.asarray(type_values, dtype=np.int64))
+        self.type_masks = np.zeros(n, dtype=np.uint8)
+        has_types = np.diff(type_offsets) > 0
+        if bits.size:
+            self.type_masks[has_types] = np.bitwise_or.reduceat(bits, type_offsets[:-1][has_types])
+        self.ingredient_codes = np.array(ingredient_codes, dtype=np.int64)
+        self.ingredient_offsets = np.array(ingredient_offsets, dtype=np.int64)
+        self.amounts = np.array(amounts, dtype=float)
+        self.nutrition = np.array(nutrition, dtype=float).reshape(n, -1)
+        self.cooking = np.array(cooking, dtype=bool)
+        self.water = np.array(water, dtype=bool)
+        self.costs = np.array(costs, dtype=float)
+        self.weights = np.array(weights, dtype=float)
+        self.row_of_code = dict(zip(self.codes.tolist(), range(n)))
+        self.row_of_name = dict(zip(self.names, range(n)))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def forget(self, row: int):
+        """
+        Stops finding a row by code or name, after its meal has been built.
+        """
+        self.row_of_code.pop(int(self.codes[row]), None)
+        if self.row_of_name.get(self.names[row]) == row:
+            del self.row_of_name[self.names[row]]
+
+    def get_type_codes(self, row: int) -> list[int]:
+        mask = int(self.type_masks[row])
+        return [t for t in range(mask.bit_length()) if mask >> t & 1]
+
+    def get_ingredients(self, row: int) -> tuple[list[int], list[float]]:
+        """
+        :return: Ingredient codes and amounts of a row.
+        """
+        rows = slice(self.ingredient_offsets[row], self.ingredient_offsets[row + 1])
+        return self.ingredient_codes[rows].tolist(), self.amounts[rows].tolist()
+
+
+class LazyMealList(list):
+    """List of meals that holds the MealRecords row index in place of every meal that has not been built yet. Reading
+    an entry by index or iteration builds its meal, length, appending and removing built meals do not.
+
+    Args:
+        records (MealRecords): Raw values of the unbuilt meals.
+        build (Callable): Builds the meal of a row and stores it in the list via set_built."""
+
+    def __init__(self, records: MealRecords, build: Callable[[int], Meal]):
+        super().__init__(range(len(records)))
+        self.records = records
+        self.build = build
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = list.__getitem__(self, index)
+        if type(item) is int:
+            item = self.build(item)
+
+        return item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_raw_entries(self) -> list:
+        """
+        Returns all entries without building any meal. Unbuilt meals appear as their row index.
+        """
+        return list(list.__iter__(self))
+
+    def set_built(self, row: int, meal: Meal):
+        """
+        Replaces the row index of a meal with the built meal.
+        """
+        if row < len(self):
+            entry = list.__getitem__(self, row)
+            if type(entry) is int and entry == row:
+                list.__setitem__(self, row, meal)
+                return
+        for position, entry in enumerate(list.__iter__(self)):
+            if type(entry) is int and entry == row:
+                list.__setitem__(self, position, meal)
+                return
@@ -0,0 +1,225 @@
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Ingredient, n_nutrients
+
+
+class NutrientStore:
+    """Columnar storage of the numerical values of all ingredients in a database. Nutrients are kept in one contiguous
+    matrix with one row per ingredient, all other values in parallel arrays of the same length.
+
+    Args:
+        capacity (int): Number of rows to allocate initially. Grows by doubling when full."""
+
+    def __init__(self, capacity: int = 64):
+        self.size = 0
+        self.items = []
+        self.codes = np.full(capacity, -1, dtype=np.int64)
+        self.nutrition = np.zeros((capacity, n_nutrients))
+        self.price_per_unit = np.full(capacity, np.nan)
+        self.unit_size = np.full(capacity, np.nan)
+        self.price_per_gram = np.full(capacity, np.nan)
+        self.cooking = np.zeros(capacity, dtype=bool)
+        self.water = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def reserve(self, capacity: int):
+        """
+        Makes sure at least capacity rows are allocated.
+
+        :param capacity: Minimum number of rows.
+        """
+        old_capacity = len(self.codes)
+        if capacity <= old_capacity:
+            return
+        new_capacity = max(capacity, 2 * old_capacity)
+        for attr, fill in [('codes', -1), ('nutrition', 0), ('price_per_unit', np.nan), ('unit_size', np.nan),
+                           ('price_per_gram', np.nan), ('cooking', False), ('water', False)]:
+            old = getattr(self, attr)
+            new = np.full((new_capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+
+    def add(self, CODE: int, name: str, types: npt.NDArray[int], nutrition: npt.NDArray[float], cooking: bool = False,
+            water: bool = False, price_per_unit: float = np.nan, unit_size: float = np.nan) -> 'IngredientRow':
+        """
+        Appends a row and returns an ingredient viewing it.
+
+        :return: Ingredient backed by the new row.
+        """
+        self.reserve(self.size + 1)
+        row = self.size
+        self.size += 1
+        item = IngredientRow(store=self, row=row, CODE=CODE, name=name, types=types)
+        self.items.append(item)
+        self.codes[row] = CODE
+        item.update(name=name, types=types, nutrition=nutrition, cooking=cooking, water=water,
+                    price_per_unit=price_per_unit, unit_size=unit_size)
+
+        return item
+
+    def extend(self, codes: npt.NDArray[int], names: list[str], types: list[npt.NDArray[int]],
+               nutrition: npt.NDArray[float], cooking: npt.NDArray[bool], water: npt.NDArray[bool],
+               price_per_unit: npt.NDArray[float], unit_size: npt.NDArray[float]) -> list['IngredientRow']:
+        """
+        Appends many rows at once from column arrays.
+
+        :return: Ingredients backed by the new rows.
+        """
+        n = len(codes)
+        self.reserve(self.size + n)
+        rows = slice(self.size, self.size + n)
+        self.codes[rows] = codes
+        self.nutrition[rows] = nutrition
+        self.cooking[rows] = cooking
+        self.water[rows] = water
+        self.price_per_unit[rows] = price_per_unit
+        self.unit_size[rows] = unit_size
+        self.price_per_gram[rows] = np.asarray(price_per_unit, dtype=float) / np.asarray(unit_size, dtype=float)
+        items = [IngredientRow(store=self, row=self.size + i, CODE=int(c), name=name, types=t)
+                 for i, (c, name, t) in enumerate(zip(codes, names, types))]
+        self.items.extend(items)
+        self.size += n
+
+        return items
+
+    def remove(self, item: 'IngredientRow'):
+        """
+        Removes the row of an ingredient by moving the last row into its place. The removed ingredient keeps a
+        detached copy of its values.
+
+        :param item: Ingredient to remove.
+        """
+        row = item.row
+        last = self.size - 1
+        values = item.get_values()
+        if row != last:
+            moved = self.items[last]
+            for col in [self.codes, self.nutrition, self.price_per_unit, self.unit_size, self.price_per_gram,
+                        self.cooking, self.water]:
+                col[row] = col[last]
+            moved.row = row
+            self.items[row] = moved
+        self.items.pop()
+        self.size -= 1
+        item.detach(values)
+
+    def attach(self, item: 'IngredientRow'):
+        """
+        Moves a removed ingredient from its detached copy back into a new last row, e.g. when its removal is undone.
+
+        :param item: Ingredient removed from this or another store.
+        """
+        values = item.get_values()
+        self.reserve(self.size + 1)
+        row = self.size
+        self.size += 1
+        self.items.append(item)
+        self.codes[row] = item.CODE
+        item.store = self
+        item.row = row
+        for key, val in values.items():
+            setattr(item, key, val)
+
+    def columns(self) -> dict[str, npt.NDArray]:
+        """
+        Returns views of all used rows, keyed by column name.
+        """
+        n = self.size
+        return {'code': self.codes[:n], 'nutrition': self.nutrition[:n], 'price_per_unit': self.price_per_unit[:n],
+                'unit_size': self.unit_size[:n], 'price_per_gram': self.price_per_gram[:n],
+                'cooking': self.cooking[:n], 'water': self.water[:n]}
+
+
+class IngredientRow(Ingredient):
+    """Ingredient whose numerical values live in a row of a NutrientStore. Behaves like an Ingredient, but nutrition
+    is a view into the shared matrix.
+
+    Args:
+        store (NutrientStore): Store holding the values.
+        row (int): Row index in store."""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: NutrientStore, row: int, CODE: int, name: str, types: npt.NDArray[int]):
+        self.store = store
+        self.row = row
+        self.CODE = CODE
+        self.name = name
+        self.types = types
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self is other or (self.CODE == other.CODE and self.name == other.name and
+                                 np.array_equal(self.nutrition, other.nutrition))
+
+    __hash__ = None
+
+    def get_values(self) -> dict:
+        return {'nutrition': self.nutrition.copy(), 'cooking': self.cooking, 'water': self.water,
+                'price_per_unit': self.price_per_unit, 'unit_size': self.unit_size,
+                'price_per_gram': self.price_per_gram}
+
+    def detach(self, values: dict):
+        """
+        Gives the ingredient a private single-row store holding values, so it stays usable after removal.
+        """
+        store = NutrientStore(capacity=1)
+        store.size = 1
+        store.items.append(self)
+        store.codes[0] = self.CODE
+        self.store = store
+        self.row = 0
+        for key, val in values.items():
+            setattr(self, key, val)
+
+    @property
+    def nutrition(self) -> npt.NDArray[float]:
+        return self.store.nutrition[self.row]
+
+    @nutrition.setter
+    def nutrition(self, value: npt.NDArray[float]):
+        self.store.nutrition[self.row] = value
+
+    @property
+    def cooking(self) -> bool:
+        return bool(self.store.cooking[self.row])
+
+    @cooking.setter
+    def cooking(self, value: bool):
+        self.store.cooking[self.row] = value
+
+    @property
+    def water(self) -> bool:
+        return bool(self.store.water[self.row])
+
+    @water.setter
+    def water(self, value: bool):
+        self.store.water[self.row] = value
+
+    @property
+    def price_per_unit(self) -> float:
+        return float(self.store.price_per_unit[self.row])
+
+    @price_per_unit.setter
+    def price_per_unit(self, value: float):
+        self.store.price_per_unit[self.row] = value
+
+    @property
+    def unit_size(self) -> float:
+        return float(self.store.unit_size[self.row])
+
+    @unit_size.setter
+    def unit_size(self, value: float):
+        self.store.unit_size[self.row] = value
+
+    @property
+    def price_per_gram(self) -> float:
+        return float(self.store.price_per_gram[self.row])
+
+    @price_per_gram.setter
+    def price_per_gram(self, value: float):
+        self.store.price_per_gram[self.row] = value
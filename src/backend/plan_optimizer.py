@@ -0,0 +1,264 @@
+import time
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import nutrient_names
+
+energy_column = nutrient_names.index('energy')
+protein_column = nutrient_names.index('protein')
+
+
+@dataclass
+class PlanConstraints:
+    """Requirements every day of an optimized meal plan has to meet.
+
+    Args:
+        min_energy (float): Minimum energy per day in kcal.
+        min_protein (float): Minimum protein per day in grams.
+        max_repeats (int): How often one meal may be planned over the whole trip.
+        max_cooking (int): Maximum number of meals per day that need cooking."""
+
+    min_energy: float = 0.
+    min_protein: float = 0.
+    max_repeats: int = 3
+    max_cooking: int = 4
+
+
+@dataclass
+class PlanSolution:
+    """Meal plan found by MealPlanOptimizer.
+
+    Args:
+        meal_codes (ndarray): Codes of the chosen meals, shape (n_days, n_meal_types), -1 for slots without a meal.
+        objective (float): Total weight in grams or total cost of the plan.
+        feasible (bool): If every slot has a meal and every day meets the constraints.
+        passes (int): Number of improvement passes over all slots that were run."""
+
+    meal_codes: npt.NDArray[int]
+    objective: float
+    feasible: bool
+    passes: int
+
+
+class MealPlanOptimizer:
+    """Heuristic that fills every slot of a meal plan with a meal of the slot's meal type so that the total weight or
+    cost is as low as possible, while each day has enough energy and protein, not too many meals that need cooking and
+    no meal is planned more often than allowed.
+
+    Plans are compared by their violation first, the missing energy and protein as fractions of the minimums plus the
+    excess cooking and the empty slots, and by the objective second. Starting from a greedy plan, each pass replaces the
+    meal of every slot by the best allowed meal for the rest of its day, evaluated for all candidates of the meal type
+    at once. When a pass finds no improvement, a few random days are reassigned and passes continue from there. The
+    best plan found within the time budget is kept.
+
+    To keep passes fast on large databases, the candidates of a meal type are a shortlist of its meals with the lowest
+    objective per kcal, per gram of protein and per both, the lowest objective and, among meals that need no cooking,
+    the lowest objective per both, pool_size of each.
+
+    Args:
+        columns (dict): Meal values keyed like LocalDatabase.get_meal_columns, at least 'code', 'own_types',
+            'nutrition', 'cooking', 'cost' and 'weight'.
+        meal_type_codes (list[int]): Meal types to plan, one slot per type and day.
+        n_days (int): Number of days.
+        constraints (PlanConstraints): Requirements of each day.
+        objective (str): 'weight' or 'cost'. Meals without a price are not planned when minimizing the cost.
+        seed (int): Seed of the random choices, None for a random seed.
+        pool_size (int): Length of each ranking of the shortlist, by default enough for every slot of a type to get a
+            different meal and at least 64."""
+
+    def __init__(self, columns: dict, meal_type_codes: list[int], n_days: int, constraints: PlanConstraints,
+                 objective: str = 'weight', seed: int = None, pool_size: int = None):
+        if objective not in ('weight', 'cost'):
+            raise ValueError(f'Unknown objective {objective}!')
+        self.codes = np.asarray(columns['code'], dtype=np.int64)
+        self.costs = np.asarray(columns[objective], dtype=float)
+        nutrition = np.asarray(columns['nutrition'], dtype=float).reshape(len(self.codes), -1)
+        self.energy = nutrition[:, energy_column]
+        self.protein = nutrition[:, protein_column]
+        self.cooking = np.asarray(columns['cooking'], dtype=np.int64)
+        self.meal_type_codes = list(meal_type_codes)
+        self.n_days = n_days
+        self.constraints = constraints
+        self.rng = np.random.default_rng(seed)
+
+        usable = ~np.isnan(self.costs) & ~np.isnan(self.energy) & ~np.isnan(self.protein)
+        rows_by_type = {code: [] for code in self.meal_type_codes}
+        for row, own_types in enumerate(columns['own_types']):
+            if usable[row]:
+                for code in own_types:
+                    if code in rows_by_type:
+                        rows_by_type[code].append(row)
+        if pool_size is None:
+            pool_size = max(64, n_days)
+        self.candidates = [self.get_shortlist(np.array(rows_by_type[code], dtype=np.int64), pool_size=pool_size)
+                           for code in self.meal_type_codes]
+
+        self.plan = np.full((n_days, len(self.meal_type_codes)), -1, dtype=np.int64)
+        self.uses = np.zeros(len(self.codes), dtype=np.int64)
+        self.day_energy = np.zeros(n_days)
+        self.day_protein = np.zeros(n_days)
+        self.day_cooking = np.zeros(n_days, dtype=np.int64)
+
+    def get_shortlist(self, rows: npt.NDArray[int], pool_size: int) -> npt.NDArray[int]:
+        """
+        Rows of the shortlist of one meal type, see the class description.
+        """
+        if len(rows) <= 5 * pool_size:
+            return rows
+        costs, energy, protein = self.costs[rows], self.energy[rows], self.protein[rows]
+        # both nutrients weighted by the amounts a day needs, or by their medians without minimums
+        value = energy / (self.constraints.min_energy or max(float(np.median(energy)), 1e-9)) + \
+            protein / (self.constraints.min_protein or max(float(np.median(protein)), 1e-9))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rankings = [np.where(energy > 0, costs / energy, np.inf), np.where(protein > 0, costs / protein, np.inf),
+                        np.where(value > 0, costs / value, np.inf), costs]
+        rankings.append(np.where(self.cooking[rows] == 0, rankings[2], np.inf))
+        kept = np.concatenate([np.argpartition(ranking, pool_size - 1)[:pool_size] for ranking in rankings])
+
+        return rows[np.unique(kept)]
+
+    def solve(self, time_budget: float = 2.) -> PlanSolution:
+        """
+        Searches for the best plan until the time budget is used up or, if no plan could be improved any more, earlier.
+        The greedy start plan is always completed.
+
+        :param time_budget: Seconds to search.
+        """
+        deadline = time.perf_counter() + time_budget
+        slots = [(d, t) for d in range(self.n_days) for t in range(len(self.meal_type_codes))]
+        for d, t in slots:
+            self.improve_slot(d, t)
+        passes = 0
+        while self.run_pass(slots=slots, deadline=deadline):
+            passes += 1
+        best_plan, best_score = self.plan.copy(), self.get_score()
+
+        while time.perf_counter() < deadline and self.n_days:
+            for d in self.rng.choice(self.n_days, size=min(self.n_days, 3), replace=False):
+                for t in range(len(self.meal_type_codes)):
+                    self.set_slot(d, t, self.get_random_allowed(d, t))
+            while self.run_pass(slots=slots, deadline=deadline):
+                passes += 1
+            score = self.get_score()
+            if is_better(score, best_score):
+                best_plan, best_score = self.plan.copy(), score
+            else:
+                self.load_plan(best_plan)
+
+        self.load_plan(best_plan)
+        meal_codes = np.where(best_plan >= 0, self.codes[best_plan], -1)
+
+        return PlanSolution(meal_codes=meal_codes, objective=best_score[1], feasible=best_score[0] <= 1e-9,
+                            passes=passes)
+
+    def run_pass(self, slots: list[tuple[int, int]], deadline: float) -> bool:
+        """
+        Improves all slots in random order.
+
+        :return: If any slot improved, False as well when the deadline passed.
+        """
+        improved = False
+        for i in self.rng.permutation(len(slots)):
+            if time.perf_counter() > deadline:
+                return False
+            improved |= self.improve_slot(*slots[i])
+
+        return improved
+
+    def improve_slot(self, d: int, t: int) -> bool:
+        """
+        Puts the allowed meal into a slot that gives its day the lowest violation, and among those the lowest
+        objective.
+
+        :return: If the slot changed to a better meal.
+        """
+        candidates = self.candidates[t]
+        if len(candidates) == 0:
+            return False
+        current = self.plan[d, t]
+        rest_energy, rest_protein, rest_cooking = self.get_day_without(d, current)
+
+        violations = self.get_violation(rest_energy + self.energy[candidates], rest_protein + self.protein[candidates],
+                                        rest_cooking + self.cooking[candidates])
+        violations[(self.uses[candidates] >= self.constraints.max_repeats) & (candidates != current)] = np.inf
+        least = violations.min()
+        if not np.isfinite(least):
+            return False
+        costs = np.where(violations <= least + 1e-9, self.costs[candidates], np.inf)
+        best = int(np.argmin(costs))
+        if current >= 0:
+            current_score = (self.get_violation(rest_energy + self.energy[current], rest_protein + self.protein[current],
+                                                rest_cooking + self.cooking[current]), self.costs[current])
+            if not is_better((violations[best], costs[best]), current_score):
+                return False
+        self.set_slot(d, t, int(candidates[best]))
+
+        return True
+
+    def get_random_allowed(self, d: int, t: int) -> int:
+        candidates = self.candidates[t]
+        allowed = candidates[(self.uses[candidates] < self.constraints.max_repeats) | (candidates == self.plan[d, t])]
+        return int(self.rng.choice(allowed)) if len(allowed) else -1
+
+    def get_day_without(self, d: int, row: int) -> tuple[float, float, int]:
+        if row < 0:
+            return self.day_energy[d], self.day_protein[d], self.day_cooking[d]
+        return self.day_energy[d] - self.energy[row], self.day_protein[d] - self.protein[row], \
+            self.day_cooking[d] - self.cooking[row]
+
+    def get_violation(self, energy: Union[float, npt.NDArray[float]], protein: Union[float, npt.NDArray[float]],
+                      cooking: Union[int, npt.NDArray[int]]) -> Union[float, npt.NDArray[float]]:
+        """
+        Missing energy and protein as fractions of the minimums plus the number of meals cooked too many, of days
+        with the given totals.
+        """
+        c = self.constraints
+        return np.maximum(c.min_energy - energy, 0) / max(c.min_energy, 1e-9) + \
+            np.maximum(c.min_protein - protein, 0) / max(c.min_protein, 1e-9) + \
+            np.maximum(cooking - c.max_cooking, 0)
+
+    def set_slot(self, d: int, t: int, row: int):
+        old = self.plan[d, t]
+        if old >= 0:
+            self.uses[old] -= 1
+            self.day_energy[d] -= self.energy[old]
+            self.day_protein[d] -= self.protein[old]
+            self.day_cooking[d] -= self.cooking[old]
+        self.plan[d, t] = row
+        if row >= 0:
+            self.uses[row] += 1
+            self.day_energy[d] += self.energy[row]
+            self.day_protein[d] += self.protein[row]
+            self.day_cooking[d] += self.cooking[row]
+
+    def load_plan(self, plan: npt.NDArray[int]):
+        """
+        Replaces the current plan and recomputes uses and day totals, which drops rounding errors of the updates.
+        """
+        self.plan = plan.copy()
+        filled = self.plan >= 0
+        rows = self.plan[filled]
+        self.uses = np.bincount(rows, minlength=len(self.codes))
+        self.day_energy = np.where(filled, self.energy[self.plan], 0).sum(axis=1)
+        self.day_protein = np.where(filled, self.protein[self.plan], 0).sum(axis=1)
+        self.day_cooking = np.where(filled, self.cooking[self.plan], 0).sum(axis=1)
+
+    def get_score(self) -> tuple[float, float]:
+        """
+        Violation of all days, counting each empty slot as 1, and objective of the current plan.
+        """
+        filled = self.plan >= 0
+        violation = self.get_violation(self.day_energy, self.day_protein, self.day_cooking).sum() + (~filled).sum()
+        return float(violation), float(self.costs[self.plan[filled]].sum())
+
+
+def is_better(score: tuple[float, float], other: tuple[float, float]) -> bool:
+    """
+    If a (violation, objective) score is better than another, comparing violations first.
+    """
+    if score[0] < other[0] - 1e-9:
+        return True
+    return score[0] <= other[0] + 1e-9 and score[1] < other[1] - 1e-9
@@ -0,0 +1,72 @@
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import n_nutrients, recompute_interval
+from src.backend.meal_plan import MealPlan, n_properties, cost_column, missing_cost_column, weight_column, \
+    cooking_column
+
+
+class PlanTotals:
+    """Running nutrition, cost, weight and number of cooked meals of every day of a meal plan and of the whole plan.
+    A changed day is re-summed from the property rows of its meals, and the plan totals are changed by the difference
+    of that day, both in constant time. The plan totals are re-summed from the days after recompute_interval changes to
+    drop rounding errors.
+
+    A cost total with a meal whose cost is unknown is NaN, as if it had been summed directly.
+
+    Args:
+        plan (MealPlan): Plan to sum, its days are summed at once."""
+
+    def __init__(self, plan: MealPlan):
+        self.plan = plan
+        self.day_sums = np.zeros((max(len(plan.indices), 1), n_properties))
+        self.day_sums[:plan.n_days] = plan.get_day_sums()
+        self.sums = np.zeros(n_properties)
+        self.edits_since_recompute = 0
+        self.sum_days()
+
+    def add_day(self):
+        if self.plan.n_days > len(self.day_sums):
+            grown = np.zeros((2 * len(self.day_sums), n_properties))
+            grown[:len(self.day_sums)] = self.day_sums
+            self.day_sums = grown
+
+    def remove_last_day(self):
+        """
+        Drops the totals of the last day, called before it is removed from the plan.
+        """
+        day_ind = self.plan.n_days - 1
+        self.sums = self.sums - self.day_sums[day_ind]
+        self.day_sums[day_ind] = 0
+
+    def update_days(self, day_inds: npt.NDArray[int]):
+        """
+        Re-sums days after their meals or the values of their meals changed.
+        """
+        if len(day_inds) == 0:
+            return
+        new_sums = self.plan.get_day_sums(day_inds)
+        self.sums = self.sums + (new_sums - self.day_sums[day_inds]).sum(axis=0)
+        self.day_sums[day_inds] = new_sums
+
+        self.edits_since_recompute += 1
+        if self.edits_since_recompute >= recompute_interval:
+            self.sum_days()
+
+    def sum_days(self):
+        self.sums = self.day_sums[:self.plan.n_days].sum(axis=0)
+        self.edits_since_recompute = 0
+
+    def get_day(self, day_ind: int) -> tuple[npt.NDArray[float], float, float, int]:
+        return split_sums(self.day_sums[day_ind])
+
+    def get_total(self) -> tuple[npt.NDArray[float], float, float, int]:
+        return split_sums(self.sums)
+
+
+def split_sums(sums: npt.NDArray[float]) -> tuple[npt.NDArray[float], float, float, int]:
+    """
+    Nutrition, cost, weight and number of cooked meals from a row of summed properties.
+    """
+    cost = np.nan if sums[missing_cost_column] > 0.5 else float(sums[cost_column])
+    return sums[:n_nutrients].copy(), cost, float(sums[weight_column]), int(round(sums[cooking_column]))
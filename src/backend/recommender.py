@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+
+from src.backend.food import Meal, nutrient_names
+
+# energy in kcal per gram of each macro nutrient
+macro_energy = {'fat': 9., 'carbs': 4., 'protein': 4.}
+
+
+@dataclass
+class MacroRatioTarget:
+    """Target shares of the energy that comes from fat, carbs and protein. The shares are normalized, so 30, 50, 20
+    and 0.3, 0.5, 0.2 are the same target.
+
+    Args:
+        fat (float): Share of energy from fat.
+        carbs (float): Share of energy from carbs.
+        protein (float): Share of energy from protein."""
+
+    fat: float
+    carbs: float
+    protein: float
+
+    def get_goal(self) -> npt.NDArray[float]:
+        goal = np.array([self.fat, self.carbs, self.protein], dtype=float)
+        return goal / goal.sum()
+
+    def get_profiles(self, nutrition: npt.NDArray[float], weights: npt.NDArray[float]) \
+            -> tuple[npt.NDArray[float], npt.NDArray[float]]:
+        """
+        Energy shares of the macro nutrients and the energy they add up to, per row of nutrition.
+
+        :param nutrition: Nutritional values, shape (n, n_nutrients).
+        :param weights: Weights in grams the rows belong to.
+        :return: Shares of shape (n, 3) and energies of shape (n,).
+        """
+        energies = nutrition[:, [nutrient_names.index(name) for name in macro_energy]] * list(macro_energy.values())
+        masses = energies @ np.ones(len(macro_energy))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return energies / masses[:, None], masses
+
+
+@dataclass
+class EnergyDensityTarget:
+    """Target energy per 100 g.
+
+    Args:
+        energy (float): Energy in kcal per 100 g."""
+
+    energy: float
+
+    def get_goal(self) -> npt.NDArray[float]:
+        return np.array([self.energy], dtype=float)
+
+    def get_profiles(self, nutrition: npt.NDArray[float], weights: npt.NDArray[float]) \
+            -> tuple[npt.NDArray[float], npt.NDArray[float]]:
+        """
+        Energy per 100 g and weight, per row of nutrition.
+
+        :param nutrition: Nutritional values, shape (n, n_nutrients).
+        :param weights: Weights in grams the rows belong to.
+        :return: Densities of shape (n, 1) and weights of shape (n,).
+        """
+        weights = np.asarray(weights, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return nutrition[:, [nutrient_names.index('energy')]] / weights[:, None] * 100, weights
+
+
+@dataclass
+class Recommendation:
+    """Ingredient that moves a meal toward a target.
+
+    Args:
+        CODE (int): Code of the ingredient.
+        amount (float): Amount in grams to add that gets the meal closest to the target.
+        distance (float): Distance of the meal to the target after adding the amount.
+        improvement (float): How much the distance shrinks."""
+
+    CODE: int
+    amount: float
+    distance: float
+    improvement: float
+
+
+def recommend_ingredients(meal: Meal, target: Union[MacroRatioTarget, EnergyDensityTarget],
+                          columns: dict[str, npt.NDArray], count: int = 10, max_amount: float = 500.) \
+        -> list[Recommendation]:
+    """
+    Scores every ingredient by how close the meal gets to the target when the best amount of it is added, and returns
+    the best ones. Both targets are ratios, so adding a grams of an ingredient moves the profile of the meal along the
+    straight line toward the profile of the ingredient, by the share a * rate / (meal mass + a * rate) of the way. The
+    best share is the projection of the goal onto that line, which gives all amounts and distances in a few array
+    operations.
+
+    :param meal: Meal to complete.
+    :param target: Macro ratio or energy density to reach.
+    :param columns: Ingredient values keyed like LocalDatabase.get_ingredient_arrays, at least 'code' and
+        'nutrition'.
+    :param count: Maximum number of recommendations.
+    :param max_amount: Largest amount in grams that is recommended.
+    :return: Best ingredients first, only ingredients that move the meal toward the target.
+    """
+    goal = target.get_goal()
+    meal_profile, meal_mass = target.get_profiles(meal.nutrition[None, :], np.array([meal.weight]))
+    meal_profile, meal_mass = meal_profile[0], meal_mass[0]
+    empty_meal = not meal_mass > 0
+    if empty_meal:
+        meal_profile = np.zeros_like(goal)
+        meal_mass = 0.
+    profiles, masses = target.get_profiles(np.asarray(columns['nutrition'], dtype=float),
+                                           np.full(len(columns['code']), 100.))
+    rates = masses / 100
+    valid = (rates > 0) & ~np.isnan(profiles @ np.ones(profiles.shape[1]))
+
+    # squared distances along the line from the meal profile m to an ingredient profile p, expanded into dot
+    # products so no temporaries of the profiles' shape are needed: |m + s * (p - m) - g|^2
+    offset = meal_profile - goal
+    along = profiles @ offset - meal_profile @ offset
+    lengths = np.einsum('ij,ij->i', profiles, profiles) - 2 * (profiles @ meal_profile) + meal_profile @ meal_profile
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_shares = max_amount * rates / (meal_mass + max_amount * rates)
+        shares = np.clip(np.nan_to_num(-along / lengths), 0, max_shares)
+        if empty_meal:
+            # any amount of a single ingredient gives its own profile
+            shares = max_shares
+            amounts = np.full(len(shares), min(max_amount, 100.))
+        else:
+            amounts = np.where(shares < max_shares, shares * meal_mass / (rates * (1 - shares)), max_amount)
+    current = float(offset @ offset)
+    distances = np.sqrt(np.maximum(current + 2 * shares * along + shares ** 2 * lengths, 0))
+    current = np.inf if empty_meal else np.sqrt(current)
+    # rounding leaves tiny improvements for ingredients whose profile equals the meal's
+    valid &= distances < current * (1 - 1e-9)
+
+    rows = np.flatnonzero(valid)
+    if len(rows) > count:
+        rows = rows[np.argpartition(distances[rows], count - 1)[:count]]
+    rows = rows[np.argsort(distances[rows], kind='stable')]
+
+    return [Recommendation(CODE=int(columns['code'][r]), amount=float(amounts[r]), distance=float(distances[r]),
+                           improvement=float(current - distances[r])) for r in rows]
@@ -1,14 +1,21 @@
+import time
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 
 import pandas as pd
 
-from typing import Union, Tuple
+from typing import Callable, Union, Tuple
 
-import numpy as np
 import numpy.typing as npt
 
 from src.app.connector import LocalDatabase
-from src.backend.food import Ingredient, LocalDatabaseComponent, Meal, MealType, n_nutrients
+from src.app.events import EventBus
+from src.app.file_writer import AtomicFileWriter
+from src.app.history import EditHistory
+from src.backend.food import Ingredient, LocalDatabaseComponent, Meal, MealType
+from src.backend.meal_plan import MealPlan
+from src.backend.plan_optimizer import MealPlanOptimizer, PlanConstraints, PlanSolution
+from src.backend.plan_totals import PlanTotals
 
 
 @dataclass
@@ -16,72 +23,154 @@ class Trip(LocalDatabaseComponent):
     """Implements the base class for any planning project.
 
     Args:
-        duration (int): Initial duration in days."""
+        duration (int): Initial duration in days.
+        events (EventBus): Notifies subscribers of changes to the meal plan.
+        history (EditHistory): Records changes to the meal plan for undo, usually shared with the linked database.
+
+    The meal plan is a MealPlan, a dense array of meals per day and meal type that indexing reads like a list of dicts
+    {meal_type_code: Meal or None}. Day and trip summaries are read from running totals that every change of the meal
+    plan updates. Changes of planned meals are taken from the 'meal_updated' and 'meals_reset' events of the linked
+    database; after meals were changed without events, e.g. by LocalDatabase.recompute_meals, recompute_totals has to
+    be called."""
 
     duration: int = 1
-    meal_plan: list[dict[int, Union[Meal, None]]] = field(default_factory=list[dict])
+    meal_plan: MealPlan = None
     meal_types: list[MealType] = field(default_factory=list[MealType])
     sep: str = ','
     linked_database: LocalDatabase = None
     linked_db_code: int = None
+    events: EventBus = field(default_factory=EventBus, repr=False, compare=False)
+    history: EditHistory = field(default=None, repr=False, compare=False)
+    totals: PlanTotals = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
+        if self.meal_plan is None:
+            self.meal_plan = MealPlan(n_meal_types=max(len(self.meal_types), 4))
+        self.totals = PlanTotals(plan=self.meal_plan)
         for i in range(self.duration):
             self.add_day(init_mode=True)
 
     def add_day(self, init_mode=False) -> bool:
-        self.meal_plan.append({0: None, 1: None, 2: None, 3: None})
+        self.meal_plan.add_day()
+        self.totals.add_day()
         if not init_mode:
             self.duration += 1
+            self.events.emit('day_added', day_ind=len(self.meal_plan) - 1)
+            self.record_edit('Add day', undo=self.remove_last_day, redo=self.add_day)
+        return True
+
+    def remove_last_day(self) -> bool:
+        if self.duration < 2:
+            return False
+
+        self.totals.remove_last_day()
+        self.meal_plan.remove_last_day()
+        self.duration -= 1
+        self.events.emit('day_removed', day_ind=self.duration)
         return True
 
     def set_meal_at_day(self, meal: Meal, day_ind: int, meal_type: MealType) -> bool:
         if day_ind > self.duration - 1:
             return False
 
-        self.meal_plan[day_ind][meal_type.CODE] = meal
+        self.assign_meal(meal=meal, day_ind=day_ind, meal_type_code=meal_type.CODE)
         return True
 
     def remove_meal_at_day(self, day_ind: int, meal_type: MealType) -> bool:
         if day_ind > self.duration - 1:
             return False
 
-        self.meal_plan[day_ind][meal_type.CODE] = None
+        self.assign_meal(meal=None, day_ind=day_ind, meal_type_code=meal_type.CODE)
         return True
 
+    def assign_meal(self, meal: Union[Meal, None], day_ind: int, meal_type_code: int):
+        """
+        Puts a meal, or None, into a slot of the meal plan and records the previous one for undo.
+        """
+        old_meal = self.meal_plan.get_meal(day_ind=day_ind, meal_type_code=meal_type_code)
+        self.meal_plan.set_meal(day_ind=day_ind, meal_type_code=meal_type_code, meal=meal)
+        self.totals.update_days([day_ind])
+        self.events.emit('day_meal_changed', day_ind=day_ind, meal_type_code=meal_type_code)
+        self.record_edit(f'Plan day {day_ind + 1}',
+                         undo=lambda: self.assign_meal(meal=old_meal, day_ind=day_ind, meal_type_code=meal_type_code),
+                         redo=lambda: self.assign_meal(meal=meal, day_ind=day_ind, meal_type_code=meal_type_code))
+
+    def optimize_meal_plan(self, constraints: PlanConstraints, objective: str = 'weight', time_budget: float = 2.,
+                           seed: int = None) -> PlanSolution:
+        """
+        Searches the meals of the linked database for a plan of all days with the lowest total weight or cost that
+        meets the constraints, see MealPlanOptimizer. The meal plan itself is not changed, see set_meal_codes.
+
+        :param constraints: Requirements of each day.
+        :param objective: 'weight' or 'cost'.
+        :param time_budget: Seconds to search, including the time to read the meals.
+        :param seed: Seed of the random choices, None for a random seed.
+        """
+        if self.linked_database is None:
+            raise Exception('No Database linked!')
+        start = time.perf_counter()
+        meal_type_codes = [t.CODE for t in self.linked_database.meal_types[:self.meal_plan.n_meal_types]]
+        optimizer = MealPlanOptimizer(columns=self.linked_database.get_meal_columns(with_ingredients=False),
+                                      meal_type_codes=meal_type_codes, n_days=self.duration, constraints=constraints,
+                                      objective=objective, seed=seed)
+        return optimizer.solve(time_budget=max(time_budget - (time.perf_counter() - start), 0.))
+
+    def set_meal_codes(self, meal_codes: npt.NDArray[int], meal_type_codes: list[int]):
+        """
+        Replaces the meals of all days as one undo step.
+
+        :param meal_codes: Meal codes of shape (duration, len(meal_type_codes)), -1 for an empty slot.
+        :param meal_type_codes: Meal type of each column of meal_codes.
+        """
+        with self.events.muted(), self.group_history('Optimize meal plan'):
+            for day_ind, day_codes in enumerate(meal_codes.tolist()):
+                for meal_type_code, code in zip(meal_type_codes, day_codes):
+                    meal = None if code < 0 else self.linked_database.get_meal_by_code(code=code)
+                    self.assign_meal(meal=meal, day_ind=day_ind, meal_type_code=meal_type_code)
+        self.events.emit('trip_reset')
+
+    def record_edit(self, description: str, undo: Callable[[], None], redo: Callable[[], None]):
+        if self.history is not None:
+            self.history.record(description=description, undo=undo, redo=redo)
+
+    def pause_history(self):
+        return self.history.paused() if self.history is not None else nullcontext()
+
+    def group_history(self, description: str):
+        return self.history.grouped(description) if self.history is not None else nullcontext()
+
     def get_day_summary(self, day_ind) -> Tuple[npt.NDArray, float, float, int]:
         if day_ind > self.duration - 1:
             return False
 
-        nutrition = np.zeros(n_nutrients)
-        cost = 0
-        weight = 0
-        cooking_count = 0
-        for i, meal in enumerate(self.meal_plan[day_ind].values()):
-            if meal is not None:
-                nutrition = nutrition + meal.nutrition
-                cost += meal.cost
-                weight += meal.weight
-                cooking_count += int(meal.cooking)
-
-        return nutrition, cost, weight, cooking_count
+        return self.totals.get_day(day_ind=day_ind)
 
     def get_meal_plan_summary(self) -> Tuple[npt.NDArray, float, float, int, int]:
-        nutrition = np.zeros(n_nutrients)
-        cost = 0.0
-        weight = 0.0
-        cooking_count = 0
-        for i, day in enumerate(self.meal_plan):
-            day_nut, day_cost, day_weight, day_cooking = self.get_day_summary(day_ind=i)
-            nutrition = nutrition + day_nut
-            cost += day_cost
-            weight += day_weight
-            cooking_count += day_cooking
-
-        return nutrition, cost, weight, cooking_count, self.duration
+        return *self.totals.get_total(), self.duration
+
+    def recompute_totals(self):
+        """
+        Rebuilds the running totals from the current values of all planned meals.
+        """
+        self.meal_plan.refresh_all()
+        self.totals = PlanTotals(plan=self.meal_plan)
+
+    def meal_updated(self, item: Meal, old_name: str):
+        self.totals.update_days(self.meal_plan.refresh_meal(item))
+
+    def clear_plan(self):
+        self.duration = 0
+        self.meal_plan = MealPlan(n_meal_types=self.meal_plan.n_meal_types)
+        self.totals = PlanTotals(plan=self.meal_plan)
 
     def link_database(self, db: LocalDatabase):
+        if self.linked_database is not None:
+            self.linked_database.events.unsubscribe('meal_updated', self.meal_updated)
+            self.linked_database.events.unsubscribe('meals_reset', self.recompute_totals)
         self.linked_database = db
+        db.events.subscribe('meal_updated', self.meal_updated)
+        db.events.subscribe('meals_reset', self.recompute_totals)
+        self.recompute_totals()
 
     def save_trip(self, f_path: str):
         """
@@ -91,23 +180,12 @@ class Trip(LocalDatabaseComponent):
         """
         if self.linked_database is None:
             raise Exception('No Database linked!')
-        with open(f_path, 'w') as f:
-            f.write(f'{self.linked_database.CODE}\n')
-            f.write(f'{self.linked_database.name}\n')
-            f.write(
-                f'day{self.sep}{self.meal_types[0].name}{self.sep}{self.meal_types[1].name}{self.sep}'
-                f'{self.meal_types[2].name}{self.sep}{self.meal_types[3].name}\n')
-
-            for i in range(self.duration):
-                day_plan = self.meal_plan[i]
-                save_list = []
-                for meal in day_plan.values():
-                    if meal is not None:
-                        save_list.append(meal.CODE)
-                    else:
-                        save_list.append('')
-                f.write(f'{i + 1}{self.sep}{save_list[0]}{self.sep}{save_list[1]}{self.sep}{save_list[2]}{self.sep}'
-                        f'{save_list[3]}\n')
+        with AtomicFileWriter(f_path, sep=self.sep) as writer:
+            writer.write_row([self.linked_database.CODE])
+            writer.write_row([self.linked_database.name])
+            writer.write_row(['day'] + [t.name for t in self.meal_types[:4]])
+            codes = self.meal_plan.get_meal_codes(empty='')[:self.duration]
+            writer.write_columns([range(1, len(codes) + 1), *codes.T.tolist()])
 
     def set_meal_from_df(self, df: pd.DataFrame, day: int):
         day_ind = day - 1
@@ -130,10 +208,13 @@ class Trip(LocalDatabaseComponent):
             self.linked_db_code = int(f.readline())
 
     def load_trip(self, f_path: str):
-        self.duration = 0
-        self.meal_plan = []
+        self.clear_plan()
         trip_df = pd.read_csv(f_path, sep=self.sep, skiprows=2)
 
-        for i, day in enumerate(trip_df.day):
-            self.add_day()
-            self.set_meal_from_df(df=trip_df, day=i + 1)
+        with self.events.muted(), self.pause_history():
+            for i, day in enumerate(trip_df.day):
+                self.add_day()
+                self.set_meal_from_df(df=trip_df, day=i + 1)
+        if self.history is not None:
+            self.history.clear()
+        self.events.emit('trip_reset')
@@ -11,11 +11,12 @@ from numpy.typing import NDArray
 
 from typing import Union
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QDoubleValidator, QColor
 
 from src.app.connector import LocalDatabase
 from src.app.error_handling import ItemUsedElsewhereError
+from src.app.importer import read_import_chunks
 from src.backend.food import LocalDatabaseComponent, Meal, MealType, Ingredient
 from src.backend.trip import Trip
 
@@ -163,6 +164,32 @@ class RemoveDialog(QDialog):
             self.message.setText(f'Cannot remove {self.item.name} since it is used somewhere!')
 
 
+class IngredientImportWorker(QThread):
+    """Reads a food composition table chunk by chunk in the background. Chunks are handed to the GUI thread through
+    chunk_ready, which adds them to the database, so the database is only ever touched by one thread.
+
+    Args:
+        f_path (str): Full path to .csv, .jsonl or gzip-compressed source file.
+        chunk_rows (int): Number of rows per chunk."""
+
+    chunk_ready = pyqtSignal(object, float)
+    failed = pyqtSignal(str)
+
+    def __init__(self, f_path: str, chunk_rows: int = 10000):
+        super().__init__()
+        self.f_path = f_path
+        self.chunk_rows = chunk_rows
+
+    def run(self):
+        try:
+            for columns, fraction in read_import_chunks(f_path=self.f_path, chunk_rows=self.chunk_rows):
+                if self.isInterruptionRequested():
+                    return
+                self.chunk_ready.emit(columns, fraction)
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit(str(e))
+
+
 class ExitNow(QDialog):
     def __init__(self):
         super().__init__()
@@ -181,18 +208,63 @@ class ExitNow(QDialog):
 
 
 class ListLinkedToDatabase(QListWidget):
+    """List of item names that follows the change events of the database, adding, renaming and removing single rows
+    instead of refilling the whole list.
+
+    Args:
+        local_database (LocalDatabase): Database whose items are listed."""
+
+    topic = ''
+
     def __init__(self, local_database: LocalDatabase):
         super().__init__()
         self.db = local_database
         self.setSortingEnabled(True)
+        self.items_by_name = {}
+        self.showing_search = False
+        self.db.events.subscribe(f'{self.topic}_added', self.item_added)
+        self.db.events.subscribe(f'{self.topic}_updated', self.item_updated)
+        self.db.events.subscribe(f'{self.topic}_removed', self.item_removed)
+        self.db.events.subscribe(f'{self.topic}s_reset', self.update_from_db)
 
     def get_db(self) -> LocalDatabase:
         return self.db
 
-    def update_from_search(self, hits: list[str]) -> None:
+    def update_from_db(self):
+        pass
+
+    def fill(self, names: list[str]):
         self.clear()
-        for name in hits:
-            self.addItem(QListWidgetItem(name))
+        self.items_by_name = {}
+        for name in names:
+            self.add_name(name)
+
+    def add_name(self, name: str):
+        item = QListWidgetItem(name)
+        self.items_by_name[name] = item
+        self.addItem(item)
+
+    def update_from_search(self, hits: list[str]) -> None:
+        self.setSortingEnabled(False)
+        self.showing_search = True
+        self.fill(hits)
+
+    def item_added(self, item: LocalDatabaseComponent):
+        if not self.showing_search:
+            self.add_name(item.name)
+
+    def item_updated(self, item: LocalDatabaseComponent, old_name: str):
+        if item.name == old_name:
+            return
+        row_item = self.items_by_name.pop(old_name, None)
+        if row_item is not None:
+            row_item.setText(item.name)
+            self.items_by_name[item.name] = row_item
+
+    def item_removed(self, item: LocalDatabaseComponent):
+        row_item = self.items_by_name.pop(item.name, None)
+        if row_item is not None:
+            self.takeItem(self.row(row_item))
 
     def get_selected_item_str(self) -> Union[str, bool]:
         selection = self.selectedItems()
@@ -202,16 +274,16 @@ class ListLinkedToDatabase(QListWidget):
 
 
 class IngredientList(ListLinkedToDatabase):
+    topic = 'ingredient'
 
     def update_from_db(self):
-        self.clear()
-        names = super().get_db().get_ingredient_names()
-        for name in names:
-            self.addItem(QListWidgetItem(name))
+        self.setSortingEnabled(True)
+        self.showing_search = False
+        self.fill(super().get_db().get_ingredient_names())
 
     def mark_ingredients_in_meal(self, meal: Meal):
         items = [self.item(i) for i in range(self.count())]
-        meal_names = meal.get_all_ingredient_names()
+        meal_names = set(meal.get_all_ingredient_names())
         for i, item in enumerate(items):
             if item.text() in meal_names:
                 item.setBackground(QColor('#daffda'))
@@ -220,12 +292,12 @@ class IngredientList(ListLinkedToDatabase):
 
 
 class MealList(ListLinkedToDatabase):
+    topic = 'meal'
 
     def update_from_db(self):
-        self.clear()
-        meals = self.db.get_meal_names()
-        for meal in meals:
-            self.addItem(QListWidgetItem(meal))
+        self.setSortingEnabled(True)
+        self.showing_search = False
+        self.fill(self.db.get_meal_names())
 
 
 class SearchBar(QLineEdit):
@@ -302,10 +374,10 @@ class LabelFieldSlider(QHBoxLayout):
             val = 0
             self.edit_field.setText('0')
         elif val > self.max:
-            self.max = val
+            self.max = int(np.ceil(val))
             self.slider.setMaximum(self.max)
         elif val < self.min:
-            self.min = val
+            self.min = int(np.floor(val))
             self.slider.setMinimum(self.min)
 
         self.slider.setValue(int(val))
@@ -351,6 +423,14 @@ class DayOverview(QScrollArea):
         for i in range(self.trip.duration):
             self.add_day(init_mode=True)
 
+        self.trip.events.subscribe('day_meal_changed', self.day_meal_changed)
+        self.trip.events.subscribe('day_added', self.day_added)
+        self.trip.events.subscribe('day_removed', self.day_removed)
+        self.trip.events.subscribe('trip_reset', self.load_trip_data)
+        self.db.events.subscribe('meal_updated', self.meal_updated)
+        self.db.events.subscribe('meal_removed', self.meal_updated)
+        self.db.events.subscribe('meals_reset', self.update_all_days)
+
     def single_day_clicked(self, sender: int):
         current_selection = self.shadow_days.selectedIndexes()
         if current_selection:
@@ -380,20 +460,45 @@ class DayOverview(QScrollArea):
 
     def add_day(self, init_mode: bool = False):
         if init_mode:
-            check = True
+            self.add_day_widget()
         else:
-            check = self.trip.add_day()
-
-        if check:
-            ind = len(self.days)
-            self.days.append(SingleDay(day_overview=self, index=ind))
-            self.shadow_days.addItem(QListWidgetItem(f'shadow_item_{ind:03d}'))
-            if ind > 0:
-                self.sep_lines.append(QVSeparationLine())
-                self.super_layout.addWidget(self.sep_lines[-1])
-            self.super_layout.addWidget(self.days[-1])
-            if ind == 0:
-                self.shadow_days.setCurrentRow(0)
+            self.trip.add_day()
+
+    def add_day_widget(self):
+        ind = len(self.days)
+        self.days.append(SingleDay(day_overview=self, index=ind))
+        self.shadow_days.addItem(QListWidgetItem(f'shadow_item_{ind:03d}'))
+        if ind > 0:
+            self.sep_lines.append(QVSeparationLine())
+            self.super_layout.addWidget(self.sep_lines[-1])
+        self.super_layout.addWidget(self.days[-1])
+        if ind == 0:
+            self.shadow_days.setCurrentRow(0)
+
+    def day_added(self, day_ind: int):
+        while len(self.days) <= day_ind:
+            self.add_day_widget()
+
+    def day_removed(self, day_ind: int):
+        while len(self.days) > max(day_ind, 1):
+            day = self.days.pop()
+            self.super_layout.removeWidget(day)
+            self.clear_item(day)
+            sep_line = self.sep_lines.pop()
+            self.super_layout.removeWidget(sep_line)
+            self.clear_item(sep_line)
+            self.shadow_days.takeItem(len(self.days))
+        if self.get_current_day() is None:
+            self.shadow_days.setCurrentRow(len(self.days) - 1)
+
+    def day_meal_changed(self, day_ind: int, meal_type_code: int):
+        if day_ind < len(self.days):
+            self.days[day_ind].update_details_list()
+
+    def meal_updated(self, item: Meal, old_name: str = None):
+        for day_ind, day_plan in enumerate(self.trip.meal_plan[:len(self.days)]):
+            if any(meal is item for meal in day_plan.values()):
+                self.days[day_ind].update_details_list()
 
     def update_view(self):
         day_ind = self.get_current_day()
@@ -564,5 +669,6 @@ class IngredientTable(QTableWidget):
 
     def get_sorted_ingredient_list(self, meal: Meal) -> list[list[Union[Ingredient, float]]]:
         self.meal = meal
-        sort_inds = np.argsort(meal.get_all_ingredient_amounts())
-        return [meal.ingredients[i] for i in sort_inds[::-1]]
+        pairs = meal.get_ingredient_pairs()
+        sort_inds = np.argsort([a for _, a in pairs])
+        return [pairs[i] for i in sort_inds[::-1]]
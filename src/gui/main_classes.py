@@ -1,17 +1,20 @@
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QFileDialog,
     QVBoxLayout,
-    QMessageBox
+    QMessageBox, QProgressDialog
 )
 
-from PyQt5.QtCore import QSettings
+from PyQt5.QtCore import QSettings, Qt
+from PyQt5.QtGui import QKeySequence
 
 import os.path
 import sys
 import os
 
 from src.app.connector import LocalDatabase
+from src.app.history import EditHistory
 from src.backend.trip import Trip
+from src.gui.helper_classes import IngredientImportWorker
 from src.gui.tab_classes import IngredientTab, MealTab, TripTab
 
 
@@ -38,10 +41,30 @@ class MainWindow(QMainWindow):
         self.menu.addAction('&Load Project', lambda: None)
         self.menu.addAction('&Save Project and Exit', lambda: None)
 
+        # database and trip share one history, so undo follows the order of all edits
+        if self.db.history is None:
+            self.db.history = EditHistory()
+        self.history = self.db.history
+        self.trip.history = self.history
+        self.edit_menu = self.menuBar().addMenu('&Edit')
+        self.undo_action = self.edit_menu.addAction('&Undo', self.undo_btn_clicked)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.redo_action = self.edit_menu.addAction('&Redo', self.redo_btn_clicked)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.history.events.subscribe('history_changed', self.history_changed)
+        self.history_changed()
+
         self.database_menu = self.menuBar().addMenu('&Database')
         self.database_menu.addAction('&Save Database', self.save_db_btn_clicked)
         self.database_menu.addAction('&Save Database as...', self.save_db_as_btn_clicked)
         self.database_menu.addAction('&Load Database', self.load_db_btn_clicked)
+        self.database_menu.addAction('Store Database in S&QLite', self.sqlite_db_btn_clicked)
+        self.database_menu.addAction('&Import Ingredients...', self.import_ingredients_btn_clicked)
+        self.database_menu.addAction('&Merge Database...', self.merge_db_btn_clicked)
+        self.import_worker = None
+        self.import_progress = None
+        self.import_count = 0
+        self.import_start = 0
 
         self.trip_menu = self.menuBar().addMenu('&Trip')
         self.trip_menu.addAction('&Save Trip', self.save_trip_btn_clicked)
@@ -68,8 +91,6 @@ class MainWindow(QMainWindow):
                     self.base_name = os.path.basename(f_path)
                     if os.path.isfile(f'{self.database_dir}{self.base_name}'):
                         self.db.load_from_base_file(f'{self.database_dir}{self.base_name}')
-                        self.ingredient_tab.ingredients_list.update_from_db()
-                        self.meal_tab.meal_list.update_from_db()
                         self.setWindowTitle(f'Hiking Food Planner: {self.base_name}')
                         self.trip.link_database(db=self.db)
 
@@ -90,6 +111,22 @@ class MainWindow(QMainWindow):
         else:
             event.accept()
 
+    def undo_btn_clicked(self):
+        description = self.history.undo()
+        if description is not None:
+            self.statusBar().showMessage(f'Undone: {description}', 3000)
+
+    def redo_btn_clicked(self):
+        description = self.history.redo()
+        if description is not None:
+            self.statusBar().showMessage(f'Redone: {description}', 3000)
+
+    def history_changed(self):
+        self.undo_action.setEnabled(self.history.can_undo())
+        self.undo_action.setText(f'&Undo {self.history.get_undo_description()}'.strip())
+        self.redo_action.setEnabled(self.history.can_redo())
+        self.redo_action.setText(f'&Redo {self.history.get_redo_description()}'.strip())
+
     def save_db_btn_clicked(self):
         if self.base_name == '':
             self.base_name = os.path.basename(
@@ -109,7 +146,6 @@ class MainWindow(QMainWindow):
             self.trip.load_linked_db_code(f_path=load_name)
             if self.trip.verify_linked_database(linked_db=self.db):
                 self.trip.load_trip(f_path=load_name)
-                self.trip_tab.day_overview.load_trip_data()
                 self.trip_tab.lower_part_widget.update_info(new_ind=0)
 
     def save_and_exit_btn_clicked(self):
@@ -124,8 +160,6 @@ class MainWindow(QMainWindow):
             self.base_name = os.path.basename(base_name)
             self.db.load_from_base_file(f_path=os.path.join(self.database_dir, base_name))
             self.setWindowTitle(f'Hiking Food Planner: {self.base_name}')
-            self.ingredient_tab.ingredients_list.update_from_db()
-            self.meal_tab.meal_list.update_from_db()
             self.trip.link_database(db=self.db)
 
     def save_db_as_btn_clicked(self):
@@ -135,6 +169,63 @@ class MainWindow(QMainWindow):
             self.setWindowTitle(f'Hiking Food Planner: {self.base_name}')
             self.save_db_btn_clicked()
 
+    def sqlite_db_btn_clicked(self):
+        if self.base_name == '':
+            self.save_db_as_btn_clicked()
+        if self.base_name != '':
+            self.db.use_sqlite_storage(f_path=f'{self.database_dir}{self.base_name.split(".")[0]}.sqlite')
+            self.save_db_btn_clicked()
+
+    def import_ingredients_btn_clicked(self):
+        f_path = QFileDialog().getOpenFileName(directory=self.database_dir,
+                                               filter='Food tables (*.csv *.csv.gz *.jsonl *.jsonl.gz)')[0]
+        if f_path == '' or self.import_worker is not None:
+            return
+        self.import_count = 0
+        self.import_start = len(self.db.ingredients)
+        self.import_progress = QProgressDialog('Importing ingredients...', 'Cancel', 0, 100, self)
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_worker = IngredientImportWorker(f_path=f_path)
+        self.import_worker.chunk_ready.connect(self.import_chunk_ready)
+        self.import_worker.failed.connect(lambda msg: QMessageBox.warning(self, 'Import failed', msg))
+        self.import_worker.finished.connect(self.import_finished)
+        self.import_progress.canceled.connect(self.import_worker.requestInterruption)
+        self.import_worker.start()
+
+    def import_chunk_ready(self, columns: dict, fraction: float):
+        if self.import_worker.isInterruptionRequested():
+            return
+        # the list is refilled and the history records one step once the import finishes
+        with self.db.events.muted(), self.db.pause_history():
+            self.import_count += self.db.add_ingredients_from_columns(**columns)
+        self.import_progress.setValue(int(fraction * 100))
+
+    def import_finished(self):
+        self.import_progress.close()
+        self.import_worker = None
+        self.db.record_added_batch('Import ingredients', ingredients=self.db.ingredients[self.import_start:], meals=[])
+        self.db.events.emit('ingredients_reset')
+        self.statusBar().showMessage(f'Imported {self.import_count} ingredients', 5000)
+
+    def merge_db_btn_clicked(self):
+        f_path = QFileDialog().getOpenFileName(directory=self.database_dir, filter='*.txt')[0]
+        if f_path == '':
+            return
+        other = LocalDatabase()
+        other.load_from_base_file(f_path=f_path)
+        with self.db.events.muted():
+            report = self.db.merge(other)
+        self.db.events.emit('ingredients_reset')
+        self.db.events.emit('meals_reset')
+        msg = f'Added {report.added_ingredients} ingredients and {report.added_meals} meals, ' \
+              f'skipped {report.get_duplicate_count()} duplicates.'
+        if report.conflicts:
+            msg += f'\n\n{len(report.conflicts)} items had names already taken by different items and were renamed:\n'
+            msg += '\n'.join(f'{c.name} -> {c.new_name}' for c in report.conflicts[:20])
+            if len(report.conflicts) > 20:
+                msg += '\n...'
+        QMessageBox.information(self, 'Merge Database', msg)
+
     def save_current_config(self):
         if not os.path.isdir(self.config_dir):
             os.mkdir(self.config_dir)
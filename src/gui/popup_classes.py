@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (
     QHBoxLayout, QVBoxLayout,
-    QDialog, QFormLayout, QLineEdit, QLabel, QCheckBox, QPushButton
+    QDialog, QFormLayout, QLineEdit, QLabel, QCheckBox, QPushButton, QListWidget, QComboBox
 )
 import numpy as np
 
@@ -9,6 +9,9 @@ from PyQt5.QtGui import QDoubleValidator
 from src.app.connector import LocalDatabase
 from src.app.error_handling import NoIngredientPassedError
 from src.backend.food import n_nutrients, Meal, MealType
+from src.backend.meal_preview import MealPreviewGrid
+from src.backend.plan_optimizer import PlanConstraints
+from src.backend.recommender import recommend_ingredients, MacroRatioTarget, EnergyDensityTarget
 from src.backend.trip import Trip
 from src.gui.helper_classes import long_nutrient_labels, form_extractor, IngredientList, SearchBar, \
     FilterAddRemoveButtons, NutrientPieChart, short_nutrient_labels, LabelFieldSlider, TypeSelectionCheckBoxes, MealList
@@ -104,7 +107,7 @@ class AddOrEditIngredientDialog(QDialog):
                 self.accept_button.setText('Name cannot be empty!')
                 self.accept_button.setStyleSheet('QPushButton {border: 2px solid crimson}')
                 raise Exception
-            if mode == 'add' and name in self.db.get_ingredient_names():
+            if mode == 'add' and self.db.get_ingredient_by_name(name) is not None:
                 self.accept_button.setText('An ingredient with this name already exists!')
                 self.accept_button.setStyleSheet('QPushButton {border: 2px solid crimson}')
                 raise Exception
@@ -215,6 +218,28 @@ class AddIngredientToMeal(QDialog):
         self.amount_toggle = LabelFieldSlider(label_text='Amount:', slider_config=(0, 100, 20))
         self.amount_toggle.slider.valueChanged.connect(self.update_meal_nutrient_chart)
         self.amount_toggle.edit_field.editingFinished.connect(self.update_meal_nutrient_chart)
+        self.amount_toggle.slider.valueChanged.connect(self.update_best_additions)
+
+        # previews of the selected ingredient at every slider position, and of all ingredients at every slider step
+        self.selected_grid = None
+        self.additions_grid = None
+        self.best_addition_codes = []
+        self.best_additions_index = None
+        self.best_additions_list = QListWidget()
+        self.best_additions_list.itemClicked.connect(self.best_addition_clicked)
+        self.ingredient_columns = None
+        self.update_preview_grids()
+
+        self.target_field = QLineEdit()
+        self.target_field.setPlaceholderText('fat:carbs:protein, e.g. 30:50:20, or kcal/100g, e.g. 450')
+        self.recommend_btn = QPushButton('Recommend')
+        self.recommend_btn.clicked.connect(self.recommend_btn_clicked)
+        self.target_and_btn = QHBoxLayout()
+        self.target_and_btn.addWidget(self.target_field, 3)
+        self.target_and_btn.addWidget(self.recommend_btn, 1)
+        self.recommendations = []
+        self.recommendation_list = QListWidget()
+        self.recommendation_list.itemClicked.connect(self.recommendation_clicked)
 
         self.add_to_meal_btn = QPushButton('Add to meal')
         self.remove_from_meal_btn = QPushButton('Remove from meal')
@@ -234,6 +259,11 @@ class AddIngredientToMeal(QDialog):
         self.right_super_layout.addLayout(self.chart_titles)
         self.right_super_layout.addLayout(self.nutrient_charts)
         self.right_super_layout.addLayout(self.amount_toggle)
+        self.right_super_layout.addWidget(QLabel('<h4>Best additions by energy density</h4>'))
+        self.right_super_layout.addWidget(self.best_additions_list)
+        self.right_super_layout.addWidget(QLabel('<h4>Recommendations for a target</h4>'))
+        self.right_super_layout.addLayout(self.target_and_btn)
+        self.right_super_layout.addWidget(self.recommendation_list)
         self.right_super_layout.addLayout(self.add_done_btn)
 
         self.super_layout = QHBoxLayout()
@@ -245,10 +275,11 @@ class AddIngredientToMeal(QDialog):
     def update_ingredient_nutrients_chart(self):
         text = self.ingredient_list.get_selected_item_str()
         ingredient = self.db.get_ingredient_by_name(text)
+        self.update_selected_grid()
         self.ingredient_nutrient_chart_title.setText(f'<h4>{text}</h4>')
         self.ingredient_nutrient_chart.update_chart(data=ingredient.nutrition, labels=short_nutrient_labels)
         self.remove_from_meal_btn.setText('Remove from meal')
-        if text in self.meal.get_all_ingredient_names():
+        if self.meal.has_ingredient_name(text):
             self.amount_toggle.slider.setValue(self.meal.get_amount_of_ingredient_by_name(text))
             self.add_to_meal_btn.setText('Change amount')
         else:
@@ -261,9 +292,13 @@ class AddIngredientToMeal(QDialog):
             self.meal_nutrient_chart_title.setText(
                 f'<h4>{self.meal.name} after adding {self.amount_toggle.slider.value():.2f} '
                 f'g of {ingredient_name}</h4>')
-            temp_copy = self.meal.get_copy()
-            temp_copy.add_ingredient(item=self.db.get_ingredient_by_name(ingredient_name), amount=add_val)
-            self.updated_meal_nutrient_chart.update_chart(data=temp_copy.nutrition, labels=short_nutrient_labels)
+            grid = self.selected_grid
+            if grid is not None and add_val in grid.amounts:
+                preview = grid.get_preview(candidate=0, amount_index=grid.find_amount_index(add_val))
+            else:
+                preview = self.meal.preview_ingredient(item=self.db.get_ingredient_by_name(ingredient_name),
+                                                       amount=add_val)
+            self.updated_meal_nutrient_chart.update_chart(data=preview.nutrition, labels=short_nutrient_labels)
 
     def remove_from_meal_btn_clicked(self):
         text = self.ingredient_list.get_selected_item_str()
@@ -273,6 +308,7 @@ class AddIngredientToMeal(QDialog):
             self.updated_meal_nutrient_chart.update_chart(data=self.meal.nutrition, labels=short_nutrient_labels)
             self.amount_toggle.slider.setValue(0)
             self.ingredient_list.mark_ingredients_in_meal(meal=self.meal)
+            self.update_preview_grids()
         else:
             self.remove_from_meal_btn.setText(f'Could not remove {text}')
 
@@ -280,7 +316,7 @@ class AddIngredientToMeal(QDialog):
         add_val = self.amount_toggle.slider.value()
         ingredient_name = self.ingredient_list.get_selected_item_str()
         if ingredient_name:
-            if ingredient_name in self.meal.get_all_ingredient_names():
+            if self.meal.has_ingredient_name(ingredient_name):
                 if add_val == 0:
                     self.remove_from_meal_btn_clicked()
                 else:
@@ -288,10 +324,77 @@ class AddIngredientToMeal(QDialog):
             else:
                 self.add_to_meal_btn.setText('Ingredient added!')
             self.meal.add_ingredient(item=self.db.get_ingredient_by_name(ingredient_name), amount=add_val)
+            self.update_preview_grids()
             self.update_meal_nutrient_chart()
 
         self.ingredient_list.mark_ingredients_in_meal(meal=self.meal)
 
+    def get_slider_amounts(self, step: float) -> np.ndarray:
+        return np.arange(self.amount_toggle.slider.minimum(), self.amount_toggle.slider.maximum() + step, step)
+
+    def update_preview_grids(self):
+        """
+        Recomputes the previews after the meal changed.
+        """
+        amounts = self.get_slider_amounts(step=self.amount_toggle.step)
+        self.ingredient_columns = self.db.get_ingredient_arrays()
+        self.additions_grid = MealPreviewGrid.from_columns(meal=self.meal, columns=self.ingredient_columns,
+                                                           amounts=amounts)
+        self.best_additions_index = None
+        self.update_selected_grid()
+        self.update_best_additions()
+
+    def update_selected_grid(self):
+        text = self.ingredient_list.get_selected_item_str()
+        ingredient = self.db.get_ingredient_by_name(text) if text else None
+        self.selected_grid = None if ingredient is None else MealPreviewGrid.from_ingredients(
+            meal=self.meal, ingredients=[ingredient], amounts=self.get_slider_amounts(step=1))
+
+    def update_best_additions(self):
+        grid = self.additions_grid
+        amount_index = grid.find_amount_index(max(self.amount_toggle.slider.value(), self.amount_toggle.step))
+        if amount_index == self.best_additions_index:
+            return
+        self.best_additions_index = amount_index
+        self.best_additions_list.clear()
+        rows = grid.rank_additions(amount_index=amount_index)
+        self.best_addition_codes = [int(c) for c in grid.codes[rows]]
+        for row, code in zip(rows, self.best_addition_codes):
+            ingredient = self.db.get_ingredient_by_code(code)
+            self.best_additions_list.addItem(f'{ingredient.name}: {grid.energy_density[row, amount_index]:.0f} '
+                                             f'kcal/100g at {grid.amounts[amount_index]:.0f} g')
+
+    def best_addition_clicked(self):
+        code = self.best_addition_codes[self.best_additions_list.currentRow()]
+        item = self.ingredient_list.items_by_name.get(self.db.get_ingredient_by_code(code).name)
+        if item is not None:
+            self.ingredient_list.setCurrentItem(item)
+
+    def recommend_btn_clicked(self):
+        text = self.target_field.text()
+        try:
+            if ':' in text:
+                target = MacroRatioTarget(*[float(share) for share in text.split(':')])
+            else:
+                target = EnergyDensityTarget(energy=float(text))
+        except (TypeError, ValueError):
+            self.recommend_btn.setText('Invalid target')
+            return
+        self.recommend_btn.setText('Recommend')
+        self.recommendations = recommend_ingredients(meal=self.meal, target=target, columns=self.ingredient_columns)
+        self.recommendation_list.clear()
+        for recommendation in self.recommendations:
+            ingredient = self.db.get_ingredient_by_code(recommendation.CODE)
+            self.recommendation_list.addItem(f'{recommendation.amount:.0f} g of {ingredient.name}')
+
+    def recommendation_clicked(self):
+        recommendation = self.recommendations[self.recommendation_list.currentRow()]
+        item = self.ingredient_list.items_by_name.get(self.db.get_ingredient_by_code(recommendation.CODE).name)
+        if item is not None:
+            self.ingredient_list.setCurrentItem(item)
+            self.amount_toggle.edit_field.setText(f'{recommendation.amount:.2f}')
+            self.amount_toggle.field_value_changed()
+
     def cancel_btn_clicked(self):
         self.close()
 
@@ -333,7 +436,7 @@ class CreateNewMeal(QDialog):
             self.add_btn.setStyleSheet('QPushButton {border: 2px solid crimson}')
             return
 
-        elif name in self.db.get_meal_names():
+        elif self.db.get_meal_by_name(name) is not None:
             self.add_btn.setText('Name already exists!')
             self.add_btn.setStyleSheet('QPushButton {border: 2px solid crimson}')
             return
@@ -449,3 +552,70 @@ class AssignMealToDay(QDialog):
     def remove_meal_btn_clicked(self):
         self.trip.remove_meal_at_day(day_ind=self.day, meal_type=self.meal_type)
         self.close()
+
+
+class OptimizeMealPlan(QDialog):
+    def __init__(self, local_database: LocalDatabase, trip: Trip):
+        super().__init__()
+        self.db = local_database
+        self.trip = trip
+
+        self.objective_box = QComboBox()
+        self.objective_box.addItems(['weight', 'cost'])
+        self.energy_field = QLineEdit('2500')
+        self.protein_field = QLineEdit('80')
+        self.repeats_field = QLineEdit('3')
+        self.cooking_field = QLineEdit('2')
+        self.time_field = QLineEdit('2')
+        for field in [self.energy_field, self.protein_field, self.repeats_field, self.cooking_field, self.time_field]:
+            field.setValidator(QDoubleValidator())
+
+        self.form = QFormLayout()
+        self.form.addRow('Minimize:', self.objective_box)
+        self.form.addRow('Min. energy per day [kcal]:', self.energy_field)
+        self.form.addRow('Min. protein per day [g]:', self.protein_field)
+        self.form.addRow('Max. repeats of a meal:', self.repeats_field)
+        self.form.addRow('Max. cooked meals per day:', self.cooking_field)
+        self.form.addRow('Time budget [s]:', self.time_field)
+
+        self.optimize_btn = QPushButton('Optimize')
+        self.cancel_btn = QPushButton('Cancel')
+
+        self.optimize_btn.clicked.connect(self.optimize_btn_clicked)
+        self.cancel_btn.clicked.connect(self.cancel_btn_clicked)
+
+        self.btn_layout = QHBoxLayout()
+        self.btn_layout.addWidget(self.optimize_btn)
+        self.btn_layout.addWidget(self.cancel_btn)
+
+        self.super_layout = QVBoxLayout()
+        self.super_layout.addLayout(self.form)
+        self.super_layout.addLayout(self.btn_layout)
+
+        self.setLayout(self.super_layout)
+
+    def optimize_btn_clicked(self):
+        try:
+            constraints = PlanConstraints(min_energy=float(self.energy_field.text()),
+                                          min_protein=float(self.protein_field.text()),
+                                          max_repeats=int(float(self.repeats_field.text())),
+                                          max_cooking=int(float(self.cooking_field.text())))
+            time_budget = float(self.time_field.text())
+        except ValueError:
+            self.optimize_btn.setText('Invalid input!')
+            self.optimize_btn.setStyleSheet('QPushButton {border: 2px solid crimson}')
+            return
+
+        solution = self.trip.optimize_meal_plan(constraints=constraints, objective=self.objective_box.currentText(),
+                                                time_budget=time_budget)
+        if not solution.feasible:
+            self.optimize_btn.setText('No plan meets the constraints!')
+            self.optimize_btn.setStyleSheet('QPushButton {border: 2px solid crimson}')
+            return
+
+        self.trip.set_meal_codes(meal_codes=solution.meal_codes,
+                                 meal_type_codes=[t.CODE for t in self.db.meal_types[:solution.meal_codes.shape[1]]])
+        self.accept()
+
+    def cancel_btn_clicked(self):
+        self.close()
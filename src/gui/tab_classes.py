@@ -4,13 +4,13 @@ from PyQt5.QtWidgets import (
 )
 
 from src.app.connector import LocalDatabase
-from src.backend.food import MealType
+from src.backend.food import Ingredient, Meal, MealType
 from src.backend.shopping_list import ShoppingList
 from src.backend.trip import Trip
 from src.gui.helper_classes import FilterAddRemoveButtons, IngredientList, SearchBar, long_nutrient_labels, \
     NutrientPieChart, RemoveDialog, short_nutrient_labels, MealList, IngredientTable, DayOverview, DayViewMealInfo
 from src.gui.popup_classes import AddOrEditIngredientDialog, AddIngredientToMeal, CreateNewMeal, \
-    AssignMealToDay
+    AssignMealToDay, OptimizeMealPlan
 
 
 class IngredientTab(QWidget):
@@ -102,10 +102,11 @@ class IngredientTab(QWidget):
         self.ingredients_list.update_from_db()
         self.setLayout(super_layout)
 
+        self.db.events.subscribe('ingredient_updated', self.ingredient_updated)
+
     def add_ingredient_clicked(self):
         popup = AddOrEditIngredientDialog(local_database=self.db)
         popup.exec_()
-        self.ingredients_list.update_from_db()
 
     def edit_ingredient_clicked(self):
         name = self.ingredients_list.selectedItems()
@@ -115,7 +116,6 @@ class IngredientTab(QWidget):
             popup = AddOrEditIngredientDialog(local_database=self.db, mode='edit', ingredient_name=ingredient.name,
                                               ingredient_code=ingredient.CODE)
             popup.exec_()
-            self.ingredients_list.update_from_db()
 
     def rmv_button_clicked(self):
         name = self.ingredients_list.selectedItems()
@@ -124,9 +124,12 @@ class IngredientTab(QWidget):
             popup = RemoveDialog(local_database=self.db, item=self.db.get_ingredient_by_name(name),
                                  msg='Are you sure you want to remove this ingredient?')
             popup.exec_()
-            self.ingredients_list.update_from_db()
             self.clear_ingredient_details()
 
+    def ingredient_updated(self, item: Ingredient, old_name: str):
+        if self.ingredients_list.get_selected_item_str() == item.name:
+            self.update_ingredient_details()
+
     def update_ingredient_details(self):
         text = self.ingredients_list.get_selected_item_str()
         if text:
@@ -247,29 +250,30 @@ class MealTab(QWidget):
 
         self.setLayout(self.super_layout)
 
+        self.db.events.subscribe('meal_updated', self.meal_updated)
+
     def add_ingredient_to_meal_btn_clicked(self):
         meal_name = self.meal_list.get_selected_item_str()
         if meal_name:
             meal = self.db.get_meal_by_name(meal_name)
             popup = AddIngredientToMeal(local_database=self.db, selected_meal=meal)
             popup.exec_()
-            self.update_meal_details()
-            self.nutrient_chart.update_chart(data=meal.nutrition, labels=short_nutrient_labels)
 
     def add_meal_btn_clicked(self):
         popup = CreateNewMeal(local_database=self.db)
         popup.exec_()
-        self.meal_list.update_from_db()
         self.update_meal_details()
 
+    def meal_updated(self, item: Meal, old_name: str):
+        if self.meal_list.get_selected_item_str() == item.name:
+            self.update_meal_details()
+
     def remove_meal_btn_clicked(self):
         meal_name = self.meal_list.get_selected_item_str()
         if meal_name:
             popup = RemoveDialog(local_database=self.db, item=self.db.get_meal_by_name(meal_name),
                                  msg='Are you sure you want to remove this meal?')
             popup.exec_()
-            self.db.remove_meal_by_name(meal_name)
-            self.meal_list.update_from_db()
             self.clear_meal_details()
 
     def update_meal_details(self):
@@ -289,8 +293,6 @@ class MealTab(QWidget):
 
             self.right_table_items = [QTableWidgetItem() for i in range(3)]
 
-            meal.update_cooking_and_water()
-
             if meal.cooking:
                 text = 'Yes'
             else:
@@ -335,13 +337,16 @@ class TripTab(QWidget):
         self.global_view_btn = QPushButton('Trip Summary')
         self.add_day_btn = QPushButton('Add day')
         self.rmv_day_btn = QPushButton('Does nothing')
+        self.optimize_btn = QPushButton('Optimize plan')
 
         self.add_day_btn.clicked.connect(self.add_day_btn_clicked)
         self.global_view_btn.clicked.connect(self.trip_summary_btn_clicked)
+        self.optimize_btn.clicked.connect(self.optimize_btn_clicked)
 
         self.upper_btns_layout.addWidget(self.global_view_btn, 1)
         self.upper_btns_layout.addWidget(self.add_day_btn, 1)
         self.upper_btns_layout.addWidget(self.rmv_day_btn, 1)
+        self.upper_btns_layout.addWidget(self.optimize_btn, 1)
 
         self.day_overview = DayOverview(local_database=self.db, trip=self.trip)
         self.day_overview.shadow_days.itemSelectionChanged.connect(self.day_selection_changed)
@@ -362,6 +367,15 @@ class TripTab(QWidget):
     def add_day_btn_clicked(self):
         self.day_overview.add_day()
 
+    def optimize_btn_clicked(self):
+        dialog = OptimizeMealPlan(local_database=self.db, trip=self.trip)
+        if not dialog.exec_():
+            return
+        if self.view_mode == 'trip':
+            self.lower_part_widget.update_contents()
+        elif self.day_overview.get_current_day() is not None:
+            self.lower_part_widget.update_info(self.day_overview.get_current_day())
+
     def day_selection_changed(self):
         new_day = self.day_overview.get_current_day()
         if self.view_mode != 'day':
@@ -472,7 +486,6 @@ class TripTabDayView(QWidget):
         for i in self.meal_types_info_widgets:
             i.day_changed(new_ind)
 
-        self.trip_tab.day_overview.update_view()
         day_nutrition, day_cost, day_weight, day_cook_count = self.trip_tab.trip.get_day_summary(day_ind=new_ind)
 
         self.cal_item.setText(f'{day_nutrition[0]:.2f}')
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from benchmarks.common import write_synthetic_database
+
+
+@pytest.fixture
+def db_dir(tmp_path) -> str:
+    """
+    Directory with a small synthetic .csv database, including \\ tail.
+    """
+    db_dir = f'{tmp_path}{os.sep}'
+    write_synthetic_database(db_dir, n_ingredients=300, n_meals=80)
+
+    return db_dir
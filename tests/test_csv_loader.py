@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.common import dump_database
+from src.app.connector import LocalDatabase
+
+
+def parse_rows(db_dir: str) -> dict[str, list]:
+    """
+    Parses the synthetic .csv files row by row, like the loader before the column-wise one.
+    """
+    def parse_bool(text: str) -> bool:
+        return text.lower().strip() == 'true'
+
+    def parse_list(text: str) -> list[str]:
+        return [s.strip() for s in text.strip("[]' ").split(',') if s.strip()]
+
+    data = pd.read_csv(f'{db_dir}synthetic_ingredients.csv', sep=';', float_precision='round_trip')
+    ingredients = [[int(data.iloc[i, 0]), data.name[i], [int(t) for t in data.types[i].split('--')[:-1]],
+                    [float(v) for v in data.iloc[i, 2:10]], parse_bool(data.cooking[i]), parse_bool(data.water[i]),
+                    float(data.price_per_unit[i]), float(data.unit_size[i])] for i in range(len(data))]
+    data = pd.read_csv(f'{db_dir}synthetic_meals.csv', sep=';', float_precision='round_trip')
+    meals = [[int(data.iloc[i, 0]), data.name[i], [int(t) for t in data.own_types[i].split('--')[:-1]],
+              [[int(c), float(a)] for c, a in zip(parse_list(data.ingredients[i]), parse_list(data.amount[i]))],
+              [float(v) for v in data.iloc[i, 2:10]], parse_bool(data.cooking[i]), parse_bool(data.water[i]),
+              float(data.cost[i]), float(data.weight[i])] for i in range(len(data))]
+
+    return {'ingredients': ingredients, 'meals': meals}
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('lazy_meals', [False, True])
+def test_column_loader_matches_row_wise_parse(db_dir, columnar, lazy_meals):
+    db = LocalDatabase(columnar=columnar, lazy_meals=lazy_meals)
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+
+    assert dump_database(db) == parse_rows(db_dir)
+
+
+def test_save_and_load_round_trip(db_dir, tmp_path):
+    db = LocalDatabase()
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+    db.recompute_meals()
+    save_dir = f'{tmp_path}{os.sep}saved{os.sep}'
+    os.mkdir(save_dir)
+    db.save(db_dir=save_dir, base_name='round_trip.txt')
+
+    loaded = LocalDatabase()
+    loaded.load([f'{save_dir}round_trip_ingredients.csv', f'{save_dir}round_trip_meals.csv'])
+
+    assert dump_database(loaded) == dump_database(db)
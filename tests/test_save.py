@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.common import dump_database
+from src.app.connector import LocalDatabase
+
+
+def load_database(db_dir: str) -> LocalDatabase:
+    db = LocalDatabase()
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+
+    return db
+
+
+def save_database(db: LocalDatabase, save_dir: str, base_name: str):
+    db.save_base_file(base_name=base_name, db_dir=save_dir)
+    db.save(db_dir=save_dir, base_name=base_name)
+    db.wait_for_compaction()
+
+
+@pytest.mark.parametrize('journal_limit', [10, 100000])
+def test_recomputed_meals_are_saved(db_dir, tmp_path, journal_limit):
+    db = load_database(db_dir)
+    db.journal_limit = journal_limit
+    save_dir = f'{tmp_path}{os.sep}'
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    db.recompute_meals()
+    assert db.has_changes()
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+
+    loaded = LocalDatabase()
+    loaded.load_from_base_file(f'{save_dir}saved.txt')
+
+    assert dump_database(loaded) == dump_database(db)
+
+
+def test_recomputed_meals_are_saved_to_sqlite(db_dir, tmp_path):
+    db = load_database(db_dir)
+    db.use_sqlite_storage(f'{tmp_path}{os.sep}saved.sqlite')
+    db.save(db_dir=f'{tmp_path}{os.sep}', base_name='saved.txt')
+    db.recompute_meals()
+    db.save(db_dir=f'{tmp_path}{os.sep}', base_name='saved.txt')
+    db.use_csv_storage()
+
+    loaded = LocalDatabase()
+    loaded.load([f'{tmp_path}{os.sep}saved.sqlite'])
+
+    assert dump_database(loaded) == dump_database(db)
+
+
+def test_unchanged_recompute_marks_nothing(db_dir):
+    db = load_database(db_dir)
+    db.recompute_meals()
+    db.clear_changes()
+    db.recompute_meals()
+
+    assert not db.has_changes()
+
+
+def edit_first_round(db: LocalDatabase):
+    ingredient = db.ingredients[0]
+    db.update_ingredient(in_code=ingredient.CODE, name=f'{ingredient.name} edited', types=[1, 2],
+                         nutrition=ingredient.nutrition * 2, cooking=not ingredient.cooking, water=ingredient.water,
+                         price_per_unit=ingredient.price_per_unit + 1, unit_size=ingredient.unit_size)
+    db.add_ingredient(name='Added ingredient', nutrients=np.arange(8, dtype=float), types=[0], water=True,
+                      cooking=False, price_per_unit=2., unit_size=500.)
+    db.add_meal(name='Added meal', own_type=[db.meal_types[1]],
+                ingredients=[[db.get_ingredient_by_name('Added ingredient'), 120.], [db.ingredients[5], 30.]])
+
+
+def edit_second_round(db: LocalDatabase):
+    db.remove_meal_by_name(db.meals[3].name)
+    unused = set(db.get_ingredient_codes()) - set(db.get_all_ingredient_codes_used_in_meals())
+    db.remove_ingredient_by_code(min(unused))
+
+
+def load_saved(save_dir: str) -> LocalDatabase:
+    loaded = LocalDatabase()
+    loaded.load_from_base_file(f'{save_dir}saved.txt')
+
+    return loaded
+
+
+def save_in_full(db: LocalDatabase, tmp_path) -> LocalDatabase:
+    full_dir = f'{tmp_path}{os.sep}full{os.sep}'
+    os.mkdir(full_dir)
+    save_database(db, save_dir=full_dir, base_name='saved.txt')
+
+    return load_saved(full_dir)
+
+
+def test_journal_replay_equals_full_save(db_dir, tmp_path):
+    db = load_database(db_dir)
+    save_dir = f'{tmp_path}{os.sep}'
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    edit_first_round(db)
+    edit_second_round(db)
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    assert len(db.journal) > 0
+
+    replayed = load_saved(save_dir)
+
+    assert dump_database(replayed) == dump_database(db)
+    assert dump_database(replayed) == dump_database(save_in_full(db, tmp_path))
+
+
+def test_compaction_equals_full_save(db_dir, tmp_path):
+    db = load_database(db_dir)
+    save_dir = f'{tmp_path}{os.sep}'
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    edit_first_round(db)
+    # the first round goes to the journal, the second one fills it up to the limit and starts a compaction
+    db.journal_limit = len(db.changed_ingredients) + len(db.changed_meals) + 1
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    edit_second_round(db)
+    save_database(db, save_dir=save_dir, base_name='saved.txt')
+    assert len(db.journal) == 0
+
+    compacted = LocalDatabase()
+    compacted.load([f'{save_dir}saved_ingredients.csv', f'{save_dir}saved_meals.csv'])
+
+    assert dump_database(compacted) == dump_database(db)
+    assert dump_database(load_saved(save_dir)) == dump_database(save_in_full(db, tmp_path))
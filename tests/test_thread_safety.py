@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.common import dump_database
+from src.app.connector import LocalDatabase
+
+
+def run_threads(targets: list, duration: float) -> list[BaseException]:
+    """
+    Runs each target in a loop on its own thread until duration has passed and returns the exceptions raised.
+    """
+    errors = []
+    stop = time.perf_counter() + duration
+
+    def loop(target, seed):
+        rng = random.Random(seed)
+        try:
+            while time.perf_counter() < stop:
+                target(rng)
+        except BaseException as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=loop, args=(target, seed)) for seed, target in enumerate(targets)]
+    interval = sys.getswitchinterval()
+    # switching threads as often as possible opens the races between readers and writers
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    return errors
+
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+@pytest.mark.parametrize('columnar', [False, True])
+def test_concurrent_reads_writes_and_saves(db_dir, tmp_path, storage, columnar):
+    db = LocalDatabase(columnar=columnar, lazy_meals=True, thread_safe=True)
+    db.load([f'{db_dir}synthetic_ingredients.csv', f'{db_dir}synthetic_meals.csv'])
+    db.journal_limit = 50
+    save_dir = f'{tmp_path}{os.sep}'
+    if storage == 'sqlite':
+        db.use_sqlite_storage(f'{save_dir}saved.sqlite')
+    db.save_base_file(base_name='saved.txt', db_dir=save_dir)
+    codes = db.get_meal_codes()
+    added = []
+
+    def write(rng):
+        ingredient = db.get_ingredient_by_code(rng.choice(db.get_ingredient_codes()))
+        db.update_ingredient(in_code=ingredient.CODE, name=ingredient.name, types=[rng.randrange(4)],
+                             nutrition=np.full(8, rng.uniform(0, 100)), cooking=ingredient.cooking,
+                             water=ingredient.water, price_per_unit=ingredient.price_per_unit,
+                             unit_size=ingredient.unit_size)
+        name = f'Added meal {rng.random()}'
+        db.add_meal(name=name, own_type=[db.meal_types[0]], ingredients=[[ingredient, 50.]])
+        added.append(name)
+        if len(added) > 5:
+            db.remove_meal_by_name(added.pop(0))
+
+    def read(rng):
+        db.get_meal_by_code(rng.choice(codes))
+        db.get_meal_by_name(f'Meal {rng.choice(codes)}')
+        db.search_by_name('meals', 'Meal 1')
+        db.get_meal_names()
+
+    def save(rng):
+        db.save(db_dir=save_dir, base_name='saved.txt')
+
+    errors = run_threads([write, read, read, save], duration=1.5)
+
+    assert errors == []
+    db.save(db_dir=save_dir, base_name='saved.txt')
+    db.wait_for_compaction()
+    loaded = LocalDatabase()
+    loaded.load_from_base_file(f'{save_dir}saved.txt')
+    assert dump_database(loaded) == dump_database(db)